@@ -0,0 +1,226 @@
+// Cluster entry point: forks CLUSTER_WORKERS API workers (default one per
+// core) running server.ts on a shared port. The primary serves no requests;
+// it owns the invoice storage index, relays cache invalidations between
+// workers and keeps track of which worker holds which render jobs.
+// Usage: npm run dev:cluster. SIGHUP restarts the workers one at a time;
+// SIGTERM or SIGINT drains and stops them.
+import cluster, { Worker } from 'cluster';
+import dotenv from 'dotenv';
+import os from 'os';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { driverFromEnv } from './repositories/index.js';
+import { getInvoiceStore, IndexRecord } from './services/storage/invoiceStore.js';
+import type { ClusterMessage } from './utils/cluster.js';
+import logger from './utils/logger.js';
+
+dotenv.config();
+
+interface Slot {
+  index: number;
+  worker: Worker;
+  ready: boolean;
+  retiring: boolean;
+  // Render jobs the worker has queued or in flight
+  jobs: Set<string>;
+  whenReady: Promise<boolean>;
+  markReady: (ready: boolean) => void;
+}
+
+const currentFile = fileURLToPath(import.meta.url);
+const serverScript = path.join(path.dirname(currentFile), `server${path.extname(currentFile)}`);
+
+// Longer than a worker's own drain so it can finish before being killed
+const drainMs = parseInt(process.env.SHUTDOWN_DRAIN_MS || '30000', 10);
+const stopTimeoutMs = drainMs + 10000;
+
+// The in-memory driver keeps its data inside one process, so workers could not share it
+const workerCount = (): number => {
+  const requested = parseInt(process.env.CLUSTER_WORKERS || '', 10) || os.availableParallelism();
+  if (requested > 1 && driverFromEnv() === 'memory') {
+    logger.warn('The in-memory storage driver cannot be shared between processes; running one API worker');
+    return 1;
+  }
+  return Math.max(1, requested);
+};
+
+const count = workerCount();
+const store = getInvoiceStore();
+const slots = new Map<number, Slot>();
+// Jobs of departed workers waiting for a ready worker to adopt them
+const orphanedJobs = new Set<string>();
+let resumed = false;
+let stopping = false;
+let restarting = false;
+
+const readySlots = () => [...slots.values()].filter(slot => slot.ready && !slot.retiring);
+
+// Give jobs to the ready worker holding the fewest
+const handOff = (ids: string[]) => {
+  ids.forEach(id => orphanedJobs.add(id));
+  const target = readySlots().sort((a, b) => a.jobs.size - b.jobs.size)[0];
+  if (!target || orphanedJobs.size === 0) {
+    return;
+  }
+  const adopted = [...orphanedJobs];
+  orphanedJobs.clear();
+  adopted.forEach(id => target.jobs.add(id));
+  target.worker.send({ bus: 'primary', channel: 'render-jobs:adopt', payload: adopted } as ClusterMessage);
+  logger.info('Handed render jobs to another worker', { count: adopted.length, worker: target.index });
+};
+
+const handleMessage = (slot: Slot, message: ClusterMessage) => {
+  if (!message || typeof message.channel !== 'string') {
+    return;
+  }
+
+  if (message.bus === 'broadcast') {
+    for (const other of slots.values()) {
+      if (other !== slot && other.worker.isConnected()) {
+        other.worker.send(message);
+      }
+    }
+    return;
+  }
+
+  switch (message.channel) {
+    case 'invoice-index':
+      store.applyRemote(message.payload as IndexRecord).catch(error => {
+        logger.error('Invoice storage index update error', error);
+      });
+      break;
+    case 'render-jobs':
+      if (message.payload.op === 'own') {
+        slot.jobs.add(message.payload.id);
+      } else {
+        slot.jobs.delete(message.payload.id);
+      }
+      break;
+    case 'worker-ready':
+      slot.ready = true;
+      slot.markReady(true);
+      // The first worker up resumes jobs persisted by a previous run
+      if (!resumed) {
+        resumed = true;
+        slot.worker.send({ bus: 'primary', channel: 'render-jobs:resume' } as ClusterMessage);
+      }
+      handOff([]);
+      break;
+  }
+};
+
+const fork = (index: number): Slot => {
+  const worker = cluster.fork({
+    CLUSTER_WORKER_COUNT: String(count),
+    CLUSTER_WORKER_INDEX: String(index)
+  });
+  let markReady: (ready: boolean) => void = () => {};
+  const whenReady = new Promise<boolean>(resolve => {
+    markReady = resolve;
+  });
+  const slot: Slot = { index, worker, ready: false, retiring: false, jobs: new Set(), whenReady, markReady };
+  slots.set(worker.id, slot);
+
+  worker.on('message', (message: ClusterMessage) => handleMessage(slot, message));
+  worker.once('exit', (code, signal) => {
+    slots.delete(worker.id);
+    slot.markReady(false);
+    handOff([...slot.jobs]);
+
+    if (!stopping && !slot.retiring) {
+      logger.warn('API worker exited, restarting', { worker: index, code, signal });
+      setTimeout(() => {
+        if (!stopping) {
+          fork(index);
+        }
+      }, 1000).unref();
+    }
+  });
+  return slot;
+};
+
+// SIGTERM a worker so it drains, and SIGKILL it if it takes too long
+const stopWorker = (slot: Slot): Promise<void> => new Promise(resolve => {
+  if (slot.worker.isDead()) {
+    return resolve();
+  }
+  slot.retiring = true;
+  const killTimer = setTimeout(() => {
+    logger.warn('API worker did not drain in time, killing it', { worker: slot.index });
+    slot.worker.process.kill('SIGKILL');
+  }, stopTimeoutMs);
+  slot.worker.once('exit', () => {
+    clearTimeout(killTimer);
+    resolve();
+  });
+  slot.worker.process.kill('SIGTERM');
+});
+
+// Replace workers one at a time; each old worker drains only once its
+// replacement is serving, so capacity never drops by more than one worker
+const rollingRestart = async () => {
+  if (restarting || stopping) {
+    return;
+  }
+  // A replacement would start with an empty in-memory store, and the old
+  // worker's data would be lost once it stopped
+  if (driverFromEnv() === 'memory') {
+    logger.warn('Rolling restart is not supported with the in-memory storage driver; restart the cluster instead');
+    return;
+  }
+  restarting = true;
+  logger.info('Rolling restart of API workers');
+  try {
+    for (const slot of [...slots.values()]) {
+      if (stopping) {
+        break;
+      }
+      const replacement = fork(slot.index);
+      const ready = await Promise.race([
+        replacement.whenReady,
+        new Promise<boolean>(resolve => setTimeout(() => resolve(false), stopTimeoutMs).unref())
+      ]);
+      if (!ready) {
+        logger.error('Replacement API worker failed to start, stopping the restart', { worker: slot.index });
+        await stopWorker(replacement);
+        break;
+      }
+      await stopWorker(slot);
+    }
+  } finally {
+    restarting = false;
+  }
+};
+
+const shutdown = (signal: string) => {
+  if (stopping) {
+    return;
+  }
+  stopping = true;
+  logger.info(`${signal} received, draining API workers`);
+  Promise.all([...slots.values()].map(stopWorker))
+    .then(() => store.shutdown())
+    .finally(() => process.exit(0));
+};
+
+const start = async () => {
+  // The index is loaded (or rebuilt) once here, before any worker reads it
+  await store.ready();
+
+  cluster.setupPrimary({ exec: serverScript });
+  for (let i = 0; i < count; i++) {
+    fork(i);
+  }
+  logger.info(`Cluster primary ${process.pid} started ${count} API worker(s)`);
+
+  process.on('SIGHUP', () => {
+    rollingRestart().catch(error => logger.error('Rolling restart error', error));
+  });
+  process.once('SIGTERM', () => shutdown('SIGTERM'));
+  process.once('SIGINT', () => shutdown('SIGINT'));
+};
+
+start().catch(error => {
+  logger.error('Failed to start cluster', error);
+  process.exit(1);
+});
@@ -1,4 +1,65 @@
 import mongoose from 'mongoose';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+
+const commandSeconds = metrics.histogram(
+  'mongodb_command_duration_seconds',
+  'MongoDB command round trips by command and collection',
+  { labels: ['command', 'collection', 'outcome'], buckets: [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5] }
+);
+const checkoutSeconds = metrics.histogram(
+  'mongodb_pool_checkout_seconds',
+  'Time to check a connection out of the MongoDB pool',
+  { buckets: [0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5] }
+);
+
+const pool = { open: 0, inUse: 0, waiting: 0, maxSize: 0 };
+
+// Mongoose commands reach the driver as MongoDB commands, so timing those
+// covers every model operation. Listeners are attached once connected, so
+// counts are clamped in case a connection was checked out just before.
+const instrumentClient = (client: any) => {
+  pool.maxSize = client.options?.maxPoolSize || 0;
+  const collections = new Map<number, string>();
+
+  client.on('commandStarted', (event: any) => {
+    const target = event.command?.[event.commandName];
+    collections.set(event.requestId, typeof target === 'string' ? target : event.command?.collection || '');
+  });
+  const finished = (outcome: string) => (event: any) => {
+    const collection = collections.get(event.requestId) || '';
+    collections.delete(event.requestId);
+    commandSeconds.observe(event.duration / 1000, { command: event.commandName, collection, outcome });
+  };
+  client.on('commandSucceeded', finished('success'));
+  client.on('commandFailed', finished('failure'));
+
+  client.on('connectionCreated', () => pool.open++);
+  client.on('connectionClosed', () => {
+    pool.open = Math.max(0, pool.open - 1);
+  });
+  client.on('connectionCheckOutStarted', () => pool.waiting++);
+  client.on('connectionCheckedOut', (event: any) => {
+    pool.waiting = Math.max(0, pool.waiting - 1);
+    pool.inUse++;
+    if (typeof event.durationMS === 'number') {
+      checkoutSeconds.observe(event.durationMS / 1000);
+    }
+  });
+  client.on('connectionCheckOutFailed', () => {
+    pool.waiting = Math.max(0, pool.waiting - 1);
+  });
+  client.on('connectionCheckedIn', () => {
+    pool.inUse = Math.max(0, pool.inUse - 1);
+  });
+
+  metrics.gauge('mongodb_pool_connections', 'MongoDB pool connections by state', () => [
+    { labels: { state: 'in_use' }, value: pool.inUse },
+    { labels: { state: 'idle' }, value: Math.max(0, pool.open - pool.inUse) }
+  ]);
+  metrics.gauge('mongodb_pool_waiting', 'Operations waiting for a pooled connection', () => pool.waiting);
+  metrics.gauge('mongodb_pool_max_size', 'MongoDB pool size limit', () => pool.maxSize);
+};
 
 const connectDB = async (): Promise<void> => {
   try {
@@ -8,12 +69,14 @@ const connectDB = async (): Promise<void> => {
       throw new Error('MONGO_URI is not defined in environment variables');
     }
 
-    const conn = await mongoose.connect(mongoURI);
+    // Command events feed the /metrics command timings
+    const conn = await mongoose.connect(mongoURI, { monitorCommands: true });
+    instrumentClient(conn.connection.getClient());
     
-    console.log(`MongoDB Connected: ${conn.connection.host}`);
+    logger.info(`MongoDB Connected: ${conn.connection.host}`);
   } catch (error) {
-    console.error('Error connecting to MongoDB:', error);
-    console.log('Server will continue without database connection for testing purposes');
+    logger.error('Error connecting to MongoDB', error);
+    logger.warn('Server will continue without database connection for testing purposes');
     // Don't throw error to prevent server crash
   }
 };
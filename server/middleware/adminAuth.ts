@@ -0,0 +1,22 @@
+import crypto from 'crypto';
+import { Request, Response, NextFunction } from 'express';
+
+// Whether the request carries `expected` as its bearer token (constant-time compare)
+export const hasBearerToken = (req: Request, expected: string): boolean => {
+  const presented = Buffer.from(String(req.headers['authorization'] || '').replace(/^Bearer /, ''));
+  const wanted = Buffer.from(expected);
+  return presented.length === wanted.length && crypto.timingSafeEqual(presented, wanted);
+};
+
+// Operator endpoints, authorized by ADMIN_TOKEN rather than a user login.
+// Without ADMIN_TOKEN they do not exist.
+export const requireAdmin = (req: Request, res: Response, next: NextFunction) => {
+  const token = process.env.ADMIN_TOKEN;
+  if (!token) {
+    return res.status(404).json({ message: 'Not found' });
+  }
+  if (!hasBearerToken(req, token)) {
+    return res.status(401).json({ message: 'Admin token required' });
+  }
+  next();
+};
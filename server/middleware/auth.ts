@@ -1,14 +1,19 @@
 import jwt from 'jsonwebtoken';
 import { Request, Response, NextFunction } from 'express';
-import User from '../models/userModel.js';
+import repositories from '../repositories/index.js';
+import authCache, { hashToken } from '../services/authCache.js';
+import tracer from '../utils/tracing.js';
 
 interface AuthRequest extends Request {
   user?: any;
+  auth?: { tokenHash: string; userId: string; expiresAt: number };
 }
 
+// Verified tokens and user records come from authCache, so a request with a
+// recently seen token needs neither a signature check nor a database query
 export const authenticateToken = async (req: AuthRequest, res: Response, next: NextFunction) => {
-  console.log('Auth middleware - Request received for:', req.path);
-  console.log('Auth header:', req.headers['authorization']);
+  // Left open on rejections; the trace closes it with the response
+  const endSpan = tracer.begin('auth');
   try {
     const authHeader = req.headers['authorization'];
     const token = authHeader && authHeader.split(' ')[1]; // Bearer TOKEN
@@ -17,31 +22,36 @@ export const authenticateToken = async (req: AuthRequest, res: Response, next: N
       return res.status(401).json({ message: 'Access token required' });
     }
 
-    const jwtSecret = process.env.JWT_SECRET;
-    if (!jwtSecret) {
-      return res.status(500).json({ message: 'JWT secret not configured' });
+    const tokenHash = hashToken(token);
+    if (authCache.isRevoked(tokenHash)) {
+      return res.status(401).json({ message: 'Token has been revoked' });
     }
 
-    const decoded = jwt.verify(token, jwtSecret) as any;
-    
-    // Test mode: skip database lookup if MongoDB is not connected
-    if (!process.env.MONGO_URI) {
-      req.user = {
-        _id: decoded.userId,
-        email: decoded.email,
-        name: 'Test User'
-      };
-    } else {
-      const user = await User.findById(decoded.userId);
-      
+    let verified = authCache.verifiedToken(tokenHash);
+    if (!verified) {
+      const jwtSecret = process.env.JWT_SECRET;
+      if (!jwtSecret) {
+        return res.status(500).json({ message: 'JWT secret not configured' });
+      }
+
+      const decoded = jwt.verify(token, jwtSecret) as any;
+      verified = authCache.rememberToken(tokenHash, String(decoded.userId), decoded.exp);
+    }
+
+    let user = authCache.user(verified.userId);
+    if (!user) {
+      user = await repositories().users.findById(verified.userId);
       if (!user) {
         return res.status(401).json({ message: 'Invalid token' });
       }
-
-      req.user = user;
+      authCache.rememberUser(user);
     }
+
+    req.user = { _id: user.id, name: user.name, email: user.email };
+    req.auth = { tokenHash, ...verified };
+    endSpan();
     next();
   } catch (error) {
     return res.status(403).json({ message: 'Invalid or expired token' });
   }
-};
\ No newline at end of file
+};
@@ -0,0 +1,45 @@
+import crypto from 'crypto';
+import { Request, Response, NextFunction } from 'express';
+import logger, { LogContext, withLogContext } from '../utils/logger.js';
+
+// Accept a caller's id (from a proxy or another service) only if it looks like one
+const REQUEST_ID = /^[\w.:-]{1,128}$/;
+
+// Give every request an id (echoed as X-Request-Id) that is attached to all
+// lines logged while handling it, and log one line when it completes.
+// Whether the request's info lines are kept is decided here, per route.
+export const requestLogger = (req: Request, res: Response, next: NextFunction) => {
+  const incoming = req.headers['x-request-id'];
+  const requestId = typeof incoming === 'string' && REQUEST_ID.test(incoming) ? incoming : crypto.randomUUID();
+  // The query string can carry user input, so only the path is logged
+  const path = req.originalUrl.split('?')[0];
+  const store: LogContext = { requestId, sampled: logger.sampleRequest(req.method, path) };
+  const started = process.hrtime.bigint();
+  res.setHeader('X-Request-Id', requestId);
+
+  const done = (event: 'finish' | 'close') => {
+    res.removeListener('finish', onFinish);
+    res.removeListener('close', onClose);
+    withLogContext(store, () => {
+      const aborted = event === 'close' && !res.writableFinished;
+      const level = aborted || res.statusCode < 500 ? 'info' : 'warn';
+      if (!logger.enabled(level)) {
+        return;
+      }
+      logger.log(level, aborted ? 'Request aborted' : 'Request completed', {
+        method: req.method,
+        path,
+        status: res.statusCode,
+        durationMs: Math.round(Number(process.hrtime.bigint() - started) / 1e5) / 10,
+        bytes: Number(res.getHeader('content-length')) || undefined,
+        userId: (req as any).user?._id
+      });
+    });
+  };
+  const onFinish = () => done('finish');
+  const onClose = () => done('close');
+  res.once('finish', onFinish);
+  res.once('close', onClose);
+
+  withLogContext(store, next);
+};
@@ -0,0 +1,41 @@
+import { Request, Response, NextFunction } from 'express';
+import metrics from '../utils/metrics.js';
+
+const requestSeconds = metrics.histogram(
+  'http_request_duration_seconds',
+  'API request latency by route pattern and status',
+  { labels: ['method', 'route', 'status'] }
+);
+
+let inFlight = 0;
+metrics.gauge('http_requests_in_flight', 'Requests being handled', () => inFlight);
+
+// Label by the matched route pattern (/api/pdf/jobs/:id) rather than the
+// path, so ids do not create a series each; unmatched paths share one label
+export const routeLabel = (req: Request): string =>
+  req.route ? `${req.baseUrl}${req.route.path === '/' && req.baseUrl ? '' : req.route.path}` : 'unmatched';
+
+// Time every request into the latency histogram
+export const requestMetrics = (req: Request, res: Response, next: NextFunction) => {
+  const started = process.hrtime.bigint();
+  inFlight++;
+
+  let recorded = false;
+  const record = () => {
+    if (recorded) {
+      return;
+    }
+    recorded = true;
+    inFlight--;
+    // A client that hangs up before the response is finished is labelled 499
+    const status = res.writableFinished ? res.statusCode : 499;
+    requestSeconds.observe(Number(process.hrtime.bigint() - started) / 1e9, {
+      method: req.method,
+      route: routeLabel(req),
+      status
+    });
+  };
+  res.once('finish', record);
+  res.once('close', record);
+  next();
+};
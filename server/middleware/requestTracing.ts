@@ -0,0 +1,40 @@
+import crypto from 'crypto';
+import { Request, Response, NextFunction } from 'express';
+import { routeLabel } from './requestMetrics.js';
+import { logContext } from '../utils/logger.js';
+import tracer from '../utils/tracing.js';
+
+// Record spans for the request under its request id. Spans finished (or
+// still open) when the headers go out are sent in Server-Timing; a streamed
+// response only reports the stages before its first byte.
+export const requestTracing = (req: Request, res: Response, next: NextFunction) => {
+  const trace = tracer.start(logContext()?.requestId || crypto.randomUUID());
+
+  if (tracer.serverTiming) {
+    const writeHead = res.writeHead;
+    res.writeHead = function (this: Response, ...args: any[]) {
+      if (!this.headersSent) {
+        this.setHeader('Server-Timing', trace.serverTiming());
+      }
+      return (writeHead as any).apply(this, args);
+    } as typeof res.writeHead;
+  }
+
+  let finished = false;
+  const finish = () => {
+    if (finished) {
+      return;
+    }
+    finished = true;
+    tracer.finish(trace, {
+      method: req.method,
+      route: routeLabel(req),
+      path: req.originalUrl.split('?')[0],
+      status: res.writableFinished ? res.statusCode : 499
+    });
+  };
+  res.once('finish', finish);
+  res.once('close', finish);
+
+  tracer.run(trace, next);
+};
@@ -0,0 +1,23 @@
+import mongoose, { Document, Schema } from 'mongoose';
+
+export interface ICounter extends Document<string> {
+  value: number;
+}
+
+// Named sequences (e.g. one per user for invoice numbers). The _id is the
+// sequence name and value the last number handed out.
+const counterSchema: Schema = new Schema({
+  _id: {
+    type: String,
+    required: true
+  },
+  value: {
+    type: Number,
+    required: true,
+    default: 0
+  }
+}, {
+  versionKey: false
+});
+
+export default mongoose.model<ICounter>('Counter', counterSchema);
@@ -0,0 +1,52 @@
+import mongoose, { Document, Schema } from 'mongoose';
+
+export interface IIdempotencyKey extends Document {
+  key: string;
+  userId: string;
+  fingerprint: string;
+  state: 'pending' | 'done';
+  response?: {
+    status: number;
+    headers: Record<string, string>;
+    body: Buffer;
+  };
+  expiresAt: Date;
+}
+
+// Responses of requests sent with an Idempotency-Key, replayed to retries.
+// MongoDB drops each record once its expiresAt has passed.
+const idempotencyKeySchema: Schema = new Schema({
+  key: {
+    type: String,
+    required: true
+  },
+  userId: {
+    type: String,
+    required: true
+  },
+  fingerprint: {
+    type: String,
+    required: true
+  },
+  state: {
+    type: String,
+    enum: ['pending', 'done'],
+    required: true
+  },
+  response: {
+    status: Number,
+    headers: Schema.Types.Mixed,
+    body: Buffer
+  },
+  expiresAt: {
+    type: Date,
+    required: true
+  }
+}, {
+  timestamps: true
+});
+
+idempotencyKeySchema.index({ key: 1 }, { name: 'uniq_key', unique: true });
+idempotencyKeySchema.index({ expiresAt: 1 }, { name: 'ttl_expiresAt', expireAfterSeconds: 0 });
+
+export default mongoose.model<IIdempotencyKey>('IdempotencyKey', idempotencyKeySchema);
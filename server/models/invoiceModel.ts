@@ -1,9 +1,31 @@
 import mongoose, { Document, Schema } from 'mongoose';
 
+export type InvoiceStatus = 'queued' | 'rendering' | 'completed' | 'failed';
+
+export interface IInvoiceLineItem {
+  name: string;
+  qty: number;
+  rate: number;
+  total: number;
+}
+
 export interface IInvoice extends Document {
   userId: string;
   products: Array<any>;
   date: Date;
+  status?: InvoiceStatus;
+  invoiceNumber?: string;
+  subtotal?: number;
+  tax?: number;
+  total?: number;
+  contentHash?: string;
+  engine?: string;
+  size?: number;
+  payload?: any;
+  filename?: string;
+  error?: string;
+  attempts?: number;
+  completedAt?: Date;
 }
 
 const invoiceSchema: Schema = new Schema({
@@ -19,9 +41,66 @@ const invoiceSchema: Schema = new Schema({
     type: Date,
     required: true,
     default: Date.now
+  },
+  // Render job state for invoices generated through /api/pdf/jobs
+  status: {
+    type: String,
+    enum: ['queued', 'rendering', 'completed', 'failed']
+  },
+  invoiceNumber: {
+    type: String
+  },
+  // Totals and file reference of the rendered invoice
+  subtotal: {
+    type: Number
+  },
+  tax: {
+    type: Number
+  },
+  total: {
+    type: Number
+  },
+  contentHash: {
+    type: String
+  },
+  engine: {
+    type: String
+  },
+  size: {
+    type: Number
+  },
+  payload: {
+    type: Schema.Types.Mixed
+  },
+  filename: {
+    type: String
+  },
+  error: {
+    type: String
+  },
+  attempts: {
+    type: Number,
+    default: 0
+  },
+  completedAt: {
+    type: Date
   }
 }, {
   timestamps: true
 });
 
-export default mongoose.model<IInvoice>('Invoice', invoiceSchema);
\ No newline at end of file
+// Lets the job manager find unfinished jobs quickly after a restart
+invoiceSchema.index({ status: 1, createdAt: 1 }, { name: 'idx_status_createdAt' });
+
+// Invoice history pages: newest first, or ordered by amount; _id breaks ties
+// so keyset cursors are stable
+invoiceSchema.index({ userId: 1, date: -1, _id: -1 }, { name: 'idx_userId_date' });
+invoiceSchema.index({ userId: 1, total: -1, _id: -1 }, { name: 'idx_userId_total' });
+
+// Lookup by invoice number; jobs are numbered when they are queued
+invoiceSchema.index(
+  { userId: 1, invoiceNumber: 1 },
+  { name: 'uniq_userId_invoiceNumber', unique: true, partialFilterExpression: { invoiceNumber: { $type: 'string' } } }
+);
+
+export default mongoose.model<IInvoice>('Invoice', invoiceSchema);
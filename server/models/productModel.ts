@@ -5,8 +5,12 @@ export interface IProduct extends Document {
   qty: number;
   rate: number;
   userId: string;
+  nameKey: string;
+  createdAt: Date;
 }
 
+export const productNameKey = (name: string): string => name.trim().toLowerCase();
+
 const productSchema: Schema = new Schema({
   name: {
     type: String,
@@ -23,9 +27,25 @@ const productSchema: Schema = new Schema({
   userId: {
     type: String,
     required: true
+  },
+  // Lowercased name for case-insensitive sorting and prefix search
+  nameKey: {
+    type: String
   }
 }, {
   timestamps: true
 });
 
+productSchema.pre('validate', function (next) {
+  if (typeof this.name === 'string') {
+    this.nameKey = productNameKey(this.name);
+  }
+  next();
+});
+
+// Product listing pages, oldest first or by name; _id breaks ties so keyset
+// cursors are stable
+productSchema.index({ userId: 1, createdAt: 1, _id: 1 }, { name: 'idx_userId_createdAt' });
+productSchema.index({ userId: 1, nameKey: 1, _id: 1 }, { name: 'idx_userId_nameKey' });
+
 export default mongoose.model<IProduct>('Product', productSchema);
\ No newline at end of file
@@ -0,0 +1,75 @@
+import mongoose, { Document, Schema } from 'mongoose';
+
+export type RollupPeriod = 'day' | 'month';
+
+export interface IRollupProduct {
+  name: string;
+  qty: number;
+  revenue: number;
+}
+
+export interface IRevenueRollup extends Document {
+  userId: string;
+  period: RollupPeriod;
+  // 'YYYY-MM-DD' for days, 'YYYY-MM' for months (UTC)
+  bucket: string;
+  invoiceCount: number;
+  subtotal: number;
+  tax: number;
+  total: number;
+  // Per-product totals keyed by rollupProductKey(name)
+  products: Record<string, IRollupProduct>;
+}
+
+// UTC bucket an invoice date falls in
+export const rollupBucket = (period: RollupPeriod, date: Date): string =>
+  date.toISOString().slice(0, period === 'day' ? 10 : 7);
+
+// Product names become field names under `products`, where '.' and '$' are
+// not allowed; swap them for their full-width forms
+export const rollupProductKey = (name: string): string =>
+  name.trim().replaceAll('.', '．').replaceAll('$', '＄') || '(unnamed)';
+
+const revenueRollupSchema: Schema = new Schema({
+  userId: {
+    type: String,
+    required: true
+  },
+  period: {
+    type: String,
+    enum: ['day', 'month'],
+    required: true
+  },
+  bucket: {
+    type: String,
+    required: true
+  },
+  invoiceCount: {
+    type: Number,
+    default: 0
+  },
+  subtotal: {
+    type: Number,
+    default: 0
+  },
+  tax: {
+    type: Number,
+    default: 0
+  },
+  total: {
+    type: Number,
+    default: 0
+  },
+  products: {
+    type: Schema.Types.Mixed,
+    default: {}
+  }
+}, {
+  timestamps: true,
+  minimize: false
+});
+
+// One document per user, period and bucket; reports read a contiguous range
+revenueRollupSchema.index({ userId: 1, period: 1, bucket: 1 }, { name: 'uniq_userId_period_bucket', unique: true });
+
+export default mongoose.model<IRevenueRollup>('RevenueRollup', revenueRollupSchema);
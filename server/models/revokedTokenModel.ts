@@ -0,0 +1,31 @@
+import mongoose, { Document, Schema } from 'mongoose';
+
+export interface IRevokedToken extends Document {
+  tokenHash: string;
+  userId: string;
+  expiresAt: Date;
+}
+
+// Tokens signed out before they expire. Only hashes are stored; MongoDB drops
+// each record once the token would have expired anyway.
+const revokedTokenSchema: Schema = new Schema({
+  tokenHash: {
+    type: String,
+    required: true
+  },
+  userId: {
+    type: String,
+    required: true
+  },
+  expiresAt: {
+    type: Date,
+    required: true
+  }
+}, {
+  timestamps: true
+});
+
+revokedTokenSchema.index({ tokenHash: 1 }, { name: 'uniq_tokenHash', unique: true });
+revokedTokenSchema.index({ expiresAt: 1 }, { name: 'ttl_expiresAt', expireAfterSeconds: 0 });
+
+export default mongoose.model<IRevokedToken>('RevokedToken', revokedTokenSchema);
@@ -0,0 +1,59 @@
+import { createMemoryRepositories } from './memoryRepositories.js';
+import { createMongoRepositories } from './mongoRepositories.js';
+import { Repositories } from './types.js';
+import tracer from '../utils/tracing.js';
+
+export * from './types.js';
+
+export type RepositoryDriver = 'mongodb' | 'memory';
+
+// DB_DRIVER picks the driver. Without it, a missing or localhost MONGO_URI
+// means the in-memory driver, as the old test mode did.
+export const driverFromEnv = (): RepositoryDriver => {
+  const driver = process.env.DB_DRIVER;
+  if (driver === 'memory' || driver === 'mongodb') {
+    return driver;
+  }
+  if (driver) {
+    throw new Error(`Unknown DB_DRIVER "${driver}", expected mongodb or memory`);
+  }
+  return !process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017') ? 'memory' : 'mongodb';
+};
+
+let selected: Repositories | null = null;
+
+// Time every repository call as a db.<repository>.<method> span of the
+// current request; both drivers get the same instrumentation
+const traced = <T extends object>(name: string, repository: T): T => {
+  const wrapped: any = {};
+  for (const [method, fn] of Object.entries(repository)) {
+    wrapped[method] = typeof fn === 'function'
+      ? (...args: any[]) => tracer.span(`db.${name}.${method}`, () => fn.apply(repository, args))
+      : fn;
+  }
+  return wrapped;
+};
+
+const withTracing = (repositories: Repositories): Repositories => ({
+  ...repositories,
+  users: traced('users', repositories.users),
+  products: traced('products', repositories.products),
+  invoices: traced('invoices', repositories.invoices),
+  rollups: traced('rollups', repositories.rollups),
+  revocations: traced('revocations', repositories.revocations),
+  idempotency: traced('idempotency', repositories.idempotency),
+  sequences: traced('sequences', repositories.sequences)
+});
+
+// Choose the driver once at startup; later calls return the same instance
+export const initRepositories = (driver: RepositoryDriver = driverFromEnv()): Repositories => {
+  if (!selected) {
+    selected = withTracing(driver === 'memory' ? createMemoryRepositories() : createMongoRepositories());
+  }
+  return selected;
+};
+
+// The active repositories; initialized from the environment on first use
+const repositories = (): Repositories => selected || initRepositories();
+
+export default repositories;
@@ -0,0 +1,674 @@
+import fs from 'fs';
+import path from 'path';
+import mongoose from 'mongoose';
+import { productNameKey } from '../models/productModel.js';
+import { RollupPeriod, rollupBucket, rollupProductKey } from '../models/revenueRollupModel.js';
+import { SortedIndex } from './sortedIndex.js';
+import {
+  DuplicateKeyError,
+  IdempotencyRecord,
+  IdempotencyRepository,
+  InvoiceEntity,
+  InvoiceRepository,
+  Page,
+  PageAfter,
+  ProductEntity,
+  ProductRepository,
+  Repositories,
+  RevocationRepository,
+  RevokedTokenEntity,
+  RollupEntity,
+  RollupRepository,
+  SequenceRepository,
+  UserEntity,
+  UserRepository
+} from './types.js';
+import logger from '../utils/logger.js';
+
+export interface MemoryRepositoryOptions {
+  // JSON snapshot loaded on connect and written periodically and on close.
+  // Counters are also written to <snapshotPath>.counters on every reservation,
+  // so numbers handed out before a crash are never handed out again.
+  snapshotPath: string | null;
+  snapshotIntervalMs: number;
+}
+
+const optionsFromEnv = (): MemoryRepositoryOptions => ({
+  snapshotPath: process.env.MEMORY_DB_SNAPSHOT || null,
+  snapshotIntervalMs: parseInt(process.env.MEMORY_DB_SNAPSHOT_MS || '30000', 10)
+});
+
+// Same id format as MongoDB, so ids validate and sort the same way
+const newId = () => new mongoose.Types.ObjectId().toHexString();
+
+const compareStrings = (a: string, b: string) => (a < b ? -1 : a > b ? 1 : 0);
+
+// Keyset helpers: is `key, id` strictly before / at-or-before the cursor
+const beforeCursor = (key: string | number, id: string, after: PageAfter, afterKey: string | number) =>
+  key < afterKey || (key === afterKey && id < after.id);
+const atOrBeforeCursor = (key: string | number, id: string, after: PageAfter, afterKey: string | number) =>
+  key < afterKey || (key === afterKey && id <= after.id);
+
+// Take up to `limit` items that pass `filter`, stopping early at `stop`
+const collect = <T>(
+  items: Iterable<T>,
+  limit: number,
+  filter: (item: T) => boolean = () => true,
+  stop: (item: T) => boolean = () => false
+): Page<T> => {
+  const page: T[] = [];
+  for (const item of items) {
+    if (stop(item)) {
+      break;
+    }
+    if (!filter(item)) {
+      continue;
+    }
+    if (page.length === limit) {
+      return { items: page, hasMore: true };
+    }
+    page.push(item);
+  }
+  return { items: page, hasMore: false };
+};
+
+interface UserProductIndexes {
+  byCreatedAt: SortedIndex<ProductEntity>;
+  byName: SortedIndex<ProductEntity>;
+}
+
+interface UserInvoiceIndexes {
+  byDate: SortedIndex<InvoiceEntity>;
+  byTotal: SortedIndex<InvoiceEntity>;
+}
+
+const dateFields = ['createdAt', 'updatedAt', 'date', 'completedAt', 'expiresAt'];
+
+// Everything the in-memory driver holds, with the secondary indexes the
+// MongoDB collections have: users by email, products and invoices per user in
+// each listing order, invoices by number and rollups per user and period.
+class MemoryStore {
+  users = new Map<string, UserEntity>();
+  usersByEmail = new Map<string, UserEntity>();
+  products = new Map<string, ProductEntity>();
+  productsByUser = new Map<string, UserProductIndexes>();
+  invoices = new Map<string, InvoiceEntity>();
+  invoicesByNumber = new Map<string, InvoiceEntity>();
+  invoicesByUser = new Map<string, UserInvoiceIndexes>();
+  rollups = new Map<string, RollupEntity>();
+  rollupsByUser = new Map<string, SortedIndex<RollupEntity>>();
+  revokedTokens = new Map<string, RevokedTokenEntity>();
+  counters = new Map<string, number>();
+  // Short-lived and holding response bodies, so left out of snapshots
+  idempotencyKeys = new Map<string, IdempotencyRecord>();
+  dirty = false;
+
+  addUser(user: UserEntity): void {
+    this.users.set(user.id, user);
+    this.usersByEmail.set(user.email, user);
+  }
+
+  productIndexes(userId: string): UserProductIndexes {
+    let indexes = this.productsByUser.get(userId);
+    if (!indexes) {
+      indexes = {
+        byCreatedAt: new SortedIndex((a, b) =>
+          a.createdAt.getTime() - b.createdAt.getTime() || compareStrings(a.id, b.id)),
+        byName: new SortedIndex((a, b) => compareStrings(a.nameKey, b.nameKey) || compareStrings(a.id, b.id))
+      };
+      this.productsByUser.set(userId, indexes);
+    }
+    return indexes;
+  }
+
+  addProduct(product: ProductEntity): void {
+    this.products.set(product.id, product);
+    const indexes = this.productIndexes(product.userId);
+    indexes.byCreatedAt.insert(product);
+    indexes.byName.insert(product);
+  }
+
+  removeProduct(product: ProductEntity): void {
+    this.products.delete(product.id);
+    const indexes = this.productIndexes(product.userId);
+    indexes.byCreatedAt.remove(product);
+    indexes.byName.remove(product);
+  }
+
+  invoiceIndexes(userId: string): UserInvoiceIndexes {
+    let indexes = this.invoicesByUser.get(userId);
+    if (!indexes) {
+      indexes = {
+        byDate: new SortedIndex((a, b) => a.date.getTime() - b.date.getTime() || compareStrings(a.id, b.id)),
+        byTotal: new SortedIndex((a, b) => (a.total as number) - (b.total as number) || compareStrings(a.id, b.id))
+      };
+      this.invoicesByUser.set(userId, indexes);
+    }
+    return indexes;
+  }
+
+  indexInvoice(invoice: InvoiceEntity): void {
+    const indexes = this.invoiceIndexes(invoice.userId);
+    indexes.byDate.insert(invoice);
+    if (typeof invoice.total === 'number') {
+      indexes.byTotal.insert(invoice);
+    }
+    if (invoice.invoiceNumber) {
+      this.invoicesByNumber.set(`${invoice.userId}\n${invoice.invoiceNumber}`, invoice);
+    }
+  }
+
+  unindexInvoice(invoice: InvoiceEntity): void {
+    const indexes = this.invoiceIndexes(invoice.userId);
+    indexes.byDate.remove(invoice);
+    indexes.byTotal.remove(invoice);
+    if (invoice.invoiceNumber) {
+      this.invoicesByNumber.delete(`${invoice.userId}\n${invoice.invoiceNumber}`);
+    }
+  }
+
+  addInvoice(invoice: InvoiceEntity): void {
+    this.invoices.set(invoice.id, invoice);
+    this.indexInvoice(invoice);
+  }
+
+  // Apply changes, re-indexing around them since they may move indexed fields
+  updateInvoice(invoice: InvoiceEntity, changes: Partial<InvoiceEntity>): void {
+    if (changes.invoiceNumber && changes.invoiceNumber !== invoice.invoiceNumber) {
+      const taken = this.invoicesByNumber.get(`${invoice.userId}\n${changes.invoiceNumber}`);
+      if (taken && taken !== invoice) {
+        throw new DuplicateKeyError('invoiceNumber');
+      }
+    }
+    this.unindexInvoice(invoice);
+    Object.assign(invoice, changes, { updatedAt: new Date() });
+    this.indexInvoice(invoice);
+  }
+
+  rollupIndex(userId: string, period: RollupPeriod): SortedIndex<RollupEntity> {
+    const key = `${userId}\n${period}`;
+    let index = this.rollupsByUser.get(key);
+    if (!index) {
+      index = new SortedIndex((a, b) => compareStrings(a.bucket, b.bucket));
+      this.rollupsByUser.set(key, index);
+    }
+    return index;
+  }
+
+  addRollup(rollup: RollupEntity): void {
+    this.rollups.set(`${rollup.userId}\n${rollup.period}\n${rollup.bucket}`, rollup);
+    this.rollupIndex(rollup.userId, rollup.period).insert(rollup);
+  }
+
+  removeRollup(rollup: RollupEntity): void {
+    this.rollups.delete(`${rollup.userId}\n${rollup.period}\n${rollup.bucket}`);
+    this.rollupIndex(rollup.userId, rollup.period).remove(rollup);
+  }
+
+  incrementRollup(
+    userId: string,
+    period: RollupPeriod,
+    bucket: string,
+    delta: Omit<RollupEntity, 'userId' | 'period' | 'bucket'>
+  ): void {
+    let rollup = this.rollups.get(`${userId}\n${period}\n${bucket}`);
+    if (!rollup) {
+      rollup = { userId, period, bucket, invoiceCount: 0, subtotal: 0, tax: 0, total: 0, products: {} };
+      this.addRollup(rollup);
+    }
+    rollup.invoiceCount += delta.invoiceCount;
+    rollup.subtotal += delta.subtotal;
+    rollup.tax += delta.tax;
+    rollup.total += delta.total;
+    for (const [key, product] of Object.entries(delta.products)) {
+      const existing = rollup.products[key];
+      rollup.products[key] = {
+        name: product.name,
+        qty: (existing?.qty || 0) + product.qty,
+        revenue: (existing?.revenue || 0) + product.revenue
+      };
+    }
+  }
+
+  toJSON() {
+    return {
+      version: 1,
+      users: [...this.users.values()],
+      products: [...this.products.values()],
+      invoices: [...this.invoices.values()],
+      rollups: [...this.rollups.values()],
+      revokedTokens: [...this.revokedTokens.values()],
+      counters: Object.fromEntries(this.counters)
+    };
+  }
+
+  load(snapshot: any): void {
+    const revive = <T>(record: any): T => {
+      for (const field of dateFields) {
+        if (record[field] !== undefined && record[field] !== null) {
+          record[field] = new Date(record[field]);
+        }
+      }
+      return record as T;
+    };
+    (snapshot.users || []).forEach((user: any) => this.addUser(revive<UserEntity>(user)));
+    (snapshot.products || []).forEach((product: any) => this.addProduct(revive<ProductEntity>(product)));
+    (snapshot.invoices || []).forEach((invoice: any) => this.addInvoice(revive<InvoiceEntity>(invoice)));
+    (snapshot.rollups || []).forEach((rollup: any) => this.addRollup(rollup as RollupEntity));
+    (snapshot.revokedTokens || []).forEach((token: any) => {
+      const revoked = revive<RevokedTokenEntity>(token);
+      this.revokedTokens.set(revoked.tokenHash, revoked);
+    });
+    for (const [name, value] of Object.entries(snapshot.counters || {})) {
+      this.counters.set(name, value as number);
+    }
+  }
+}
+
+// Callers get copies, as they would from a database round trip
+const copy = <T extends object>(record: T | undefined | null): T | null => (record ? { ...record } : null);
+
+// In-process driver with the same query semantics as the MongoDB one, for
+// running and load-testing the API without a database
+export const createMemoryRepositories = (overrides: Partial<MemoryRepositoryOptions> = {}): Repositories => {
+  const options = { ...optionsFromEnv(), ...overrides };
+  const store = new MemoryStore();
+  let snapshotTimer: NodeJS.Timeout | null = null;
+
+  const changed = <T>(value: T): T => {
+    store.dirty = true;
+    return value;
+  };
+
+  // Written after every reservation; writes are serialized so an older one
+  // never replaces a newer one
+  const countersPath = options.snapshotPath ? `${options.snapshotPath}.counters` : null;
+  let countersWrite: Promise<void> = Promise.resolve();
+  const saveCounters = (): Promise<void> => {
+    if (!countersPath) {
+      return Promise.resolve();
+    }
+    const data = JSON.stringify(Object.fromEntries(store.counters));
+    const write = countersWrite.catch(() => {}).then(async () => {
+      const tmpPath = `${countersPath}.tmp`;
+      await fs.promises.mkdir(path.dirname(countersPath), { recursive: true });
+      await fs.promises.writeFile(tmpPath, data);
+      await fs.promises.rename(tmpPath, countersPath);
+    });
+    countersWrite = write;
+    return write;
+  };
+
+  const saveSnapshot = async () => {
+    if (!options.snapshotPath || !store.dirty) {
+      return;
+    }
+    store.dirty = false;
+    const tmpPath = `${options.snapshotPath}.tmp`;
+    await fs.promises.mkdir(path.dirname(options.snapshotPath), { recursive: true });
+    await fs.promises.writeFile(tmpPath, JSON.stringify(store));
+    await fs.promises.rename(tmpPath, options.snapshotPath);
+  };
+
+  const users: UserRepository = {
+    async findById(id) {
+      return copy(store.users.get(id));
+    },
+
+    async findByEmail(email) {
+      return copy(store.usersByEmail.get(email));
+    },
+
+    async create(user) {
+      if (store.usersByEmail.has(user.email)) {
+        throw new DuplicateKeyError('email');
+      }
+      const now = new Date();
+      const entity: UserEntity = { id: newId(), ...user, createdAt: now, updatedAt: now };
+      store.addUser(entity);
+      return changed(copy(entity) as UserEntity);
+    },
+
+    async updatePassword(id, password) {
+      const user = store.users.get(id);
+      if (user) {
+        changed(Object.assign(user, { password, updatedAt: new Date() }));
+      }
+    }
+  };
+
+  const newProduct = (product: Parameters<ProductRepository['create']>[0], now: Date): ProductEntity => ({
+    id: newId(),
+    name: product.name,
+    nameKey: productNameKey(product.name),
+    qty: product.qty,
+    rate: product.rate,
+    userId: String(product.userId),
+    createdAt: now,
+    updatedAt: now
+  });
+
+  const products: ProductRepository = {
+    async list(userId, query) {
+      const indexes = store.productIndexes(String(userId));
+      const key = (product: ProductEntity): string | number =>
+        query.sort === 'name' ? product.nameKey : product.createdAt.getTime();
+      const after = query.after;
+      const prefix = query.prefix || '';
+
+      // Only the name order can seek to the prefix; the other one filters it
+      const index = query.sort === 'name' ? indexes.byName : indexes.byCreatedAt;
+      const seekPrefix = query.sort === 'name' && prefix !== '';
+      const matchesPrefix = (product: ProductEntity) => product.nameKey.startsWith(prefix);
+
+      let items: Iterable<ProductEntity>;
+      let stop: ((product: ProductEntity) => boolean) | undefined;
+      if (query.order === 'asc') {
+        items = index.ascending(product =>
+          (seekPrefix && product.nameKey < prefix) ||
+          (!!after && atOrBeforeCursor(key(product), product.id, after, after.value)));
+        stop = seekPrefix ? product => !matchesPrefix(product) : undefined;
+      } else {
+        items = index.descending(product =>
+          (!seekPrefix || product.nameKey < prefix + '\uffff') &&
+          (!after || beforeCursor(key(product), product.id, after, after.value)));
+        stop = seekPrefix ? product => product.nameKey < prefix : undefined;
+      }
+
+      const page = collect(items, query.limit, prefix ? matchesPrefix : undefined, stop);
+      return { items: page.items.map(product => copy(product) as ProductEntity), hasMore: page.hasMore };
+    },
+
+    async create(product) {
+      const entity = newProduct(product, new Date());
+      store.addProduct(entity);
+      return changed(copy(entity) as ProductEntity);
+    },
+
+    async insertMany(newProducts) {
+      const now = new Date();
+      const insertedIds = newProducts.map(product => {
+        const entity = newProduct(product, now);
+        store.addProduct(entity);
+        return entity.id;
+      });
+      return changed({ insertedIds, errors: [] });
+    },
+
+    async delete(userId, id) {
+      const product = store.products.get(id);
+      if (!product || product.userId !== String(userId)) {
+        return false;
+      }
+      store.removeProduct(product);
+      return changed(true);
+    },
+
+    async deleteMany(userId, ids) {
+      let deleted = 0;
+      for (const id of new Set(ids)) {
+        const product = store.products.get(id);
+        if (product && product.userId === String(userId)) {
+          store.removeProduct(product);
+          deleted++;
+        }
+      }
+      return changed(deleted);
+    }
+  };
+
+  const invoices: InvoiceRepository = {
+    async create(invoice) {
+      const now = new Date();
+      const entity: InvoiceEntity = { ...invoice, id: newId(), userId: String(invoice.userId), createdAt: now, updatedAt: now };
+      if (entity.invoiceNumber && store.invoicesByNumber.has(`${entity.userId}\n${entity.invoiceNumber}`)) {
+        throw new DuplicateKeyError('invoiceNumber');
+      }
+      store.addInvoice(entity);
+      return changed(copy(entity) as InvoiceEntity);
+    },
+
+    async findForUser(id, userId) {
+      const invoice = store.invoices.get(id);
+      return invoice && invoice.userId === String(userId) ? copy(invoice) : null;
+    },
+
+    async findByNumber(userId, invoiceNumber) {
+      return copy(store.invoicesByNumber.get(`${userId}\n${invoiceNumber}`));
+    },
+
+    async findByStatus(statuses) {
+      return [...store.invoices.values()]
+        .filter(invoice => invoice.status && statuses.includes(invoice.status))
+        .sort((a, b) => a.createdAt.getTime() - b.createdAt.getTime())
+        .map(invoice => copy(invoice) as InvoiceEntity);
+    },
+
+    async update(id, changes) {
+      const invoice = store.invoices.get(id);
+      if (invoice) {
+        store.updateInvoice(invoice, changes);
+        changed(undefined);
+      }
+    },
+
+    async upsertByNumber(userId, invoiceNumber, changes, date) {
+      const existing = store.invoicesByNumber.get(`${String(userId)}\n${invoiceNumber}`);
+      if (existing) {
+        const previous = copy(existing);
+        store.updateInvoice(existing, changes);
+        return changed(previous);
+      }
+      await invoices.create({ products: [], ...changes, userId: String(userId), invoiceNumber, date });
+      return null;
+    },
+
+    async list(userId, query) {
+      const indexes = store.invoiceIndexes(String(userId));
+      const after = query.after;
+      const inDateRange = (invoice: InvoiceEntity) =>
+        (!query.from || invoice.date >= query.from) && (!query.to || invoice.date <= query.to);
+      const inTotalRange = (invoice: InvoiceEntity) =>
+        (query.minTotal === undefined || (invoice.total as number) >= query.minTotal) &&
+        (query.maxTotal === undefined || (invoice.total as number) <= query.maxTotal);
+      const hasTotalFilter = query.minTotal !== undefined || query.maxTotal !== undefined;
+      const hasStatus = (invoice: InvoiceEntity) => (invoice.status || 'completed') === query.status;
+
+      // Newest or largest first: walk the ascending index backwards from the
+      // cursor (or the upper bound of the range) and stop at the lower bound
+      let page: Page<InvoiceEntity>;
+      if (query.sort === 'date') {
+        page = collect(
+          indexes.byDate.descending(invoice =>
+            (!query.to || invoice.date <= query.to) &&
+            (!after || beforeCursor(invoice.date.getTime(), invoice.id, after, after.value))),
+          query.limit,
+          invoice => hasStatus(invoice) &&
+            (!hasTotalFilter || (typeof invoice.total === 'number' && inTotalRange(invoice))),
+          invoice => !!query.from && invoice.date < query.from
+        );
+      } else {
+        page = collect(
+          indexes.byTotal.descending(invoice =>
+            (query.maxTotal === undefined || (invoice.total as number) <= query.maxTotal) &&
+            (!after || beforeCursor(invoice.total as number, invoice.id, after, after.value))),
+          query.limit,
+          invoice => hasStatus(invoice) && inDateRange(invoice),
+          invoice => query.minTotal !== undefined && (invoice.total as number) < query.minTotal
+        );
+      }
+
+      return {
+        items: page.items.map(invoice => {
+          const { payload, ...rest } = invoice;
+          return rest;
+        }),
+        hasMore: page.hasMore
+      };
+    }
+  };
+
+  const rollups: RollupRepository = {
+    async increment(userId, period, bucket, delta) {
+      store.incrementRollup(String(userId), period, bucket, delta);
+      changed(undefined);
+    },
+
+    async range(userId, period, from, to) {
+      const page = collect(
+        store.rollupIndex(String(userId), period).ascending(rollup => rollup.bucket < from),
+        Infinity,
+        undefined,
+        rollup => rollup.bucket > to
+      );
+      return page.items.map(rollup => ({ ...rollup, products: { ...rollup.products } }));
+    },
+
+    async rebuild(userId) {
+      for (const rollup of [...store.rollups.values()]) {
+        if (!userId || rollup.userId === String(userId)) {
+          store.removeRollup(rollup);
+        }
+      }
+
+      for (const invoice of store.invoices.values()) {
+        if ((userId && invoice.userId !== String(userId)) || typeof invoice.total !== 'number' || !invoice.contentHash) {
+          continue;
+        }
+        const lineItems: Record<string, { name: string; qty: number; revenue: number }> = {};
+        for (const product of invoice.products || []) {
+          const name = String(product?.name ?? '').trim();
+          const key = rollupProductKey(name);
+          const running = lineItems[key] || { name, qty: 0, revenue: 0 };
+          running.qty += Number(product?.qty) || 0;
+          running.revenue += Number(product?.total) || 0;
+          lineItems[key] = running;
+        }
+        for (const period of ['day', 'month'] as RollupPeriod[]) {
+          store.incrementRollup(invoice.userId, period, rollupBucket(period, invoice.date), {
+            invoiceCount: 1,
+            subtotal: invoice.subtotal || 0,
+            tax: invoice.tax || 0,
+            total: invoice.total,
+            products: lineItems
+          });
+        }
+      }
+      changed(undefined);
+    }
+  };
+
+  const revocations: RevocationRepository = {
+    async revoke(token) {
+      if (!store.revokedTokens.has(token.tokenHash)) {
+        store.revokedTokens.set(token.tokenHash, changed({ ...token }));
+      }
+    },
+
+    // Expired records are dropped here, as the TTL index does in MongoDB
+    async listActive() {
+      const now = Date.now();
+      const active: RevokedTokenEntity[] = [];
+      for (const [tokenHash, token] of store.revokedTokens) {
+        if (token.expiresAt.getTime() <= now) {
+          store.revokedTokens.delete(changed(tokenHash));
+        } else {
+          active.push({ ...token });
+        }
+      }
+      return active;
+    }
+  };
+
+  // Records are kept in roughly expiry order (completing one moves it to the
+  // end), so expired ones are dropped from the front on each claim
+  const idempotency: IdempotencyRepository = {
+    async claim(record) {
+      const now = Date.now();
+      for (const [key, existing] of store.idempotencyKeys) {
+        if (existing.expiresAt.getTime() > now) {
+          break;
+        }
+        store.idempotencyKeys.delete(key);
+      }
+      const existing = store.idempotencyKeys.get(record.key);
+      if (existing && existing.expiresAt.getTime() > now) {
+        return { ...existing };
+      }
+      store.idempotencyKeys.delete(record.key);
+      store.idempotencyKeys.set(record.key, { ...record });
+      return null;
+    },
+
+    async complete(key, response, expiresAt) {
+      const record = store.idempotencyKeys.get(key);
+      if (record) {
+        store.idempotencyKeys.delete(key);
+        store.idempotencyKeys.set(key, { ...record, state: 'done', response, expiresAt });
+      }
+    },
+
+    async release(key) {
+      store.idempotencyKeys.delete(key);
+    }
+  };
+
+  const sequences: SequenceRepository = {
+    async reserve(name, count) {
+      const value = (store.counters.get(name) || 0) + count;
+      store.counters.set(name, changed(value));
+      await saveCounters();
+      return value - count + 1;
+    }
+  };
+
+  return {
+    driver: 'memory',
+    users,
+    products,
+    invoices,
+    rollups,
+    revocations,
+    idempotency,
+    sequences,
+
+    async connect() {
+      if (options.snapshotPath) {
+        try {
+          store.load(JSON.parse(await fs.promises.readFile(options.snapshotPath, 'utf8')));
+          logger.info(`Loaded in-memory database snapshot from ${options.snapshotPath}`);
+        } catch (error: any) {
+          if (error.code !== 'ENOENT') {
+            throw error;
+          }
+        }
+        // Reservations made after the last snapshot
+        try {
+          const counters = JSON.parse(await fs.promises.readFile(countersPath as string, 'utf8'));
+          for (const [name, value] of Object.entries(counters)) {
+            store.counters.set(name, Math.max(store.counters.get(name) || 0, value as number));
+          }
+        } catch (error: any) {
+          if (error.code !== 'ENOENT') {
+            throw error;
+          }
+        }
+
+        if (options.snapshotIntervalMs > 0) {
+          snapshotTimer = setInterval(() => {
+            saveSnapshot().catch(error => logger.error('In-memory database snapshot error', error));
+          }, options.snapshotIntervalMs);
+          snapshotTimer.unref();
+        }
+      }
+    },
+
+    async close() {
+      if (snapshotTimer) {
+        clearInterval(snapshotTimer);
+        snapshotTimer = null;
+      }
+      await saveSnapshot();
+    }
+  };
+};
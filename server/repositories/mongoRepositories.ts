@@ -0,0 +1,431 @@
+import mongoose from 'mongoose';
+import connectDB from '../config/db.js';
+import Counter from '../models/counterModel.js';
+import IdempotencyKey from '../models/idempotencyKeyModel.js';
+import Invoice from '../models/invoiceModel.js';
+import Product, { productNameKey } from '../models/productModel.js';
+import RevenueRollup, { RollupPeriod } from '../models/revenueRollupModel.js';
+import RevokedToken from '../models/revokedTokenModel.js';
+import User from '../models/userModel.js';
+import {
+  DuplicateKeyError,
+  IdempotencyRecord,
+  IdempotencyRepository,
+  InvoiceEntity,
+  InvoiceRepository,
+  PageAfter,
+  ProductEntity,
+  ProductRepository,
+  Repositories,
+  RevocationRepository,
+  RevokedTokenEntity,
+  RollupEntity,
+  RollupRepository,
+  SequenceRepository,
+  UserEntity,
+  UserRepository
+} from './types.js';
+
+// Lean documents to plain records with string ids
+const toEntity = <T>(doc: any): T => {
+  if (!doc) {
+    return doc;
+  }
+  const { _id, __v, ...rest } = doc;
+  return { id: String(_id), ...rest } as T;
+};
+
+const isObjectId = (id: string) => /^[0-9a-f]{24}$/i.test(id);
+
+// Keyset condition for "after this (value, _id)" in the given direction
+const keysetAfter = (field: string, after: PageAfter, value: unknown, direction: 1 | -1) => {
+  const op = direction === 1 ? '$gt' : '$lt';
+  const id = new mongoose.Types.ObjectId(after.id);
+  return [{ [field]: { [op]: value } }, { [field]: value, _id: { [op]: id } }];
+};
+
+const users: UserRepository = {
+  async findById(id) {
+    if (!isObjectId(id)) {
+      return null;
+    }
+    return toEntity<UserEntity>(await User.findById(id).lean());
+  },
+
+  async findByEmail(email) {
+    return toEntity<UserEntity>(await User.findOne({ email }).lean());
+  },
+
+  async create(user) {
+    try {
+      const doc = await User.create(user);
+      return toEntity<UserEntity>(doc.toObject());
+    } catch (error: any) {
+      if (error?.code === 11000) {
+        throw new DuplicateKeyError('email');
+      }
+      throw error;
+    }
+  },
+
+  async updatePassword(id, password) {
+    if (isObjectId(id)) {
+      await User.updateOne({ _id: id }, { $set: { password } });
+    }
+  }
+};
+
+const products: ProductRepository = {
+  async list(userId, query) {
+    const sortField = query.sort === 'name' ? 'nameKey' : 'createdAt';
+    const direction = query.order === 'asc' ? 1 : -1;
+    const filter: Record<string, any> = { userId: String(userId) };
+
+    if (query.prefix) {
+      // Anchored, case-sensitive regex on the lowercased key is an index range scan
+      filter.nameKey = { $regex: '^' + query.prefix.replace(/[.*+?^${}()|[\]\\]/g, '\\$&') };
+    }
+    if (query.after) {
+      const value = sortField === 'createdAt' ? new Date(query.after.value) : query.after.value;
+      filter.$or = keysetAfter(sortField, query.after, value, direction);
+    }
+
+    // One extra document tells whether another page follows
+    const docs = await Product.find(filter)
+      .sort({ [sortField]: direction, _id: direction })
+      .limit(query.limit + 1)
+      .select('name qty rate userId nameKey createdAt updatedAt')
+      .lean();
+
+    return {
+      items: docs.slice(0, query.limit).map(doc => toEntity<ProductEntity>(doc)),
+      hasMore: docs.length > query.limit
+    };
+  },
+
+  async create(product) {
+    const doc = await Product.create(product);
+    return toEntity<ProductEntity>(doc.toObject());
+  },
+
+  async insertMany(newProducts) {
+    // Documents are validated by the caller and keyed here, so Mongoose
+    // hydration is skipped
+    const now = new Date();
+    const docs = newProducts.map(product => ({
+      _id: new mongoose.Types.ObjectId(),
+      ...product,
+      nameKey: productNameKey(product.name),
+      createdAt: now,
+      updatedAt: now
+    }));
+    const insertedIds: Array<string | null> = docs.map(doc => String(doc._id));
+    const errors: Array<{ index: number; message: string }> = [];
+
+    try {
+      await Product.insertMany(docs, { ordered: false, lean: true });
+    } catch (error: any) {
+      const writeErrors = error?.writeErrors;
+      if (!Array.isArray(writeErrors)) {
+        throw error;
+      }
+      for (const writeError of writeErrors) {
+        insertedIds[writeError.index] = null;
+        errors.push({ index: writeError.index, message: writeError.errmsg || 'Failed to insert product' });
+      }
+    }
+    return { insertedIds, errors };
+  },
+
+  async delete(userId, id) {
+    if (!isObjectId(id)) {
+      return false;
+    }
+    const doc = await Product.findOneAndDelete({ _id: id, userId: String(userId) });
+    return !!doc;
+  },
+
+  async deleteMany(userId, ids) {
+    const result = await Product.deleteMany({ _id: { $in: ids.filter(isObjectId) }, userId: String(userId) });
+    return result.deletedCount;
+  }
+};
+
+const invoices: InvoiceRepository = {
+  async create(invoice) {
+    const doc = await Invoice.create(invoice);
+    return toEntity<InvoiceEntity>(doc.toObject());
+  },
+
+  async findForUser(id, userId) {
+    if (!isObjectId(id)) {
+      return null;
+    }
+    return toEntity<InvoiceEntity>(await Invoice.findOne({ _id: id, userId: String(userId) }).lean());
+  },
+
+  async findByNumber(userId, invoiceNumber) {
+    return toEntity<InvoiceEntity>(await Invoice.findOne({ userId: String(userId), invoiceNumber }).lean());
+  },
+
+  async findByStatus(statuses) {
+    const docs = await Invoice.find({ status: { $in: statuses } }).sort({ createdAt: 1 }).lean();
+    return docs.map(doc => toEntity<InvoiceEntity>(doc));
+  },
+
+  async update(id, changes) {
+    await Invoice.updateOne({ _id: id }, { $set: changes });
+  },
+
+  async upsertByNumber(userId, invoiceNumber, changes, date) {
+    const previous = await Invoice.findOneAndUpdate(
+      { userId: String(userId), invoiceNumber },
+      { $set: changes, $setOnInsert: { date } },
+      { upsert: true, new: false }
+    ).lean();
+    return previous ? toEntity<InvoiceEntity>(previous) : null;
+  },
+
+  async list(userId, query) {
+    const filter: Record<string, any> = {
+      userId: String(userId),
+      status: query.status === 'completed' ? { $in: ['completed', null] } : query.status
+    };
+
+    if (query.from || query.to) {
+      filter.date = {
+        ...(query.from && { $gte: query.from }),
+        ...(query.to && { $lte: query.to })
+      };
+    }
+    if (query.minTotal !== undefined || query.maxTotal !== undefined || query.sort === 'total') {
+      filter.total = {
+        $type: 'number',
+        ...(query.minTotal !== undefined && { $gte: query.minTotal }),
+        ...(query.maxTotal !== undefined && { $lte: query.maxTotal })
+      };
+    }
+    if (query.after) {
+      const value = query.sort === 'date' ? new Date(query.after.value) : query.after.value;
+      filter.$or = keysetAfter(query.sort, query.after, value, -1);
+    }
+
+    const docs = await Invoice.find(filter)
+      .sort({ [query.sort]: -1, _id: -1 })
+      .limit(query.limit + 1)
+      .select('-payload')
+      .lean();
+
+    return {
+      items: docs.slice(0, query.limit).map(doc => toEntity<InvoiceEntity>(doc)),
+      hasMore: docs.length > query.limit
+    };
+  }
+};
+
+const bucketFormats: Record<RollupPeriod, string> = {
+  day: '%Y-%m-%d',
+  month: '%Y-%m'
+};
+
+// Aggregation counterpart of rollupProductKey()
+const productKeyExpression = {
+  $let: {
+    vars: {
+      key: {
+        $replaceAll: {
+          input: { $replaceAll: { input: '$_id.name', find: '.', replacement: '．' } },
+          find: '$',
+          replacement: '＄'
+        }
+      }
+    },
+    in: { $cond: [{ $eq: ['$$key', ''] }, '(unnamed)', '$$key'] }
+  }
+};
+
+// Invoice totals count once per invoice, on its first line
+const onFirstLine = (value: unknown) => ({ $cond: [{ $lte: [{ $ifNull: ['$line', 0] }, 0] }, value, 0] });
+
+const rollups: RollupRepository = {
+  async increment(userId, period, bucket, delta) {
+    const inc: Record<string, number> = {
+      invoiceCount: delta.invoiceCount,
+      subtotal: delta.subtotal,
+      tax: delta.tax,
+      total: delta.total
+    };
+    const set: Record<string, string> = {};
+    for (const [key, product] of Object.entries(delta.products)) {
+      inc[`products.${key}.qty`] = product.qty;
+      inc[`products.${key}.revenue`] = product.revenue;
+      set[`products.${key}.name`] = product.name;
+    }
+
+    await RevenueRollup.updateOne(
+      { userId: String(userId), period, bucket },
+      Object.keys(set).length > 0 ? { $inc: inc, $set: set } : { $inc: inc },
+      { upsert: true }
+    );
+  },
+
+  async range(userId, period, from, to) {
+    const docs = await RevenueRollup.find({ userId: String(userId), period, bucket: { $gte: from, $lte: to } })
+      .sort({ bucket: 1 })
+      .select('userId period bucket invoiceCount subtotal tax total products')
+      .lean();
+    return docs.map(({ _id, ...doc }) => doc as unknown as RollupEntity);
+  },
+
+  // Each period is rebuilt by a single aggregation that $merges into the
+  // rollup collection, so the data never passes through this process
+  async rebuild(userId) {
+    const scope = userId ? { userId: String(userId) } : {};
+    await RevenueRollup.deleteMany(scope);
+
+    for (const period of ['day', 'month'] as RollupPeriod[]) {
+      await Invoice.aggregate([
+        { $match: { ...scope, total: { $type: 'number' }, contentHash: { $exists: true } } },
+        { $addFields: { bucket: { $dateToString: { format: bucketFormats[period], date: '$date', timezone: 'UTC' } } } },
+        { $unwind: { path: '$products', includeArrayIndex: 'line', preserveNullAndEmptyArrays: true } },
+        {
+          $group: {
+            _id: { userId: '$userId', bucket: '$bucket', name: { $trim: { input: { $ifNull: ['$products.name', ''] } } } },
+            qty: { $sum: { $ifNull: ['$products.qty', 0] } },
+            revenue: { $sum: { $ifNull: ['$products.total', 0] } },
+            invoiceCount: { $sum: onFirstLine(1) },
+            subtotal: { $sum: onFirstLine('$subtotal') },
+            tax: { $sum: onFirstLine('$tax') },
+            total: { $sum: onFirstLine('$total') }
+          }
+        },
+        {
+          $group: {
+            _id: { userId: '$_id.userId', bucket: '$_id.bucket' },
+            invoiceCount: { $sum: '$invoiceCount' },
+            subtotal: { $sum: '$subtotal' },
+            tax: { $sum: '$tax' },
+            total: { $sum: '$total' },
+            products: { $push: { k: productKeyExpression, v: { name: '$_id.name', qty: '$qty', revenue: '$revenue' } } }
+          }
+        },
+        {
+          $project: {
+            _id: 0,
+            userId: '$_id.userId',
+            period: { $literal: period },
+            bucket: '$_id.bucket',
+            invoiceCount: 1,
+            subtotal: 1,
+            tax: 1,
+            total: 1,
+            products: { $arrayToObject: '$products' },
+            createdAt: '$$NOW',
+            updatedAt: '$$NOW'
+          }
+        },
+        {
+          $merge: {
+            into: RevenueRollup.collection.collectionName,
+            on: ['userId', 'period', 'bucket'],
+            whenMatched: 'replace',
+            whenNotMatched: 'insert'
+          }
+        }
+      ]);
+    }
+  }
+};
+
+const revocations: RevocationRepository = {
+  async revoke(token) {
+    await RevokedToken.updateOne(
+      { tokenHash: token.tokenHash },
+      { $setOnInsert: { userId: token.userId, expiresAt: token.expiresAt } },
+      { upsert: true }
+    );
+  },
+
+  async listActive() {
+    const docs = await RevokedToken.find({ expiresAt: { $gt: new Date() } })
+      .select({ _id: 0, tokenHash: 1, userId: 1, expiresAt: 1 })
+      .lean();
+    return docs as RevokedTokenEntity[];
+  }
+};
+
+// Lean documents hold binary fields as BSON Binary rather than Buffer
+const toIdempotencyRecord = (doc: any): IdempotencyRecord => {
+  const { _id, __v, createdAt, updatedAt, ...record } = doc;
+  if (record.response?.body && !Buffer.isBuffer(record.response.body)) {
+    record.response.body = Buffer.from(record.response.body.buffer);
+  }
+  return record as IdempotencyRecord;
+};
+
+const idempotency: IdempotencyRepository = {
+  async claim(record) {
+    // An expired record frees its key before the TTL monitor gets to it
+    await IdempotencyKey.deleteOne({ key: record.key, expiresAt: { $lte: new Date() } });
+    try {
+      const existing = await IdempotencyKey.findOneAndUpdate(
+        { key: record.key },
+        { $setOnInsert: record },
+        { upsert: true, new: false }
+      ).lean();
+      return existing ? toIdempotencyRecord(existing) : null;
+    } catch (error: any) {
+      // Lost a race to insert the same key
+      if (error?.code === 11000) {
+        const existing = await IdempotencyKey.findOne({ key: record.key }).lean();
+        if (existing) {
+          return toIdempotencyRecord(existing);
+        }
+      }
+      throw error;
+    }
+  },
+
+  async complete(key, response, expiresAt) {
+    await IdempotencyKey.updateOne({ key }, { $set: { state: 'done', response, expiresAt } });
+  },
+
+  async release(key) {
+    await IdempotencyKey.deleteOne({ key });
+  }
+};
+
+const sequences: SequenceRepository = {
+  async reserve(name, count) {
+    const update = () => Counter.findOneAndUpdate(
+      { _id: name },
+      { $inc: { value: count } },
+      { upsert: true, new: true }
+    ).lean();
+    let counter;
+    try {
+      counter = await update();
+    } catch (error: any) {
+      // Two first reservations raced to insert the counter; the loser increments it
+      if (error?.code !== 11000) {
+        throw error;
+      }
+      counter = await update();
+    }
+    return (counter as any).value - count + 1;
+  }
+};
+
+// MongoDB through the Mongoose models
+export const createMongoRepositories = (): Repositories => ({
+  driver: 'mongodb',
+  users,
+  products,
+  invoices,
+  rollups,
+  revocations,
+  idempotency,
+  sequences,
+  connect: () => connectDB(),
+  close: () => mongoose.disconnect()
+});
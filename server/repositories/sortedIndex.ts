@@ -0,0 +1,65 @@
+// Array kept sorted by a comparator, for ordered scans in the in-memory
+// driver. Lookups are binary searches; inserts and removals shift the array,
+// which is cheap at the per-user sizes it holds.
+export class SortedIndex<T> {
+  private items: T[] = [];
+
+  constructor(private compare: (a: T, b: T) => number) {}
+
+  get size(): number {
+    return this.items.length;
+  }
+
+  insert(item: T): void {
+    this.items.splice(this.lowerBound(item), 0, item);
+  }
+
+  remove(item: T): boolean {
+    const index = this.lowerBound(item);
+    // Equal keys may sit next to each other; find this exact item
+    for (let i = index; i < this.items.length && this.compare(this.items[i], item) === 0; i++) {
+      if (this.items[i] === item) {
+        this.items.splice(i, 1);
+        return true;
+      }
+    }
+    return false;
+  }
+
+  // Ascending, from the first item for which `skip` is false. `skip` must
+  // hold for a prefix of the index (e.g. "sorts at or before the cursor").
+  *ascending(skip?: (item: T) => boolean): Generator<T> {
+    for (let i = skip ? this.partition(skip) : 0; i < this.items.length; i++) {
+      yield this.items[i];
+    }
+  }
+
+  // Descending, from the last item for which `take` is true. `take` must
+  // hold for a prefix of the index (e.g. "sorts before the cursor").
+  *descending(take?: (item: T) => boolean): Generator<T> {
+    for (let i = (take ? this.partition(take) : this.items.length) - 1; i >= 0; i--) {
+      yield this.items[i];
+    }
+  }
+
+  // First index where the comparator puts `item` at or after the existing element
+  private lowerBound(item: T): number {
+    return this.partition(existing => this.compare(existing, item) < 0);
+  }
+
+  // First index for which `predicate` is false; the predicate must be true
+  // for a prefix of the array and false after it
+  private partition(predicate: (item: T) => boolean): number {
+    let low = 0;
+    let high = this.items.length;
+    while (low < high) {
+      const mid = (low + high) >>> 1;
+      if (predicate(this.items[mid])) {
+        low = mid + 1;
+      } else {
+        high = mid;
+      }
+    }
+    return low;
+  }
+}
@@ -0,0 +1,227 @@
+import type { InvoiceStatus } from '../models/invoiceModel.js';
+import type { RollupPeriod } from '../models/revenueRollupModel.js';
+
+// Plain records handed to routes and services by every driver. Ids are
+// 24-character hex strings (ObjectId format) in both drivers.
+
+export interface UserEntity {
+  id: string;
+  name: string;
+  email: string;
+  password: string;
+  createdAt: Date;
+  updatedAt: Date;
+}
+
+export interface ProductEntity {
+  id: string;
+  name: string;
+  nameKey: string;
+  qty: number;
+  rate: number;
+  userId: string;
+  createdAt: Date;
+  updatedAt: Date;
+}
+
+export interface InvoiceLineItem {
+  name: string;
+  qty: number;
+  rate: number;
+  total: number;
+}
+
+export interface InvoiceEntity {
+  id: string;
+  userId: string;
+  products: any[];
+  date: Date;
+  status?: InvoiceStatus;
+  invoiceNumber?: string;
+  subtotal?: number;
+  tax?: number;
+  total?: number;
+  contentHash?: string;
+  engine?: string;
+  size?: number;
+  payload?: any;
+  filename?: string;
+  error?: string;
+  attempts?: number;
+  completedAt?: Date;
+  createdAt: Date;
+  updatedAt: Date;
+}
+
+export interface RevokedTokenEntity {
+  tokenHash: string;
+  userId: string;
+  expiresAt: Date;
+}
+
+export interface StoredResponse {
+  status: number;
+  headers: Record<string, string>;
+  body: Buffer;
+}
+
+// A mutating request made with an Idempotency-Key. Pending while the first
+// request runs; done once its response is stored for replay.
+export interface IdempotencyRecord {
+  // Hash of user, route and client key
+  key: string;
+  userId: string;
+  // Hash of the request body and query, to reject a key reused for another request
+  fingerprint: string;
+  state: 'pending' | 'done';
+  response?: StoredResponse;
+  expiresAt: Date;
+}
+
+export interface RollupProduct {
+  name: string;
+  qty: number;
+  revenue: number;
+}
+
+export interface RollupEntity {
+  userId: string;
+  period: RollupPeriod;
+  bucket: string;
+  invoiceCount: number;
+  subtotal: number;
+  tax: number;
+  total: number;
+  products: Record<string, RollupProduct>;
+}
+
+// Keyset position: the sort value and id of the last item on the previous page
+export interface PageAfter {
+  value: string | number;
+  id: string;
+}
+
+export interface Page<T> {
+  items: T[];
+  hasMore: boolean;
+}
+
+export interface ProductListQuery {
+  sort: 'createdAt' | 'name';
+  order: 'asc' | 'desc';
+  limit: number;
+  // Lowercased name prefix
+  prefix?: string;
+  after?: PageAfter;
+}
+
+export interface InvoiceListQuery {
+  sort: 'date' | 'total';
+  limit: number;
+  // Invoices recorded without a status count as completed
+  status: InvoiceStatus;
+  from?: Date;
+  to?: Date;
+  minTotal?: number;
+  maxTotal?: number;
+  after?: PageAfter;
+}
+
+export type NewProduct = Pick<ProductEntity, 'name' | 'qty' | 'rate' | 'userId'>;
+
+export interface InsertManyResult {
+  insertedIds: Array<string | null>;
+  errors: Array<{ index: number; message: string }>;
+}
+
+export interface UserRepository {
+  findById(id: string): Promise<UserEntity | null>;
+  findByEmail(email: string): Promise<UserEntity | null>;
+  // Throws DuplicateKeyError when the email is taken
+  create(user: Pick<UserEntity, 'name' | 'email' | 'password'>): Promise<UserEntity>;
+  updatePassword(id: string, password: string): Promise<void>;
+}
+
+export interface ProductRepository {
+  list(userId: string, query: ProductListQuery): Promise<Page<ProductEntity>>;
+  create(product: NewProduct): Promise<ProductEntity>;
+  // Unordered: a failing product does not stop the others
+  insertMany(products: NewProduct[]): Promise<InsertManyResult>;
+  delete(userId: string, id: string): Promise<boolean>;
+  deleteMany(userId: string, ids: string[]): Promise<number>;
+}
+
+export interface InvoiceRepository {
+  create(invoice: Omit<InvoiceEntity, 'id' | 'createdAt' | 'updatedAt'>): Promise<InvoiceEntity>;
+  findForUser(id: string, userId: string): Promise<InvoiceEntity | null>;
+  findByNumber(userId: string, invoiceNumber: string): Promise<InvoiceEntity | null>;
+  // Render jobs in the given states, oldest first
+  findByStatus(statuses: InvoiceStatus[]): Promise<InvoiceEntity[]>;
+  update(id: string, changes: Partial<InvoiceEntity>): Promise<void>;
+  // Set fields on the invoice with this number, creating it dated `date` if
+  // missing. Resolves with the invoice as it was before, or null if created.
+  upsertByNumber(
+    userId: string,
+    invoiceNumber: string,
+    changes: Partial<InvoiceEntity>,
+    date: Date
+  ): Promise<InvoiceEntity | null>;
+  list(userId: string, query: InvoiceListQuery): Promise<Page<InvoiceEntity>>;
+}
+
+export interface RollupRepository {
+  // Add counts and totals to a bucket, creating it if missing
+  increment(
+    userId: string,
+    period: RollupPeriod,
+    bucket: string,
+    delta: Omit<RollupEntity, 'userId' | 'period' | 'bucket'>
+  ): Promise<void>;
+  // Buckets from..to inclusive, in order
+  range(userId: string, period: RollupPeriod, from: string, to: string): Promise<RollupEntity[]>;
+  // Recompute from recorded invoices, for one user or everyone
+  rebuild(userId?: string): Promise<void>;
+}
+
+export interface RevocationRepository {
+  // Idempotent: revoking a token twice keeps one record
+  revoke(token: RevokedTokenEntity): Promise<void>;
+  // Revoked tokens that have not expired yet
+  listActive(): Promise<RevokedTokenEntity[]>;
+}
+
+export interface IdempotencyRepository {
+  // Insert a pending record unless an unexpired one holds the key. Resolves
+  // with that record, or null when this call claimed the key.
+  claim(record: IdempotencyRecord): Promise<IdempotencyRecord | null>;
+  complete(key: string, response: StoredResponse, expiresAt: Date): Promise<void>;
+  // Drop the record so the next request with the key runs again
+  release(key: string): Promise<void>;
+}
+
+export interface SequenceRepository {
+  // Advance the named sequence by count, creating it at 0 if missing.
+  // Resolves with the first number of the reserved block.
+  reserve(name: string, count: number): Promise<number>;
+}
+
+export interface Repositories {
+  readonly driver: string;
+  users: UserRepository;
+  products: ProductRepository;
+  invoices: InvoiceRepository;
+  rollups: RollupRepository;
+  revocations: RevocationRepository;
+  idempotency: IdempotencyRepository;
+  sequences: SequenceRepository;
+  connect(): Promise<void>;
+  close(): Promise<void>;
+}
+
+// Unique field already taken (e.g. a registered email)
+export class DuplicateKeyError extends Error {
+  constructor(field: string) {
+    super(`Duplicate value for ${field}`);
+    this.name = 'DuplicateKeyError';
+  }
+}
@@ -0,0 +1,78 @@
+import express, { Request, Response } from 'express';
+import { requireAdmin } from '../middleware/adminAuth.js';
+import authCache from '../services/authCache.js';
+import idempotencyKeys from '../services/idempotencyKeys.js';
+import { pdfCache } from '../services/invoiceRenderer.js';
+import overloadController from '../services/overloadController.js';
+import passwordHasher from '../services/passwordHasher.js';
+import productCache from '../services/productCache.js';
+import renderScheduler from '../services/renderScheduler.js';
+import logger from '../utils/logger.js';
+import tracer from '../utils/tracing.js';
+
+const router = express.Router();
+
+router.use(requireAdmin);
+
+// GET /api/admin/traces - Slow request traces kept by this process, newest first.
+// ?limit= caps how many are returned. Each cluster worker keeps its own.
+router.get('/traces', (req: Request, res: Response) => {
+  const limit = Math.max(1, parseInt(String(req.query.limit ?? ''), 10) || 50);
+  res.json({
+    message: 'Traces retrieved successfully',
+    pid: process.pid,
+    stats: tracer.stats(),
+    traces: tracer.recent(limit)
+  });
+});
+
+// GET /api/admin/traces/:id - One kept trace, by request id
+router.get('/traces/:id', (req: Request, res: Response) => {
+  const trace = tracer.find(req.params.id);
+  if (!trace) {
+    return res.status(404).json({ message: 'Trace not found' });
+  }
+  res.json({ message: 'Trace retrieved successfully', trace });
+});
+
+// POST /api/admin/traces/dump - Write the kept traces to TRACE_DUMP_PATH on this host
+router.post('/traces/dump', async (req: Request, res: Response) => {
+  try {
+    const dumped = await tracer.dump();
+    res.json({ message: 'Traces written', ...dumped });
+  } catch (error) {
+    logger.error('Trace dump error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+// Stats endpoints: GET /api/admin/<path> answers with this process's
+// source.stats(). Each cluster worker reports its own.
+const statsEndpoints: Array<{ path: string; label: string; source: { stats(): unknown } }> = [
+  // Load shedding state, lag and shed counts
+  { path: '/overload', label: 'Overload', source: overloadController },
+  // Idempotency-Key claims, replays and conflicts
+  { path: '/idempotency', label: 'Idempotency', source: idempotencyKeys },
+  // Render cache hit/miss counters
+  { path: '/pdf-cache', label: 'PDF cache', source: pdfCache },
+  // Render queue depth and wait times
+  { path: '/render-queue', label: 'PDF queue', source: renderScheduler },
+  // Product listing cache hit/miss counters
+  { path: '/product-cache', label: 'Product cache', source: productCache },
+  // Token and user cache hit/miss and revocation counters
+  { path: '/auth-cache', label: 'Auth cache', source: authCache },
+  // Password hashing pool utilisation and bcrypt cost
+  { path: '/password-hasher', label: 'Password hasher', source: passwordHasher }
+];
+
+for (const { path, label, source } of statsEndpoints) {
+  router.get(path, (req: Request, res: Response) => {
+    res.json({
+      message: `${label} stats retrieved successfully`,
+      pid: process.pid,
+      stats: source.stats()
+    });
+  });
+}
+
+export default router;
@@ -1,13 +1,31 @@
 import express, { Request, Response } from 'express';
-import bcrypt from 'bcrypt';
 import jwt from 'jsonwebtoken';
-import User from '../models/userModel.js';
+import { authenticateToken as auth } from '../middleware/auth.js';
+import repositories, { DuplicateKeyError } from '../repositories/index.js';
+import authCache from '../services/authCache.js';
+import passwordHasher from '../services/passwordHasher.js';
+import { QueueFullError, QueueTimeoutError } from '../services/renderScheduler.js';
+import logger from '../utils/logger.js';
 
 const router = express.Router();
 
 // Email validation regex
 const emailRegex = /^[^\s@]+@[^\s@]+\.[^\s@]+$/;
 
+// Hashing runs on a bounded pool; a full or slow queue means retry later
+const sendHasherBusy = (res: Response, error: unknown): boolean => {
+  if (error instanceof QueueFullError) {
+    res.setHeader('Retry-After', String(error.retryAfterSeconds));
+    res.status(503).json({ message: 'Server is busy, please retry' });
+    return true;
+  }
+  if (error instanceof QueueTimeoutError) {
+    res.status(503).json({ message: 'Server is busy, please retry' });
+    return true;
+  }
+  return false;
+};
+
 // Register endpoint
 router.post('/register', async (req: Request, res: Response) => {
   try {
@@ -23,55 +41,22 @@ router.post('/register', async (req: Request, res: Response) => {
       return res.status(400).json({ message: 'Invalid email format' });
     }
 
-    // For testing without MongoDB, simulate user registration
-    if (!process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017')) {
-      // Hash password
-      const saltRounds = 10;
-      const hashedPassword = await bcrypt.hash(password, saltRounds);
-
-      // Generate JWT token with mock user ID
-      const mockUserId = 'mock_user_' + Date.now();
-      const jwtSecret = process.env.JWT_SECRET;
-      if (!jwtSecret) {
-        return res.status(500).json({ message: 'JWT secret not configured' });
-      }
-
-      const token = jwt.sign(
-        { userId: mockUserId, email },
-        jwtSecret,
-        { expiresIn: '24h' }
-      );
-
-      return res.status(201).json({
-        message: 'User registered successfully (test mode)',
-        token,
-        user: {
-          id: mockUserId,
-          name,
-          email
-        }
-      });
-    }
-
     // Check if user already exists
-    const existingUser = await User.findOne({ email });
+    const existingUser = await repositories().users.findByEmail(email);
     if (existingUser) {
       return res.status(400).json({ message: 'User already exists with this email' });
     }
 
-    // Hash password
-    const saltRounds = 10;
-    const hashedPassword = await bcrypt.hash(password, saltRounds);
+    // Hash password at the calibrated cost
+    const hashedPassword = await passwordHasher.hash(password);
 
     // Create new user
-    const user = new User({
+    const user = await repositories().users.create({
       name,
       email,
       password: hashedPassword
     });
 
-    await user.save();
-
     // Generate JWT token
     const jwtSecret = process.env.JWT_SECRET;
     if (!jwtSecret) {
@@ -79,7 +64,7 @@ router.post('/register', async (req: Request, res: Response) => {
     }
 
     const token = jwt.sign(
-      { userId: user._id },
+      { userId: user.id },
       jwtSecret,
       { expiresIn: '24h' }
     );
@@ -88,13 +73,19 @@ router.post('/register', async (req: Request, res: Response) => {
       message: 'User registered successfully',
       token,
       user: {
-        id: user._id,
+        id: user.id,
         name: user.name,
         email: user.email
       }
     });
   } catch (error) {
-    console.error('Registration error:', error);
+    if (error instanceof DuplicateKeyError) {
+      return res.status(400).json({ message: 'User already exists with this email' });
+    }
+    if (sendHasherBusy(res, error)) {
+      return;
+    }
+    logger.error('Registration error', error);
     res.status(500).json({ message: 'Internal server error' });
   }
 });
@@ -114,44 +105,29 @@ router.post('/login', async (req: Request, res: Response) => {
       return res.status(400).json({ message: 'Invalid email format' });
     }
 
-    // For testing without MongoDB, simulate user login
-    if (!process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017')) {
-      // In test mode, accept any valid email/password combination
-      const mockUserId = 'mock_user_' + Date.now();
-      const jwtSecret = process.env.JWT_SECRET;
-      if (!jwtSecret) {
-        return res.status(500).json({ message: 'JWT secret not configured' });
-      }
-
-      const token = jwt.sign(
-        { userId: mockUserId, email },
-        jwtSecret,
-        { expiresIn: '24h' }
-      );
-
-      return res.json({
-        message: 'Login successful (test mode)',
-        token,
-        user: {
-          id: mockUserId,
-          name: 'Test User',
-          email
-        }
-      });
-    }
-
     // Find user by email
-    const user = await User.findOne({ email });
+    const user = await repositories().users.findByEmail(email);
     if (!user) {
       return res.status(401).json({ message: 'Invalid credentials' });
     }
 
     // Verify password
-    const isPasswordValid = await bcrypt.compare(password, user.password);
-    if (!isPasswordValid) {
+    const { valid, needsRehash } = await passwordHasher.verify(password, user.password);
+    if (!valid) {
       return res.status(401).json({ message: 'Invalid credentials' });
     }
 
+    // Upgrade hashes made at a lower cost, off the response path
+    if (needsRehash) {
+      passwordHasher.hash(password)
+        .then(hash => repositories().users.updatePassword(user.id, hash))
+        .then(() => {
+          passwordHasher.recordRehash();
+          authCache.invalidateUser(user.id);
+        })
+        .catch(error => logger.error('Password rehash error', error));
+    }
+
     // Generate JWT token
     const jwtSecret = process.env.JWT_SECRET;
     if (!jwtSecret) {
@@ -159,7 +135,7 @@ router.post('/login', async (req: Request, res: Response) => {
     }
 
     const token = jwt.sign(
-      { userId: user._id },
+      { userId: user.id },
       jwtSecret,
       { expiresIn: '24h' }
     );
@@ -168,15 +144,31 @@ router.post('/login', async (req: Request, res: Response) => {
       message: 'Login successful',
       token,
       user: {
-        id: user._id,
+        id: user.id,
         name: user.name,
         email: user.email
       }
     });
   } catch (error) {
-    console.error('Login error:', error);
+    if (sendHasherBusy(res, error)) {
+      return;
+    }
+    logger.error('Login error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+// Logout endpoint - revokes the presented token for the rest of its lifetime
+router.post('/logout', auth, async (req: Request, res: Response) => {
+  try {
+    const { tokenHash, userId, expiresAt } = (req as any).auth;
+    await authCache.revoke(tokenHash, { userId, expiresAt });
+
+    res.json({ message: 'Logout successful' });
+  } catch (error) {
+    logger.error('Logout error', error);
     res.status(500).json({ message: 'Internal server error' });
   }
 });
 
-export default router;
\ No newline at end of file
+export default router;
@@ -0,0 +1,109 @@
+import express, { Request, Response } from 'express';
+import { pipeline } from 'stream/promises';
+import { authenticateToken as auth } from '../middleware/auth.js';
+import { InvoiceQuery, listInvoices } from '../services/invoiceHistory.js';
+import { getInvoiceStore } from '../services/storage/invoiceStore.js';
+import { CursorError, parseLimit } from '../utils/cursor.js';
+import logger from '../utils/logger.js';
+
+const router = express.Router();
+
+const optionalDate = (value: unknown): Date | undefined | null => {
+  if (value === undefined || value === '') {
+    return undefined;
+  }
+  const date = new Date(String(value));
+  return isNaN(date.getTime()) ? null : date;
+};
+
+const optionalAmount = (value: unknown): number | undefined | null => {
+  if (value === undefined || value === '') {
+    return undefined;
+  }
+  const amount = Number(value);
+  return Number.isFinite(amount) ? amount : null;
+};
+
+// GET /api/invoices - Invoice history, paginated with ?cursor= and ?limit=.
+// Filters: ?from=&to= (dates), ?minTotal=&maxTotal=,
+// ?status=completed|queued|rendering|failed (completed by default); ?sort=date|total
+router.get('/', auth, async (req: Request, res: Response) => {
+  try {
+    const from = optionalDate(req.query.from);
+    const to = optionalDate(req.query.to);
+    if (from === null || to === null) {
+      return res.status(400).json({ message: 'from and to must be valid dates' });
+    }
+
+    const minTotal = optionalAmount(req.query.minTotal);
+    const maxTotal = optionalAmount(req.query.maxTotal);
+    if (minTotal === null || maxTotal === null) {
+      return res.status(400).json({ message: 'minTotal and maxTotal must be numbers' });
+    }
+
+    const sort = req.query.sort ?? 'date';
+    if (sort !== 'date' && sort !== 'total') {
+      return res.status(400).json({ message: 'sort must be date or total' });
+    }
+
+    const status = req.query.status ?? 'completed';
+    if (status !== 'completed' && status !== 'queued' && status !== 'rendering' && status !== 'failed') {
+      return res.status(400).json({ message: 'status must be completed, queued, rendering or failed' });
+    }
+
+    const query: InvoiceQuery = {
+      from,
+      to,
+      minTotal,
+      maxTotal,
+      status,
+      sort,
+      limit: parseLimit(req.query.limit, 25, 100),
+      cursor: typeof req.query.cursor === 'string' && req.query.cursor ? req.query.cursor : undefined
+    };
+
+    const page = await listInvoices((req as any).user._id, query);
+
+    res.status(200).json({
+      message: 'Invoices retrieved successfully',
+      ...page
+    });
+  } catch (error) {
+    if (error instanceof CursorError) {
+      return res.status(400).json({ message: error.message });
+    }
+    logger.error('Invoices fetch error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+// GET /api/invoices/:invoiceNumber/file - Download a rendered invoice
+router.get('/:invoiceNumber/file', auth, async (req: Request, res: Response) => {
+  try {
+    const store = getInvoiceStore();
+    const entry = await store.lookup(String((req as any).user?._id), req.params.invoiceNumber);
+    if (!entry) {
+      return res.status(404).json({ message: 'Invoice not found' });
+    }
+
+    // The file may have been evicted by the storage cleanup
+    const fileStream = await store.openRead(entry);
+    if (!fileStream) {
+      return res.status(410).json({ message: 'PDF file is no longer available' });
+    }
+
+    res.setHeader('Content-Type', 'application/pdf');
+    res.setHeader('Content-Disposition', `attachment; filename="${entry.filename}"`);
+    res.setHeader('Content-Length', entry.size);
+    await pipeline(fileStream, res);
+  } catch (error) {
+    logger.error('Invoice download error', error);
+    if (res.headersSent) {
+      res.destroy();
+      return;
+    }
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+export default router;
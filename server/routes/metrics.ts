@@ -0,0 +1,33 @@
+import express, { Request, Response } from 'express';
+import { hasBearerToken } from '../middleware/adminAuth.js';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+
+const router = express.Router();
+
+// Scrapers send METRICS_TOKEN, or ADMIN_TOKEN when no separate metrics token
+// is set, as a bearer token. Without either the endpoint does not exist, as
+// the operator endpoints under /api/admin do not.
+const scrapeToken = (): string | undefined => process.env.METRICS_TOKEN || process.env.ADMIN_TOKEN;
+
+// GET /metrics - Prometheus text exposition of this process's metrics
+router.get('/', async (req: Request, res: Response) => {
+  const token = scrapeToken();
+  if (!token) {
+    return res.status(404).json({ message: 'Not found' });
+  }
+  if (!hasBearerToken(req, token)) {
+    return res.status(401).json({ message: 'Metrics token required' });
+  }
+  try {
+    const body = await metrics.render();
+    res.setHeader('Content-Type', 'text/plain; version=0.0.4; charset=utf-8');
+    res.setHeader('Cache-Control', 'no-store');
+    res.send(body);
+  } catch (error) {
+    logger.error('Metrics render error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+export default router;
@@ -1,250 +1,431 @@
 import express, { Request, Response } from 'express';
-import puppeteer from 'puppeteer';
-import path from 'path';
-import fs from 'fs';
+import { Readable } from 'stream';
+import { pipeline } from 'stream/promises';
+import { setTimeout as delay } from 'timers/promises';
 import { authenticateToken as auth } from '../middleware/auth.js';
+import idempotencyKeys from '../services/idempotencyKeys.js';
+import pagePool from '../services/pagePool.js';
+import renderScheduler, { QueueFullError, QueueTimeoutError } from '../services/renderScheduler.js';
+import renderJobs, { RenderJob } from '../services/renderJobs.js';
+import { RenderTimings, observeRenderTimings, recordRenderPhase } from '../services/renderMetrics.js';
+import {
+  InvoiceFields,
+  InvoiceValidationError,
+  RenderedInvoice,
+  buildInvoiceFields,
+  invoiceCacheKey,
+  RenderEngine,
+  newInvoiceNumber,
+  pdfCache,
+  recordRenderedInvoice,
+  renderInvoiceBody,
+  renderInvoiceFile,
+  resolveEngine
+} from '../services/invoiceRenderer.js';
+import { IndexEntry, InvoiceWrite, getInvoiceStore } from '../services/storage/invoiceStore.js';
+import { InvoiceData } from '../templates/invoice.js';
+import { RecordParseError, readRecords } from '../utils/recordStream.js';
+import { ZipStream } from '../utils/zipStream.js';
+import logger from '../utils/logger.js';
+import tracer from '../utils/tracing.js';
 
 const router = express.Router();
 
-// Ensure invoices directory exists
-const invoicesDir = path.join(process.cwd(), 'invoices');
-if (!fs.existsSync(invoicesDir)) {
-  fs.mkdirSync(invoicesDir, { recursive: true });
-}
+// Upper bound on invoices per batch request (ZIP without ZIP64 caps at 65535 entries)
+const maxBatchItems = () => Math.min(65000, parseInt(process.env.PDF_BATCH_MAX_ITEMS || '5000', 10));
 
-// POST /api/pdf/generate - Generate PDF invoice
-router.post('/generate', auth, async (req: Request, res: Response) => {
-  try {
-    // Get data from request body
-    const { products, subtotal, gst, grandTotal } = req.body;
-    
-    // Validate required data
-    if (!products || !Array.isArray(products) || products.length === 0) {
-      return res.status(400).json({ message: 'Products data is required' });
-    }
-    
-    const invoiceData = {
-      invoiceNumber: 'INV-' + Date.now(),
-      date: new Date().toLocaleDateString(),
-      companyName: 'Your Company Name',
-      companyAddress: '123 Business Street\nCity, State 12345\nPhone: (555) 123-4567',
-      clientName: 'Client Name',
-      clientAddress: '456 Client Avenue\nClient City, State 67890',
-      products: products.map((product: any) => ({
-        name: product.name,
-        qty: product.quantity,
-        rate: product.rate,
-        total: product.quantity * product.rate
-      })),
-      subtotal: subtotal || 0,
-      tax: gst || 0,
-      total: grandTotal || 0
+// Stream PDFs to the client by default; PDF_STREAMING=false or ?stream=false buffers instead
+const useStreaming = (req: Request): boolean => {
+  const requested = req.query.stream ?? process.env.PDF_STREAMING;
+  return requested !== 'false' && requested !== '0';
+};
+
+const setPdfHeaders = (res: Response, filename: string, cacheStatus: string) => {
+  res.setHeader('Content-Type', 'application/pdf');
+  res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
+  res.setHeader('X-Cache', cacheStatus);
+};
+
+const sendPdf = (res: Response, filename: string, pdfBuffer: Buffer, cacheStatus: string) => {
+  setPdfHeaders(res, filename, cacheStatus);
+  res.setHeader('Content-Length', pdfBuffer.length);
+  res.send(pdfBuffer);
+};
+
+// Pipe a PDF stream to the response while teeing it to the invoice store.
+// Backpressure from either side pauses Chromium's stream. A client disconnect
+// aborts the render and discards the partial file; a storage error only stops
+// the tee. Resolves with the stored entry, or null when it could not be saved.
+const streamPdf = (pdfStream: Readable, res: Response, upload: InvoiceWrite): Promise<IndexEntry | null> =>
+  new Promise((resolve, reject) => {
+    const file = upload.stream;
+    let size = 0;
+    let fileOk = true;
+    let fileDone = false;
+    let resDone = false;
+    let settled = false;
+
+    const discardFile = () => {
+      fileOk = false;
+      pdfStream.unpipe(file);
+      upload.abort();
+    };
+
+    const settle = () => {
+      if (settled || !resDone || !(fileDone || !fileOk)) {
+        return;
+      }
+      settled = true;
+      if (!fileOk) {
+        return resolve(null);
+      }
+      upload.commit(size)
+        .then(resolve)
+        .catch(error => {
+          logger.error('PDF storage error', error);
+          resolve(null);
+        });
+    };
+
+    const abort = (error: Error) => {
+      if (settled) {
+        return;
+      }
+      settled = true;
+      pdfStream.destroy();
+      discardFile();
+      reject(error);
     };
 
-    // HTML template for PDF
-    const htmlTemplate = `
-    <!DOCTYPE html>
-    <html>
-    <head>
-      <meta charset="utf-8">
-      <style>
-        body {
-          font-family: Arial, sans-serif;
-          margin: 0;
-          padding: 20px;
-          color: #333;
-        }
-        .header {
-          display: flex;
-          justify-content: space-between;
-          align-items: center;
-          margin-bottom: 30px;
-          border-bottom: 2px solid #007bff;
-          padding-bottom: 20px;
-        }
-        .logo {
-          font-size: 24px;
-          font-weight: bold;
-          color: #007bff;
-        }
-        .invoice-info {
-          text-align: right;
-        }
-        .invoice-number {
-          font-size: 18px;
-          font-weight: bold;
-          margin-bottom: 5px;
-        }
-        .date {
-          color: #666;
-        }
-        .addresses {
-          display: flex;
-          justify-content: space-between;
-          margin-bottom: 30px;
-        }
-        .address-block {
-          width: 45%;
-        }
-        .address-title {
-          font-weight: bold;
-          margin-bottom: 10px;
-          color: #007bff;
-        }
-        .address-content {
-          white-space: pre-line;
-          line-height: 1.4;
-        }
-        .products-table {
-          width: 100%;
-          border-collapse: collapse;
-          margin-bottom: 30px;
-        }
-        .products-table th,
-        .products-table td {
-          border: 1px solid #ddd;
-          padding: 12px;
-          text-align: left;
-        }
-        .products-table th {
-          background-color: #007bff;
-          color: white;
-          font-weight: bold;
-        }
-        .products-table tr:nth-child(even) {
-          background-color: #f9f9f9;
-        }
-        .text-right {
-          text-align: right;
-        }
-        .totals {
-          width: 300px;
-          margin-left: auto;
-          border-collapse: collapse;
-        }
-        .totals td {
-          padding: 8px 12px;
-          border-bottom: 1px solid #ddd;
-        }
-        .totals .total-row {
-          font-weight: bold;
-          background-color: #007bff;
-          color: white;
-        }
-        .footer {
-          margin-top: 50px;
-          text-align: center;
-          color: #666;
-          font-size: 12px;
-        }
-      </style>
-    </head>
-    <body>
-      <div class="header">
-        <div class="logo">📄 INVOICE GENERATOR</div>
-        <div class="invoice-info">
-          <div class="invoice-number">${invoiceData.invoiceNumber}</div>
-          <div class="date">${invoiceData.date}</div>
-        </div>
-      </div>
-
-      <div class="addresses">
-        <div class="address-block">
-          <div class="address-title">From:</div>
-          <div class="address-content">${invoiceData.companyName}
-${invoiceData.companyAddress}</div>
-        </div>
-        <div class="address-block">
-          <div class="address-title">To:</div>
-          <div class="address-content">${invoiceData.clientName}
-${invoiceData.clientAddress}</div>
-        </div>
-      </div>
-
-      <table class="products-table">
-        <thead>
-          <tr>
-            <th>Product Name</th>
-            <th class="text-right">Quantity</th>
-            <th class="text-right">Rate</th>
-            <th class="text-right">Total</th>
-          </tr>
-        </thead>
-        <tbody>
-          ${invoiceData.products.map(product => `
-            <tr>
-              <td>${product.name}</td>
-              <td class="text-right">${product.qty}</td>
-              <td class="text-right">$${product.rate.toFixed(2)}</td>
-              <td class="text-right">$${product.total.toFixed(2)}</td>
-            </tr>
-          `).join('')}
-        </tbody>
-      </table>
-
-      <table class="totals">
-        <tr>
-          <td>Subtotal:</td>
-          <td class="text-right">$${invoiceData.subtotal.toFixed(2)}</td>
-        </tr>
-        <tr>
-          <td>Tax (10%):</td>
-          <td class="text-right">$${invoiceData.tax.toFixed(2)}</td>
-        </tr>
-        <tr class="total-row">
-          <td>Total:</td>
-          <td class="text-right">$${invoiceData.total.toFixed(2)}</td>
-        </tr>
-      </table>
-
-      <div class="footer">
-        <p>Thank you for your business!</p>
-        <p>Generated on ${new Date().toLocaleString()}</p>
-      </div>
-    </body>
-    </html>
-    `;
-
-    // Launch Puppeteer
-    const browser = await puppeteer.launch({
-      headless: true,
-      args: ['--no-sandbox', '--disable-setuid-sandbox']
+    pdfStream.on('data', (chunk: Buffer) => {
+      size += chunk.length;
     });
+    pdfStream.once('error', abort);
 
-    const page = await browser.newPage();
-    await page.setContent(htmlTemplate);
-    
-    // Generate PDF
-    const pdfBuffer = await page.pdf({
-      format: 'A4',
-      printBackground: true,
-      margin: {
-        top: '20px',
-        right: '20px',
-        bottom: '20px',
-        left: '20px'
+    file.once('error', error => {
+      logger.error('PDF storage error', error);
+      discardFile();
+      settle();
+    });
+    file.once('finish', () => {
+      fileDone = true;
+      settle();
+    });
+
+    res.once('finish', () => {
+      resDone = true;
+      settle();
+    });
+    res.once('close', () => {
+      if (!res.writableFinished) {
+        abort(new Error('Client disconnected during PDF stream'));
       }
     });
 
-    await browser.close();
+    pdfStream.pipe(res);
+    pdfStream.pipe(file);
+  });
+
+// POST /api/pdf/generate - Generate PDF invoice. Retries sent with the same
+// Idempotency-Key get the first response replayed instead of a new render.
+router.post('/generate', auth, idempotencyKeys.middleware, async (req: Request, res: Response) => {
+  try {
+    // Validate required data and build the printable invoice
+    let invoiceFields: InvoiceFields;
+    try {
+      invoiceFields = buildInvoiceFields(req.body);
+    } catch (error) {
+      if (error instanceof InvoiceValidationError) {
+        return res.status(400).json({ message: error.message });
+      }
+      throw error;
+    }
+
+    const engine = resolveEngine(req.query.engine ?? req.body.engine);
 
-    // Save PDF to invoices directory
-    const filename = `invoice-${invoiceData.invoiceNumber}-${Date.now()}.pdf`;
-    const filepath = path.join(invoicesDir, filename);
-    fs.writeFileSync(filepath, pdfBuffer);
+    // Serve an identical earlier render without touching the browser
+    const userId = String((req as any).user?._id);
+    const cacheKey = invoiceCacheKey(userId, invoiceFields, engine);
+    const cached = await tracer.span('pdfCache', () => pdfCache.get(cacheKey));
+    if (cached) {
+      return sendPdf(res, cached.filename, cached.buffer, 'HIT');
+    }
 
-    // Set response headers
-    res.setHeader('Content-Type', 'application/pdf');
-    res.setHeader('Content-Disposition', `attachment; filename="${filename}"`);
-    res.setHeader('Content-Length', pdfBuffer.length);
+    // The native writer needs no browser, so it skips the render queue
+    if (engine === 'native') {
+      const rendered = await renderInvoiceFile(userId, invoiceFields, cacheKey, engine);
+      return sendPdf(res, rendered.filename, rendered.buffer, rendered.cacheStatus);
+    }
 
-    // Send PDF buffer
-    res.send(pdfBuffer);
+    // Cancel the queued render if the client goes away while it waits
+    const abortController = new AbortController();
+    res.once('close', () => abortController.abort());
+
+    await renderScheduler.schedule(userId, async () => {
+      if (!useStreaming(req)) {
+        const rendered = await renderInvoiceFile(userId, invoiceFields, cacheKey);
+        return sendPdf(res, rendered.filename, rendered.buffer, rendered.cacheStatus);
+      }
+
+      const invoiceData: InvoiceData = {
+        invoiceNumber: await newInvoiceNumber(userId),
+        ...invoiceFields
+      };
+      const store = getInvoiceStore();
+      const filename = store.filenameFor(invoiceData.invoiceNumber, cacheKey);
+      const meta = { userId, invoiceNumber: invoiceData.invoiceNumber, filename, contentKey: cacheKey };
+      const upload = await store.openWrite(meta);
+
+      // Render on a warm page and stream it straight to the client
+      let pdfStream: Readable;
+      const timings: RenderTimings = {};
+      try {
+        pdfStream = await pagePool.renderStream(renderInvoiceBody(invoiceData), timings);
+      } catch (error) {
+        upload.abort();
+        throw error;
+      }
+      observeRenderTimings(timings, engine);
+      setPdfHeaders(res, filename, 'MISS');
+
+      const writeStarted = Date.now();
+      const entry = await streamPdf(pdfStream, res, upload);
+      recordRenderPhase('write', Date.now() - writeStarted, engine);
+      if (entry) {
+        await recordRenderedInvoice(meta, invoiceFields, engine, entry.size);
+      }
+    }, { signal: abortController.signal });
 
   } catch (error) {
-    console.error('PDF generation error:', error);
+    if (error instanceof QueueFullError) {
+      res.setHeader('Retry-After', String(error.retryAfterSeconds));
+      return res.status(429).json({ message: 'Too many PDF requests, please retry later' });
+    }
+    if (error instanceof QueueTimeoutError) {
+      if (!res.headersSent && !res.writableEnded) {
+        res.status(503).json({ message: 'PDF generation timed out, please retry' });
+      }
+      return;
+    }
+
+    logger.error('PDF generation error', error);
+    if (res.headersSent) {
+      // Mid-stream failure: the status line is gone, so just drop the connection
+      res.destroy();
+      return;
+    }
     res.status(500).json({ message: 'Failed to generate PDF' });
   }
 });
 
+// Render one batch item through the shared queue, backing off while it is full
+const renderBatchItem = async (
+  userId: string,
+  payload: any,
+  defaultEngine: RenderEngine,
+  signal: AbortSignal
+): Promise<RenderedInvoice> => {
+  const invoiceFields = buildInvoiceFields(payload);
+  const engine = payload.engine ? resolveEngine(payload.engine) : defaultEngine;
+  const cacheKey = invoiceCacheKey(userId, invoiceFields, engine);
+
+  const cached = await pdfCache.get(cacheKey);
+  if (cached) {
+    return { ...cached, cacheStatus: 'HIT' };
+  }
+  if (engine === 'native') {
+    return renderInvoiceFile(userId, invoiceFields, cacheKey, engine);
+  }
+
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await renderScheduler.schedule(
+        userId,
+        () => renderInvoiceFile(userId, invoiceFields, cacheKey),
+        { signal }
+      );
+    } catch (error) {
+      if (!(error instanceof QueueFullError) || attempt >= 5 || signal.aborted) {
+        throw error;
+      }
+      await delay(error.retryAfterSeconds * 1000);
+    }
+  }
+};
+
+// POST /api/pdf/batch - Render many invoices and stream them back as a ZIP.
+// Accepts a JSON array or NDJSON (application/x-ndjson) of generate payloads.
+// Entries are appended as each render finishes; manifest.json lists the
+// status of every item by its index in the upload.
+router.post('/batch', auth, async (req: Request, res: Response) => {
+  const userId = String((req as any).user?._id);
+  const engine = resolveEngine(req.query.engine);
+  const abortController = new AbortController();
+  res.once('close', () => abortController.abort());
+
+  const zip = new ZipStream(res);
+  const manifest: any[] = [];
+  const inFlight = new Set<Promise<void>>();
+  const maxInFlight = Math.max(1, renderScheduler.concurrency);
+  const limit = maxBatchItems();
+  let index = 0;
+
+  res.setHeader('Content-Type', 'application/zip');
+  res.setHeader('Content-Disposition', `attachment; filename="invoices-${Date.now()}.zip"`);
+
+  // Nothing streamed yet: swap the archive headers for a JSON error
+  const sendError = (status: number, message: string) => {
+    res.removeHeader('Content-Type');
+    res.removeHeader('Content-Disposition');
+    return res.status(status).json({ message });
+  };
+
+  try {
+    for await (const payload of readRecords(req)) {
+      if (index >= limit) {
+        throw new RecordParseError(`Batch exceeds ${limit} invoices`);
+      }
+      if (abortController.signal.aborted) {
+        return;
+      }
+
+      const itemIndex = index++;
+      const task = renderBatchItem(userId, payload, engine, abortController.signal)
+        .then(async rendered => {
+          const entryName = `${String(itemIndex).padStart(5, '0')}-${rendered.filename}`;
+          await zip.addFile(entryName, rendered.buffer);
+          manifest[itemIndex] = { index: itemIndex, status: 'ok', file: entryName, cache: rendered.cacheStatus };
+        })
+        .catch(error => {
+          manifest[itemIndex] = {
+            index: itemIndex,
+            status: 'error',
+            error: error instanceof InvoiceValidationError || error instanceof QueueTimeoutError
+              ? error.message
+              : 'Failed to generate PDF'
+          };
+          if (!(error instanceof InvoiceValidationError)) {
+            logger.error('Batch item failed', { item: itemIndex, err: error });
+          }
+        })
+        .finally(() => {
+          inFlight.delete(task);
+        });
+      inFlight.add(task);
+
+      // Keep roughly one item per render slot in flight
+      if (inFlight.size >= maxInFlight) {
+        await Promise.race(inFlight);
+      }
+    }
+
+    await Promise.all(inFlight);
+
+    if (index === 0 && !res.headersSent) {
+      return sendError(400, 'At least one invoice payload is required');
+    }
+
+    const summary = {
+      total: index,
+      succeeded: manifest.filter(item => item.status === 'ok').length,
+      failed: manifest.filter(item => item.status === 'error').length,
+      items: manifest
+    };
+    await zip.addFile('manifest.json', Buffer.from(JSON.stringify(summary, null, 2)));
+    await zip.finish();
+  } catch (error) {
+    abortController.abort();
+    await Promise.allSettled(inFlight);
+
+    if (!res.headersSent) {
+      if (error instanceof RecordParseError) {
+        return sendError(400, error.message);
+      }
+      logger.error('PDF batch error', error);
+      return sendError(500, 'Failed to generate PDF batch');
+    }
+
+    // Archive is partially sent; drop the connection so the client sees a truncated download
+    logger.error('PDF batch error', error);
+    res.destroy();
+  }
+});
+
+const describeJob = (job: RenderJob) => ({
+  jobId: job.id,
+  status: job.status,
+  attempts: job.attempts,
+  createdAt: job.createdAt,
+  completedAt: job.completedAt,
+  ...(job.error && { error: job.error }),
+  ...(job.status === 'completed' && { fileUrl: `/api/pdf/jobs/${job.id}/file` })
+});
+
+// POST /api/pdf/jobs - Queue an invoice for rendering by the worker pool
+router.post('/jobs', auth, async (req: Request, res: Response) => {
+  try {
+    const job = await renderJobs.submit(String((req as any).user?._id), req.body);
+    res.status(202).json({
+      message: 'PDF job queued successfully',
+      job: describeJob(job)
+    });
+  } catch (error) {
+    if (error instanceof InvoiceValidationError) {
+      return res.status(400).json({ message: error.message });
+    }
+    logger.error('PDF job submit error', error);
+    res.status(500).json({ message: 'Failed to queue PDF job' });
+  }
+});
+
+// GET /api/pdf/jobs/:id - Render job status
+router.get('/jobs/:id', auth, async (req: Request, res: Response) => {
+  try {
+    const job = await renderJobs.get(req.params.id, String((req as any).user?._id));
+    if (!job) {
+      return res.status(404).json({ message: 'Job not found' });
+    }
+    res.status(200).json({
+      message: 'PDF job retrieved successfully',
+      job: describeJob(job)
+    });
+  } catch (error) {
+    logger.error('PDF job fetch error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+// GET /api/pdf/jobs/:id/file - Download the finished PDF
+router.get('/jobs/:id/file', auth, async (req: Request, res: Response) => {
+  try {
+    const job = await renderJobs.get(req.params.id, String((req as any).user?._id));
+    if (!job) {
+      return res.status(404).json({ message: 'Job not found' });
+    }
+    if (job.status !== 'completed' || !job.filename) {
+      return res.status(409).json({ message: `PDF job is ${job.status}` });
+    }
+
+    // The file may have been evicted by the storage cleanup since the job finished
+    const store = getInvoiceStore();
+    const entry = await store.lookupFile(job.userId, job.filename);
+    const fileStream = entry && await store.openRead(entry);
+    if (!entry || !fileStream) {
+      return res.status(410).json({ message: 'PDF file is no longer available' });
+    }
+
+    res.setHeader('Content-Type', 'application/pdf');
+    res.setHeader('Content-Disposition', `attachment; filename="${entry.filename}"`);
+    res.setHeader('Content-Length', entry.size);
+    await pipeline(fileStream, res);
+  } catch (error) {
+    logger.error('PDF job download error', error);
+    if (res.headersSent) {
+      res.destroy();
+      return;
+    }
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
 export default router;
\ No newline at end of file
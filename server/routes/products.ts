@@ -1,109 +1,137 @@
 import express, { Request, Response } from 'express';
-import Product from '../models/productModel.js';
+import { productNameKey } from '../models/productModel.js';
 import { authenticateToken as auth } from '../middleware/auth.js';
+import repositories, { NewProduct } from '../repositories/index.js';
+import idempotencyKeys from '../services/idempotencyKeys.js';
+import productCache, { matchesTag } from '../services/productCache.js';
+import { CursorError, decodeKeyCursor, encodeCursor, parseLimit } from '../utils/cursor.js';
+import { RecordParseError, readRecords } from '../utils/recordStream.js';
+import logger from '../utils/logger.js';
 
 const router = express.Router();
 
-// GET /api/products - Get all products for authenticated user
+const maxPageSize = 200;
+
+// Shared by single and bulk creation; returns an error message or null
+const validateProduct = (name: unknown, qty: unknown, rate: unknown): string | null => {
+  if (!name || typeof name !== 'string' || name.length < 3 || name.length > 50) {
+    return 'Name must be between 3 and 50 characters';
+  }
+  if (!qty || typeof qty !== 'number' || qty <= 0) {
+    return 'Quantity must be a number greater than 0';
+  }
+  if (!rate || typeof rate !== 'number' || rate <= 0) {
+    return 'Rate must be a number greater than 0';
+  }
+  return null;
+};
+
+// GET /api/products - List products for authenticated user, paginated with
+// ?cursor= and ?limit=. ?sort=createdAt|name, ?order=asc|desc, ?q= name prefix
 router.get('/', auth, async (req: Request, res: Response) => {
-  console.log('GET /api/products - Request received');
-  console.log('User:', (req as any).user);
   try {
-    // For testing without MongoDB, return mock response
-    if (!process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017')) {
-      const mockProducts = [
-        {
-          id: 'mock_product_1',
-          name: 'Sample Product 1',
-          qty: 2,
-          rate: 25.50,
-          userId: (req as any).user?._id || 'mock_user',
-          createdAt: new Date()
-        },
-        {
-          id: 'mock_product_2',
-          name: 'Sample Product 2',
-          qty: 1,
-          rate: 15.00,
-          userId: (req as any).user?._id || 'mock_user',
-          createdAt: new Date()
-        }
-      ];
-
-      return res.status(200).json({
-        message: 'Products retrieved successfully (test mode)',
-        products: mockProducts
-      });
-    }
-
-    // Get products from database
-    const products = await Product.find({ userId: (req as any).user._id });
+    const sort = req.query.sort ?? 'createdAt';
+    if (sort !== 'createdAt' && sort !== 'name') {
+      return res.status(400).json({ message: 'sort must be createdAt or name' });
+    }
+    const order = req.query.order ?? 'asc';
+    if (order !== 'asc' && order !== 'desc') {
+      return res.status(400).json({ message: 'order must be asc or desc' });
+    }
+    const limit = parseLimit(req.query.limit, 50, maxPageSize);
+    const prefix = typeof req.query.q === 'string' ? productNameKey(req.query.q) : '';
 
-    res.status(200).json({
+    const cursor = typeof req.query.cursor === 'string' ? req.query.cursor : '';
+    const after = cursor
+      ? decodeKeyCursor(cursor, sort === 'name' ? 'string' : 'number')
+      : undefined;
+
+    // Unchanged lists are answered from the cache, or with 304 when the
+    // client already holds the same page
+    const userId = String((req as any).user._id);
+    const queryKey = JSON.stringify([sort, order, limit, prefix, cursor]);
+    const ifNoneMatch = req.headers['if-none-match'];
+    const cached = productCache.lookup(userId, queryKey, ifNoneMatch);
+    res.setHeader('Cache-Control', 'private, no-cache');
+    res.setHeader('X-Cache', cached.status === 'miss' ? 'MISS' : 'HIT');
+    if (cached.etag) {
+      res.setHeader('ETag', cached.etag);
+    }
+    if (cached.status === 'not-modified') {
+      return res.status(304).end();
+    }
+    if (cached.body) {
+      return res.status(200).type('json').send(cached.body);
+    }
+
+    // Keyset pagination on (sort key, id), served by the matching index
+    const page = await repositories().products.list(userId, {
+      sort,
+      order,
+      limit,
+      prefix: prefix || undefined,
+      after
+    });
+
+    const last = page.items[page.items.length - 1];
+    const nextCursor = page.hasMore && last
+      ? encodeCursor([sort === 'name' ? last.nameKey : last.createdAt.getTime(), last.id])
+      : null;
+
+    const body = JSON.stringify({
       message: 'Products retrieved successfully',
-      products: products.map(product => ({
-        id: product._id,
+      products: page.items.map(product => ({
+        id: product.id,
         name: product.name,
         qty: product.qty,
         rate: product.rate,
         userId: product.userId
-      }))
+      })),
+      nextCursor
     });
+    const etag = productCache.set(userId, queryKey, cached.version, body);
+    res.setHeader('ETag', etag);
+    // Tags depend only on the page, so a tag from another worker or from
+    // before a restart still revalidates
+    if (matchesTag(ifNoneMatch, etag)) {
+      return res.status(304).end();
+    }
+
+    res.status(200).type('json').send(body);
   } catch (error) {
-    console.error('Products fetch error:', error);
+    if (error instanceof CursorError) {
+      return res.status(400).json({ message: error.message });
+    }
+    logger.error('Products fetch error', error);
     res.status(500).json({ message: 'Internal server error' });
   }
 });
 
-// POST /api/products - Save a product
-router.post('/', auth, async (req: Request, res: Response) => {
+// POST /api/products - Save a product. A retry with the same Idempotency-Key
+// gets the first response back instead of creating a duplicate.
+router.post('/', auth, idempotencyKeys.middleware, async (req: Request, res: Response) => {
   try {
     const { name, qty, rate } = req.body;
 
     // Validation
-    if (!name || typeof name !== 'string' || name.length < 3 || name.length > 50) {
-      return res.status(400).json({ message: 'Name must be between 3 and 50 characters' });
-    }
-
-    if (!qty || typeof qty !== 'number' || qty <= 0) {
-      return res.status(400).json({ message: 'Quantity must be a number greater than 0' });
-    }
-
-    if (!rate || typeof rate !== 'number' || rate <= 0) {
-      return res.status(400).json({ message: 'Rate must be a number greater than 0' });
-    }
-
-    // For testing without MongoDB, return mock response
-    if (!process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017')) {
-      const mockProduct = {
-        id: 'mock_product_' + Date.now(),
-        name,
-        qty,
-        rate,
-        userId: (req as any).user?._id || 'mock_user',
-        createdAt: new Date()
-      };
-
-      return res.status(201).json({
-        message: 'Product saved successfully (test mode)',
-        product: mockProduct
-      });
+    const validationError = validateProduct(name, qty, rate);
+    if (validationError) {
+      return res.status(400).json({ message: validationError });
     }
 
     // Create new product
-    const product = new Product({
+    const product = await repositories().products.create({
       name,
       qty,
       rate,
-      userId: (req as any).user._id
+      userId: String((req as any).user._id)
     });
-
-    await product.save();
+    productCache.invalidate(product.userId);
 
     res.status(201).json({
       message: 'Product saved successfully',
       product: {
-        id: product._id,
+        id: product.id,
         name: product.name,
         qty: product.qty,
         rate: product.rate,
@@ -111,7 +139,143 @@ router.post('/', auth, async (req: Request, res: Response) => {
       }
     });
   } catch (error) {
-    console.error('Product save error:', error);
+    logger.error('Product save error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+// Bulk import limits: rows per request, rows per insertMany round trip, and
+// how many per-row errors are reported back
+const maxBulkRows = () => parseInt(process.env.PRODUCT_BULK_MAX_ROWS || '100000', 10);
+const bulkChunkSize = 1000;
+const maxReportedErrors = 1000;
+const maxBulkDeleteIds = 10000;
+
+// CSV cells arrive as strings; numeric strings are accepted for qty and rate
+const numeric = (value: unknown): unknown =>
+  typeof value === 'string' && value.trim() !== '' && !isNaN(Number(value)) ? Number(value) : value;
+
+// POST /api/products/bulk - Import many products from a JSON array, NDJSON
+// (application/x-ndjson) or CSV (text/csv, header row with name,qty,rate).
+// Rows are validated as they stream in and written with unordered bulk
+// inserts in chunks; invalid rows are reported by their 0-based row index.
+// ?return=ids also returns the id of every inserted row.
+router.post('/bulk', auth, async (req: Request, res: Response) => {
+  const userId = String((req as any).user?._id);
+  const returnIds = req.query.return === 'ids';
+  const limit = maxBulkRows();
+  const errors: Array<{ row: number; message: string }> = [];
+  const insertedIds: Array<{ row: number; id: string }> = [];
+  let failed = 0;
+  let inserted = 0;
+  let rows = 0;
+
+  const rejectRow = (row: number, message: string) => {
+    failed++;
+    if (errors.length < maxReportedErrors) {
+      errors.push({ row, message });
+    }
+  };
+
+  let chunk: Array<{ row: number; product: NewProduct }> = [];
+  const flush = async () => {
+    const batch = chunk;
+    chunk = [];
+    if (batch.length === 0) {
+      return;
+    }
+
+    const result = await repositories().products.insertMany(batch.map(item => item.product));
+    productCache.invalidate(userId);
+    for (const { index, message } of result.errors) {
+      rejectRow(batch[index].row, message);
+    }
+    result.insertedIds.forEach((id, index) => {
+      if (id === null) {
+        return;
+      }
+      inserted++;
+      if (returnIds) {
+        insertedIds.push({ row: batch[index].row, id });
+      }
+    });
+  };
+
+  try {
+    for await (const record of readRecords(req)) {
+      const row = rows++;
+      if (row >= limit) {
+        throw new RecordParseError(`Import exceeds ${limit} products`);
+      }
+      if (res.destroyed) {
+        return;
+      }
+
+      const name = typeof record?.name === 'string' ? record.name.trim() : record?.name;
+      const qty = numeric(record?.qty ?? record?.quantity);
+      const rate = numeric(record?.rate);
+      const validationError = validateProduct(name, qty, rate);
+      if (validationError) {
+        rejectRow(row, validationError);
+        continue;
+      }
+
+      chunk.push({ row, product: { name: name as string, qty: qty as number, rate: rate as number, userId } });
+      if (chunk.length >= bulkChunkSize) {
+        await flush();
+      }
+    }
+    await flush();
+
+    if (rows === 0) {
+      return res.status(400).json({ message: 'At least one product is required' });
+    }
+
+    res.status(inserted > 0 ? 201 : 400).json({
+      message: inserted > 0 ? 'Products imported successfully' : 'No products were imported',
+      total: rows,
+      inserted,
+      failed,
+      errors,
+      ...(returnIds && { insertedIds })
+    });
+  } catch (error) {
+    if (error instanceof RecordParseError) {
+      return res.status(400).json({ message: error.message, total: rows, inserted, failed, errors });
+    }
+    logger.error('Product bulk import error', error);
+    res.status(500).json({ message: 'Internal server error', inserted });
+  }
+});
+
+// DELETE /api/products/bulk - Delete many products by id ({ ids: [...] })
+router.delete('/bulk', auth, async (req: Request, res: Response) => {
+  try {
+    const { ids } = req.body || {};
+    if (!Array.isArray(ids) || ids.length === 0) {
+      return res.status(400).json({ message: 'ids must be a non-empty array' });
+    }
+    if (ids.length > maxBulkDeleteIds) {
+      return res.status(400).json({ message: `At most ${maxBulkDeleteIds} ids can be deleted at once` });
+    }
+
+    const isValidId = (id: unknown) => typeof id === 'string' && /^[0-9a-f]{24}$/i.test(id);
+    const validIds = ids.filter(isValidId);
+    const invalidIds = ids.filter(id => !isValidId(id));
+
+    const userId = String((req as any).user._id);
+    const deletedCount = await repositories().products.deleteMany(userId, validIds);
+    if (deletedCount > 0) {
+      productCache.invalidate(userId);
+    }
+
+    res.status(200).json({
+      message: 'Products deleted successfully',
+      deletedCount,
+      invalidIds
+    });
+  } catch (error) {
+    logger.error('Product bulk delete error', error);
     res.status(500).json({ message: 'Internal server error' });
   }
 });
@@ -121,30 +285,21 @@ router.delete('/:id', auth, async (req: Request, res: Response) => {
   try {
     const { id } = req.params;
 
-    // For testing without MongoDB, return mock response
-    if (!process.env.MONGO_URI || process.env.MONGO_URI.includes('localhost:27017')) {
-      return res.status(200).json({
-        message: 'Product deleted successfully (test mode)',
-        productId: id
-      });
-    }
-
     // Find and delete the product
-    const product = await Product.findOneAndDelete({ 
-      _id: id, 
-      userId: (req as any).user._id 
-    });
+    const userId = String((req as any).user._id);
+    const deleted = await repositories().products.delete(userId, id);
 
-    if (!product) {
+    if (!deleted) {
       return res.status(404).json({ message: 'Product not found' });
     }
+    productCache.invalidate(userId);
 
     res.status(200).json({
       message: 'Product deleted successfully',
       productId: id
     });
   } catch (error) {
-    console.error('Product delete error:', error);
+    logger.error('Product delete error', error);
     res.status(500).json({ message: 'Internal server error' });
   }
 });
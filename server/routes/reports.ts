@@ -0,0 +1,57 @@
+import express, { Request, Response } from 'express';
+import { authenticateToken as auth } from '../middleware/auth.js';
+import { rollupBucket } from '../models/revenueRollupModel.js';
+import { revenueReport } from '../services/revenueRollups.js';
+import logger from '../utils/logger.js';
+
+const router = express.Router();
+
+// Largest range a single report may span, in buckets
+const maxBuckets = { day: 366, month: 120 };
+
+// GET /api/reports - Revenue per day or month from the rollups.
+// ?period=day|month, ?from=&to= (dates, default: the last 30 days or 12 months),
+// ?top= number of top products per bucket (default 5, max 20)
+router.get('/', auth, async (req: Request, res: Response) => {
+  try {
+    const period = req.query.period ?? 'month';
+    if (period !== 'day' && period !== 'month') {
+      return res.status(400).json({ message: 'period must be day or month' });
+    }
+
+    const to = req.query.to ? new Date(String(req.query.to)) : new Date();
+    const from = req.query.from ? new Date(String(req.query.from)) : new Date(to);
+    if (!req.query.from) {
+      if (period === 'day') {
+        from.setUTCDate(from.getUTCDate() - 29);
+      } else {
+        from.setUTCMonth(from.getUTCMonth() - 11, 1);
+      }
+    }
+    if (isNaN(from.getTime()) || isNaN(to.getTime()) || from > to) {
+      return res.status(400).json({ message: 'from and to must be valid dates with from before to' });
+    }
+
+    const span = period === 'day'
+      ? Math.floor((to.getTime() - from.getTime()) / (24 * 60 * 60 * 1000)) + 1
+      : (to.getUTCFullYear() - from.getUTCFullYear()) * 12 + to.getUTCMonth() - from.getUTCMonth() + 1;
+    if (span > maxBuckets[period]) {
+      return res.status(400).json({ message: `A ${period} report can span at most ${maxBuckets[period]} ${period}s` });
+    }
+
+    const top = Math.min(20, Math.max(0, parseInt(String(req.query.top ?? '5'), 10) || 0));
+    const query = { period, from: rollupBucket(period, from), to: rollupBucket(period, to), top };
+
+    const report = await revenueReport((req as any).user._id, query);
+
+    res.status(200).json({
+      message: 'Report retrieved successfully',
+      report
+    });
+  } catch (error) {
+    logger.error('Report fetch error', error);
+    res.status(500).json({ message: 'Internal server error' });
+  }
+});
+
+export default router;
@@ -0,0 +1,30 @@
+// One-off backfill of Product.nameKey for products created before the field
+// existed, so name sorting and prefix search see them.
+// Usage: npm run products:backfill-namekey
+import dotenv from 'dotenv';
+import mongoose from 'mongoose';
+import Product from '../models/productModel.js';
+
+dotenv.config();
+
+const run = async () => {
+  const mongoURI = process.env.MONGO_URI;
+  if (!mongoURI) {
+    throw new Error('MONGO_URI is not defined in environment variables');
+  }
+  await mongoose.connect(mongoURI);
+
+  // Same normalization as productNameKey(), evaluated server-side
+  const result = await Product.updateMany(
+    { nameKey: { $exists: false } },
+    [{ $set: { nameKey: { $toLower: { $trim: { input: '$name' } } } } }]
+  );
+  console.log(`Backfilled nameKey on ${result.modifiedCount} product(s)`);
+};
+
+run()
+  .catch(error => {
+    console.error('Product nameKey backfill failed:', error);
+    process.exitCode = 1;
+  })
+  .finally(() => mongoose.disconnect());
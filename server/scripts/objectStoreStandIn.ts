@@ -0,0 +1,92 @@
+// Local stand-in for the object store used by INVOICE_STORAGE_BACKEND=object.
+// Implements the same small protocol as services/storage/objectStoreBackend
+// on top of a directory:
+//   PUT/GET/DELETE /<bucket>/<key>   object bytes
+//   GET /<bucket>?list               JSON array of { key, size, mtimeMs }
+// Usage: npm run storage:standin  (OBJECT_STORE_PORT, OBJECT_STORE_DIR, OBJECT_STORE_TOKEN)
+import fs from 'fs';
+import http from 'http';
+import path from 'path';
+import { pipeline } from 'stream/promises';
+import { LocalBackend } from '../services/storage/localBackend.js';
+import { StorageNotFoundError, StoredObject } from '../services/storage/types.js';
+
+const port = parseInt(process.env.OBJECT_STORE_PORT || '9400', 10);
+const root = path.resolve(process.env.OBJECT_STORE_DIR || path.join(process.cwd(), '.object-store'));
+const token = process.env.OBJECT_STORE_TOKEN;
+
+const buckets = new Map<string, LocalBackend>();
+const bucketFor = (name: string) => {
+  let backend = buckets.get(name);
+  if (!backend) {
+    backend = new LocalBackend(path.join(root, name));
+    buckets.set(name, backend);
+  }
+  return backend;
+};
+
+const server = http.createServer(async (req, res) => {
+  try {
+    if (token && req.headers.authorization !== `Bearer ${token}`) {
+      res.writeHead(401).end();
+      return;
+    }
+
+    const url = new URL(req.url || '/', 'http://localhost');
+    const [bucketName, ...keyParts] = url.pathname.slice(1).split('/').map(decodeURIComponent);
+    if (!bucketName || bucketName.includes('..')) {
+      res.writeHead(400).end();
+      return;
+    }
+    const bucket = bucketFor(bucketName);
+    const key = keyParts.join('/');
+
+    if (!key) {
+      if (req.method !== 'GET' || !url.searchParams.has('list')) {
+        res.writeHead(405).end();
+        return;
+      }
+      const objects: StoredObject[] = [];
+      for await (const object of bucket.list()) {
+        objects.push(object);
+      }
+      res.writeHead(200, { 'Content-Type': 'application/json' }).end(JSON.stringify(objects));
+      return;
+    }
+
+    if (req.method === 'PUT') {
+      const upload = await bucket.openWrite(key);
+      try {
+        await pipeline(req, upload.stream);
+        await upload.commit();
+      } catch (error) {
+        upload.abort();
+        throw error;
+      }
+      res.writeHead(201).end();
+    } else if (req.method === 'GET') {
+      const stream = await bucket.openRead(key);
+      res.writeHead(200, { 'Content-Type': 'application/pdf' });
+      await pipeline(stream, res);
+    } else if (req.method === 'DELETE') {
+      await bucket.delete(key);
+      res.writeHead(204).end();
+    } else {
+      res.writeHead(405).end();
+    }
+  } catch (error) {
+    if (res.headersSent) {
+      res.destroy();
+    } else if (error instanceof StorageNotFoundError) {
+      res.writeHead(404).end();
+    } else {
+      console.error('Object store stand-in error:', error);
+      res.writeHead(500).end();
+    }
+  }
+});
+
+fs.mkdirSync(root, { recursive: true });
+server.listen(port, () => {
+  console.log(`Object store stand-in listening on http://localhost:${port} (data in ${root})`);
+});
@@ -0,0 +1,27 @@
+// Recompute revenue rollups from Invoice history, e.g. after a backfill or a
+// change to how rollups are bucketed.
+// Usage: npm run reports:rebuild [-- --user <userId>]
+import dotenv from 'dotenv';
+import repositories, { initRepositories } from '../repositories/index.js';
+import { rebuildRollups } from '../services/revenueRollups.js';
+
+dotenv.config();
+
+const userFlag = process.argv.indexOf('--user');
+const userId = userFlag !== -1 ? process.argv[userFlag + 1] : undefined;
+
+const run = async () => {
+  // Rebuilds run against whichever driver the server would use
+  await initRepositories().connect();
+
+  const started = Date.now();
+  await rebuildRollups(userId);
+  console.log(`Rebuilt revenue rollups${userId ? ` for user ${userId}` : ''} in ${Date.now() - started}ms`);
+};
+
+run()
+  .catch(error => {
+    console.error('Revenue rollup rebuild failed:', error);
+    process.exitCode = 1;
+  })
+  .finally(() => repositories().close());
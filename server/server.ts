@@ -1,43 +1,113 @@
 import express, { Request, Response } from 'express';
 import cors from 'cors';
 import dotenv from 'dotenv';
-import connectDB from './config/db.js';
-import User from './models/userModel.js';
-import Product from './models/productModel.js';
-import Invoice from './models/invoiceModel.js';
+import repositories, { initRepositories } from './repositories/index.js';
+import { requestLogger } from './middleware/requestLogger.js';
+import { requestMetrics } from './middleware/requestMetrics.js';
+import { requestTracing } from './middleware/requestTracing.js';
 import authRoutes from './routes/auth.js';
 import productRoutes from './routes/products.js';
 import pdfRoutes from './routes/pdf.js';
+import invoiceRoutes from './routes/invoices.js';
+import reportRoutes from './routes/reports.js';
+import metricsRoutes from './routes/metrics.js';
+import adminRoutes from './routes/admin.js';
+import browserPool from './services/browserPool.js';
+import pagePool from './services/pagePool.js';
+import renderJobs from './services/renderJobs.js';
+import authCache from './services/authCache.js';
+import passwordHasher from './services/passwordHasher.js';
+import overloadController from './services/overloadController.js';
+import { getInvoiceStore } from './services/storage/invoiceStore.js';
+import { loadTemplates } from './templates/registry.js';
+import { isClusterWorker, sendToPrimary } from './utils/cluster.js';
+import { isStreamedBodyRoute } from './utils/recordStream.js';
+import logger from './utils/logger.js';
+import { startRuntimeMetrics } from './utils/runtimeMetrics.js';
+import tracer from './utils/tracing.js';
 
 // Load environment variables
 dotenv.config();
 
+// Pick the storage driver (DB_DRIVER) now that the environment is loaded
+initRepositories();
+
 const app = express();
 const PORT: string | number = process.env.PORT || 5000;
 
 // Middleware
+// Request ids and completion lines first, so everything after is correlated
+app.use(requestLogger);
+app.use(requestMetrics);
+app.use(requestTracing);
 app.use(cors({
   origin: process.env.NODE_ENV === 'production' 
     ? [process.env.FRONTEND_URL || 'https://your-app.vercel.app']
     : ['http://localhost:5173', 'http://localhost:3000'],
   credentials: true
 }));
-app.use(express.json());
+// Shed PDF and bulk requests while the event loop is lagging, before their bodies are read
+overloadController.start();
+app.use(overloadController.middleware);
+// Bulk upload routes read their bodies incrementally, so skip buffering them here
+app.use(express.json({
+  type: req => !isStreamedBodyRoute(req.method, req.url) &&
+    String(req.headers['content-type'] || '').includes('application/json')
+}));
 app.use(express.urlencoded({ extended: true }));
 
+// Compile PDF templates once at startup (fails fast on a broken custom template)
+loadTemplates();
+
 // Routes
 app.use('/api/auth', authRoutes);
 app.use('/api/products', productRoutes);
 app.use('/api/pdf', pdfRoutes);
+app.use('/api/invoices', invoiceRoutes);
+app.use('/api/reports', reportRoutes);
+// Operator endpoints (slow traces, cache and load stats); enabled by ADMIN_TOKEN
+app.use('/api/admin', adminRoutes);
+// Prometheus scrape endpoint; enabled by METRICS_TOKEN or ADMIN_TOKEN
+app.use('/metrics', metricsRoutes);
+
+// Sample event-loop delay for /metrics
+startRuntimeMetrics();
 
-// Connect to MongoDB
-connectDB().then(() => {
-  console.log('Server connected');
+// Connect the storage driver, then start the render workers so persisted jobs resume
+repositories().connect().then(() => {
+  logger.info(`Server connected (${repositories().driver} storage)`);
+  authCache.start().catch((error: Error) => {
+    logger.error('Failed to load token revocations', error);
+  });
+  renderJobs.start()
+    .then(() => sendToPrimary('worker-ready'))
+    .catch((error: Error) => {
+      logger.error('Failed to start render workers', error);
+    });
 }).catch((error: Error) => {
-  console.error('Failed to connect to database:', error);
-  console.log('Continuing without database connection for testing...');
+  logger.error('Failed to connect to database', error);
+  logger.warn('Continuing without database connection for testing...');
+});
+
+// Start the password hashing threads and calibrate the bcrypt cost
+passwordHasher.start().catch((error: Error) => {
+  logger.error('Failed to start password hasher', error);
 });
 
+// Load the invoice storage index and start its background cleanup
+getInvoiceStore().ready().catch((error: Error) => {
+  logger.error('Failed to load invoice storage', error);
+});
+
+// Start the shared headless browser pool and warm its pages for PDF rendering.
+// With the native engine as default, browsers launch only if a request asks for Chromium.
+if (process.env.PDF_ENGINE !== 'native') {
+  browserPool.start().then(() => pagePool.warm()).catch((error: Error) => {
+    logger.error('Failed to start browser pool', error);
+    logger.info('Browsers will be launched on first PDF request...');
+  });
+}
+
 // Basic route
 app.get('/', (req: Request, res: Response) => {
   res.json({ message: 'Invoice Generator API is running!' });
@@ -45,7 +115,7 @@ app.get('/', (req: Request, res: Response) => {
 
 // Global error handler middleware
 app.use((err: any, req: Request, res: Response, next: any) => {
-  console.error('Global error handler:', err);
+  logger.error('Unhandled request error', { method: req.method, path: req.originalUrl.split('?')[0], err });
   
   // Default to 500 server error
   let statusCode = err.statusCode || 500;
@@ -71,8 +141,37 @@ app.use((err: any, req: Request, res: Response, next: any) => {
 });
 
 // Start server
-app.listen(PORT, () => {
-  console.log(`Server is running on port ${PORT}`);
+const server = app.listen(PORT, () => {
+  logger.info(`Server is running on port ${PORT}`);
+});
+
+// Graceful shutdown: stop accepting connections and give in-flight requests
+// and render jobs up to SHUTDOWN_DRAIN_MS to finish, then close pooled browsers
+const shutdown = (signal: string) => {
+  logger.info(`${signal} received, draining`);
+  const drainMs = parseInt(process.env.SHUTDOWN_DRAIN_MS || '30000', 10);
+  const requestsDone = new Promise<void>(resolve => server.close(() => resolve()));
+  const drainDeadline = new Promise<void>(resolve => setTimeout(resolve, drainMs).unref());
+  authCache.stop();
+
+  Promise.all([Promise.race([requestsDone, drainDeadline]), renderJobs.shutdown(drainMs)])
+    .then(() => Promise.all([pagePool.shutdown(), passwordHasher.shutdown()]))
+    .then(() => Promise.all([browserPool.shutdown(), getInvoiceStore().shutdown(), repositories().close()]))
+    .finally(() => process.exit(0));
+};
+
+process.once('SIGTERM', () => shutdown('SIGTERM'));
+// kill -USR2 <pid> writes this process's slow traces to TRACE_DUMP_PATH
+process.on('SIGUSR2', () => {
+  tracer.dump()
+    .then(({ path, count }) => logger.info('Slow traces written', { path, count }))
+    .catch((error: Error) => logger.error('Trace dump error', error));
 });
+// Cluster workers are stopped by the primary; ignore Ctrl+C sent to the process group
+if (isClusterWorker()) {
+  process.on('SIGINT', () => {});
+} else {
+  process.once('SIGINT', () => shutdown('SIGINT'));
+}
 
 export default app;
\ No newline at end of file
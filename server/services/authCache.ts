@@ -0,0 +1,211 @@
+import crypto from 'crypto';
+import repositories, { UserEntity } from '../repositories/index.js';
+import { broadcast, onClusterMessage } from '../utils/cluster.js';
+import logger from '../utils/logger.js';
+
+export interface AuthCacheOptions {
+  maxTokens: number;
+  maxUsers: number;
+  userTtlMs: number;
+  // Tokens without an exp claim are re-verified after this long
+  tokenTtlMs: number;
+  revocationRefreshMs: number;
+}
+
+export interface VerifiedToken {
+  userId: string;
+  expiresAt: number;
+}
+
+export type AuthUser = Pick<UserEntity, 'id' | 'name' | 'email'>;
+
+interface CachedUser {
+  user: AuthUser;
+  expiresAt: number;
+}
+
+const optionsFromEnv = (): AuthCacheOptions => ({
+  maxTokens: parseInt(process.env.AUTH_TOKEN_CACHE_MAX || '10000', 10),
+  maxUsers: parseInt(process.env.AUTH_USER_CACHE_MAX || '10000', 10),
+  userTtlMs: parseInt(process.env.AUTH_USER_CACHE_TTL_MS || '30000', 10),
+  tokenTtlMs: parseInt(process.env.AUTH_TOKEN_CACHE_TTL_MS || '300000', 10),
+  revocationRefreshMs: parseInt(process.env.AUTH_REVOCATION_REFRESH_MS || '30000', 10)
+});
+
+export const hashToken = (token: string): string =>
+  crypto.createHash('sha256').update(token).digest('hex');
+
+// Caches behind authenticateToken: verified tokens by token hash (kept until
+// the token's exp), user records for a short TTL, and the revocation list.
+// Revocations are stored through the repositories and reloaded periodically,
+// so sign-outs survive restarts and reach other processes; cluster workers
+// are also told right away. All lookups are synchronous map reads; both
+// caches are LRU-bounded (Map insertion order).
+export class AuthCache {
+  private tokens = new Map<string, VerifiedToken>();
+  private users = new Map<string, CachedUser>();
+  private revoked = new Map<string, number>();
+  private refreshTimer: NodeJS.Timeout | null = null;
+  private options: AuthCacheOptions | null = null;
+  private counters = { tokenHits: 0, tokenMisses: 0, userHits: 0, userMisses: 0, revokedRejections: 0 };
+
+  constructor(private overrides: Partial<AuthCacheOptions> = {}) {}
+
+  // Load the revocation list and keep it fresh; call once the storage driver is connected
+  async start(): Promise<void> {
+    const { revocationRefreshMs } = this.configure();
+    if (!this.refreshTimer && revocationRefreshMs > 0) {
+      this.refreshTimer = setInterval(() => {
+        this.refreshRevocations().catch(error => logger.error('Revocation list refresh error', error));
+      }, revocationRefreshMs);
+      this.refreshTimer.unref();
+    }
+    await this.refreshRevocations();
+  }
+
+  stop(): void {
+    if (this.refreshTimer) {
+      clearInterval(this.refreshTimer);
+      this.refreshTimer = null;
+    }
+  }
+
+  isRevoked(tokenHash: string): boolean {
+    const expiresAt = this.revoked.get(tokenHash);
+    if (expiresAt === undefined) {
+      return false;
+    }
+    if (expiresAt <= Date.now()) {
+      this.revoked.delete(tokenHash);
+      return false;
+    }
+    this.counters.revokedRejections++;
+    return true;
+  }
+
+  verifiedToken(tokenHash: string): VerifiedToken | null {
+    const cached = this.tokens.get(tokenHash);
+    if (!cached || cached.expiresAt <= Date.now()) {
+      if (cached) {
+        this.tokens.delete(tokenHash);
+      }
+      this.counters.tokenMisses++;
+      return null;
+    }
+    this.tokens.delete(tokenHash);
+    this.tokens.set(tokenHash, cached);
+    this.counters.tokenHits++;
+    return cached;
+  }
+
+  // exp is the JWT claim, in seconds
+  rememberToken(tokenHash: string, userId: string, exp?: number): VerifiedToken {
+    const expiresAt = exp ? exp * 1000 : Date.now() + this.configure().tokenTtlMs;
+    const verified = { userId, expiresAt };
+    this.tokens.set(tokenHash, verified);
+    this.evict(this.tokens, this.configure().maxTokens);
+    return verified;
+  }
+
+  user(userId: string): AuthUser | null {
+    const cached = this.users.get(userId);
+    if (!cached || cached.expiresAt <= Date.now()) {
+      if (cached) {
+        this.users.delete(userId);
+      }
+      this.counters.userMisses++;
+      return null;
+    }
+    this.users.delete(userId);
+    this.users.set(userId, cached);
+    this.counters.userHits++;
+    return cached.user;
+  }
+
+  rememberUser(user: AuthUser): void {
+    const { userTtlMs, maxUsers } = this.configure();
+    this.users.set(user.id, { user: { id: user.id, name: user.name, email: user.email }, expiresAt: Date.now() + userTtlMs });
+    this.evict(this.users, maxUsers);
+  }
+
+  // Call whenever a user record changes
+  invalidateUser(userId: string): void {
+    this.users.delete(userId);
+    broadcast('auth:user-changed', userId);
+  }
+
+  // Sign a token out for the rest of its lifetime
+  async revoke(tokenHash: string, verified: VerifiedToken): Promise<void> {
+    await repositories().revocations.revoke({
+      tokenHash,
+      userId: verified.userId,
+      expiresAt: new Date(verified.expiresAt)
+    });
+    this.applyRevocation(tokenHash, verified.expiresAt);
+    broadcast('auth:revoked', { tokenHash, expiresAt: verified.expiresAt });
+  }
+
+  applyRevocation(tokenHash: string, expiresAt: number): void {
+    this.revoked.set(tokenHash, expiresAt);
+    this.tokens.delete(tokenHash);
+  }
+
+  forgetUser(userId: string): void {
+    this.users.delete(userId);
+  }
+
+  stats() {
+    const { tokenHits, tokenMisses, userHits, userMisses, revokedRejections } = this.counters;
+    return {
+      tokenHits,
+      tokenMisses,
+      tokenHitRatio: tokenHits + tokenMisses ? tokenHits / (tokenHits + tokenMisses) : 0,
+      userHits,
+      userMisses,
+      userHitRatio: userHits + userMisses ? userHits / (userHits + userMisses) : 0,
+      revokedRejections,
+      tokens: this.tokens.size,
+      users: this.users.size,
+      revoked: this.revoked.size
+    };
+  }
+
+  private async refreshRevocations(): Promise<void> {
+    // Merged, not replaced: revocations are never undone, and one made while
+    // the list was loading must not be lost
+    const active = await repositories().revocations.listActive();
+    for (const token of active) {
+      this.revoked.set(token.tokenHash, token.expiresAt.getTime());
+      this.tokens.delete(token.tokenHash);
+    }
+    const now = Date.now();
+    for (const [tokenHash, expiresAt] of this.revoked) {
+      if (expiresAt <= now) {
+        this.revoked.delete(tokenHash);
+      }
+    }
+  }
+
+  private evict<V>(map: Map<string, V>, max: number): void {
+    for (const oldestKey of map.keys()) {
+      if (map.size <= max) {
+        break;
+      }
+      map.delete(oldestKey);
+    }
+  }
+
+  private configure(): AuthCacheOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const authCache = new AuthCache();
+
+onClusterMessage('auth:revoked', ({ tokenHash, expiresAt }) => authCache.applyRevocation(tokenHash, expiresAt));
+onClusterMessage('auth:user-changed', (userId: string) => authCache.forgetUser(userId));
+
+export default authCache;
@@ -0,0 +1,231 @@
+import puppeteer, { Browser } from 'puppeteer';
+import { workerShare } from '../utils/cluster.js';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+import tracer from '../utils/tracing.js';
+
+// Launch options shared by every pooled browser
+const launchOptions = {
+  headless: true,
+  args: ['--no-sandbox', '--disable-setuid-sandbox']
+};
+
+interface BrowserSlot {
+  id: number;
+  browser: Browser | null;
+  launching: Promise<Browser> | null;
+  leases: number;
+  launches: number;
+}
+
+export interface BrowserPoolOptions {
+  size: number;
+  healthCheckIntervalMs: number;
+  healthCheckTimeoutMs: number;
+}
+
+// Read at start() rather than import time so values from .env are picked up.
+// PDF_BROWSER_POOL_SIZE is a machine-wide total, split between the API
+// workers in cluster mode (and by each of them between its render workers).
+const optionsFromEnv = (): BrowserPoolOptions => ({
+  size: workerShare(Math.max(1, parseInt(process.env.PDF_BROWSER_POOL_SIZE || '1', 10) || 1)),
+  healthCheckIntervalMs: parseInt(process.env.PDF_BROWSER_HEALTH_CHECK_MS || '30000', 10),
+  healthCheckTimeoutMs: parseInt(process.env.PDF_BROWSER_HEALTH_TIMEOUT_MS || '5000', 10)
+});
+
+// Long-lived pool of headless Chromium instances owned by the server process.
+// Routes borrow a browser with acquire()/release() (or withBrowser) instead of
+// paying a full Chromium cold start per request.
+export class BrowserPool {
+  private slots: BrowserSlot[] = [];
+  private healthTimer: NodeJS.Timeout | null = null;
+  private closing = false;
+  private overrides: Partial<BrowserPoolOptions>;
+  private options: BrowserPoolOptions | null = null;
+
+  constructor(overrides: Partial<BrowserPoolOptions> = {}) {
+    this.overrides = overrides;
+  }
+
+  get size(): number {
+    return this.configure().size;
+  }
+
+  // Launch every browser up front and begin periodic health checks
+  async start(): Promise<void> {
+    this.closing = false;
+    const options = this.configure();
+    await Promise.all(this.slots.map(slot => this.ensureBrowser(slot)));
+
+    if (!this.healthTimer && options.healthCheckIntervalMs > 0) {
+      this.healthTimer = setInterval(() => {
+        this.checkHealth().catch(error => {
+          logger.error('Browser pool health check error', error);
+        });
+      }, options.healthCheckIntervalMs);
+      this.healthTimer.unref();
+    }
+
+    logger.info(`Browser pool started with ${this.slots.length} browser(s)`);
+  }
+
+  // Borrow the least-loaded browser, relaunching it first if it has died
+  async acquire(): Promise<Browser> {
+    if (this.closing) {
+      throw new Error('Browser pool is shutting down');
+    }
+
+    this.configure();
+    const slot = this.slots.reduce((best, candidate) =>
+      candidate.leases < best.leases ? candidate : best
+    );
+    slot.leases++;
+
+    try {
+      // A request that has to wait for a (re)launch shows it in its trace
+      if (slot.browser && slot.browser.connected) {
+        return slot.browser;
+      }
+      return await tracer.span('browserLaunch', () => this.ensureBrowser(slot));
+    } catch (error) {
+      slot.leases--;
+      throw error;
+    }
+  }
+
+  release(browser: Browser): void {
+    const slot = this.slots.find(candidate => candidate.browser === browser);
+    if (slot && slot.leases > 0) {
+      slot.leases--;
+    }
+  }
+
+  async withBrowser<T>(fn: (browser: Browser) => Promise<T>): Promise<T> {
+    const browser = await this.acquire();
+    try {
+      return await fn(browser);
+    } finally {
+      this.release(browser);
+    }
+  }
+
+  // Close every browser; safe to call more than once
+  async shutdown(): Promise<void> {
+    this.closing = true;
+
+    if (this.healthTimer) {
+      clearInterval(this.healthTimer);
+      this.healthTimer = null;
+    }
+
+    await Promise.all(this.slots.map(async slot => {
+      const browser = slot.browser || (slot.launching ? await slot.launching.catch(() => null) : null);
+      slot.browser = null;
+      slot.launching = null;
+      if (browser) {
+        await browser.close().catch(() => browser.process()?.kill('SIGKILL'));
+      }
+    }));
+
+    logger.info('Browser pool shut down');
+  }
+
+  stats() {
+    return this.slots.map(slot => ({
+      id: slot.id,
+      connected: !!slot.browser && slot.browser.connected,
+      leases: slot.leases,
+      launches: slot.launches
+    }));
+  }
+
+  private configure(): BrowserPoolOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+      for (let i = 0; i < this.options.size; i++) {
+        this.slots.push({ id: i, browser: null, launching: null, leases: 0, launches: 0 });
+      }
+    }
+    return this.options;
+  }
+
+  private ensureBrowser(slot: BrowserSlot): Promise<Browser> {
+    if (slot.browser && slot.browser.connected) {
+      return Promise.resolve(slot.browser);
+    }
+    if (!slot.launching) {
+      slot.launching = this.launch(slot).finally(() => {
+        slot.launching = null;
+      });
+    }
+    return slot.launching;
+  }
+
+  private async launch(slot: BrowserSlot): Promise<Browser> {
+    const browser = await puppeteer.launch(launchOptions);
+    slot.browser = browser;
+    slot.launches++;
+
+    // Relaunch automatically if Chromium crashes or the connection drops
+    browser.on('disconnected', () => {
+      if (slot.browser !== browser) {
+        return;
+      }
+      slot.browser = null;
+      // Leases held on the dead browser can no longer be released against it
+      slot.leases = 0;
+      if (!this.closing) {
+        logger.warn('Browser disconnected, relaunching', { browser: slot.id });
+        this.ensureBrowser(slot).catch(error => {
+          logger.error('Browser relaunch failed', { browser: slot.id, err: error });
+        });
+      }
+    });
+
+    return browser;
+  }
+
+  private async checkHealth(): Promise<void> {
+    await Promise.all(this.slots.map(async slot => {
+      const browser = slot.browser;
+      if (!browser || this.closing) {
+        return;
+      }
+
+      let timer: NodeJS.Timeout | undefined;
+      const timeout = new Promise<never>((_, reject) => {
+        timer = setTimeout(
+          () => reject(new Error('Health check timed out')),
+          this.configure().healthCheckTimeoutMs
+        );
+      });
+
+      try {
+        await Promise.race([browser.version(), timeout]);
+      } catch (error) {
+        // Unresponsive browser: kill it so the disconnect handler relaunches it
+        logger.warn('Browser failed health check', { browser: slot.id, err: error });
+        browser.process()?.kill('SIGKILL');
+      } finally {
+        clearTimeout(timer);
+      }
+    }));
+  }
+}
+
+const browserPool = new BrowserPool();
+
+metrics.gauge('pdf_browsers', 'Pooled browsers by state', () => {
+  const slots = browserPool.stats();
+  const connected = slots.filter(slot => slot.connected).length;
+  return [
+    { labels: { state: 'connected' }, value: connected },
+    { labels: { state: 'down' }, value: slots.length - connected }
+  ];
+});
+metrics.gauge('pdf_browser_leases', 'Pages and renders holding a browser, per browser', () =>
+  browserPool.stats().map(slot => ({ labels: { browser: slot.id }, value: slot.leases })));
+metrics.counterFrom('pdf_browser_launches_total', 'Browser launches, including relaunches', () =>
+  browserPool.stats().reduce((total, slot) => total + slot.launches, 0));
+
+export default browserPool;
@@ -0,0 +1,232 @@
+import crypto from 'crypto';
+import { Request, Response, NextFunction } from 'express';
+import { setTimeout as delay } from 'timers/promises';
+import repositories, { IdempotencyRecord, StoredResponse } from '../repositories/index.js';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+
+export interface IdempotencyOptions {
+  // How long a completed response is replayed
+  ttlMs: number;
+  // How long a claim of a request still running holds its key; a worker
+  // that dies mid-request frees the key after this
+  pendingTtlMs: number;
+  // How long a duplicate polls for a request running in another worker
+  // before a 409 (duplicates in the same process wait for it to finish)
+  waitMs: number;
+  // Larger responses are not stored, so a retry runs the request again
+  maxBodyBytes: number;
+}
+
+const optionsFromEnv = (): IdempotencyOptions => ({
+  ttlMs: parseFloat(process.env.IDEMPOTENCY_TTL_HOURS || '24') * 60 * 60 * 1000,
+  pendingTtlMs: parseInt(process.env.IDEMPOTENCY_PENDING_TTL_MS || '300000', 10),
+  waitMs: parseInt(process.env.IDEMPOTENCY_WAIT_MS || '30000', 10),
+  // A MongoDB document is capped at 16 MB
+  maxBodyBytes: Math.min(15, parseFloat(process.env.IDEMPOTENCY_MAX_BODY_MB || '8')) * 1024 * 1024
+});
+
+const validKey = /^[\x21-\x7e]{1,255}$/;
+
+// Headers replayed with a stored response; the rest are regenerated
+const replayedHeaders = ['content-type', 'content-disposition', 'location'];
+
+const sha256 = (value: string): string => crypto.createHash('sha256').update(value).digest('hex');
+
+// 5xx, timeouts, conflicts and rate limits are transient: the key is
+// released so a retry runs the request again
+const isStorable = (status: number): boolean => status < 500 && status !== 408 && status !== 409 && status !== 429;
+
+// Idempotency-Key support for mutating routes, mounted after auth. The first
+// request with a key claims it in the repository; its response is captured
+// as it is written and stored for replay until ttlMs passes. Duplicates in
+// the same process wait on the running request, and duplicates in other
+// cluster workers poll the stored record, so a retry never repeats the work.
+// A key reused with a different body or query is rejected with 422.
+export class IdempotencyKeys {
+  private running = new Map<string, Promise<void>>();
+  private options: IdempotencyOptions | null = null;
+  private counters = { claimed: 0, replayed: 0, coalesced: 0, conflicts: 0, mismatches: 0, notStored: 0 };
+
+  constructor(private overrides: Partial<IdempotencyOptions> = {}) {}
+
+  middleware = async (req: Request, res: Response, next: NextFunction) => {
+    const header = req.headers['idempotency-key'];
+    if (header === undefined) {
+      return next();
+    }
+    const clientKey = Array.isArray(header) ? header[0] : header;
+    if (!validKey.test(clientKey)) {
+      return res.status(400).json({ message: 'Idempotency-Key must be 1 to 255 printable characters' });
+    }
+
+    const userId = String((req as any).user?._id);
+    const key = sha256([userId, req.method, `${req.baseUrl}${req.path}`, clientKey].join('\n'));
+    const fingerprint = sha256(JSON.stringify([req.originalUrl.split('?')[1] || '', req.body ?? null]));
+
+    let existing: IdempotencyRecord | null;
+    try {
+      existing = await this.acquire(key, userId, fingerprint);
+    } catch (error) {
+      logger.error('Idempotency key error', error);
+      return res.status(500).json({ message: 'Internal server error' });
+    }
+
+    if (!existing) {
+      this.counters.claimed++;
+      return this.capture(key, res, next);
+    }
+    if (existing.fingerprint !== fingerprint) {
+      this.counters.mismatches++;
+      return res.status(422).json({ message: 'Idempotency-Key was already used for a different request' });
+    }
+    if (existing.state === 'pending' || !existing.response) {
+      this.counters.conflicts++;
+      res.setHeader('Retry-After', '1');
+      return res.status(409).json({ message: 'A request with this Idempotency-Key is still in progress' });
+    }
+
+    this.counters.replayed++;
+    const { status, headers, body } = existing.response;
+    for (const [name, value] of Object.entries(headers)) {
+      res.setHeader(name, value);
+    }
+    res.setHeader('Idempotent-Replayed', 'true');
+    res.status(status).send(body);
+  };
+
+  stats() {
+    return { running: this.running.size, ...this.counters };
+  }
+
+  // Claim the key, or return the record holding it once it is done (or the
+  // wait runs out). Null means this request claimed the key.
+  private async acquire(key: string, userId: string, fingerprint: string): Promise<IdempotencyRecord | null> {
+    const { pendingTtlMs, waitMs } = this.configure();
+    const deadline = Date.now() + waitMs;
+    let pollMs = 50;
+    let coalesced = false;
+
+    for (;;) {
+      const running = this.running.get(key);
+      if (running) {
+        if (!coalesced) {
+          coalesced = true;
+          this.counters.coalesced++;
+        }
+        await running;
+        continue;
+      }
+
+      const existing = await repositories().idempotency.claim({
+        key,
+        userId,
+        fingerprint,
+        state: 'pending',
+        expiresAt: new Date(Date.now() + pendingTtlMs)
+      });
+      if (!existing || existing.state === 'done' || existing.fingerprint !== fingerprint || Date.now() >= deadline) {
+        return existing;
+      }
+
+      // Still running in another worker
+      await delay(Math.min(pollMs, Math.max(0, deadline - Date.now())));
+      pollMs = Math.min(pollMs * 2, 1000);
+    }
+  }
+
+  // Run the handler, keeping a copy of what it writes, then store the
+  // response or release the key
+  private capture(key: string, res: Response, next: NextFunction): void {
+    const { ttlMs, maxBodyBytes } = this.configure();
+    let settle!: () => void;
+    this.running.set(key, new Promise<void>(resolve => { settle = resolve; }));
+
+    const chunks: Buffer[] = [];
+    let bytes = 0;
+    let overflow = false;
+    const keep = (chunk: any, encoding?: any) => {
+      if (overflow || chunk === undefined || chunk === null || typeof chunk === 'function') {
+        return;
+      }
+      const buffer = typeof chunk === 'string'
+        ? Buffer.from(chunk, typeof encoding === 'string' ? encoding as BufferEncoding : 'utf8')
+        : Buffer.from(chunk);
+      bytes += buffer.length;
+      if (bytes > maxBodyBytes) {
+        overflow = true;
+        chunks.length = 0;
+      } else {
+        chunks.push(buffer);
+      }
+    };
+
+    const write = res.write;
+    const end = res.end;
+    res.write = function (this: Response, chunk: any, ...args: any[]) {
+      keep(chunk, args[0]);
+      return (write as any).apply(this, [chunk, ...args]);
+    } as typeof res.write;
+    res.end = function (this: Response, chunk?: any, ...args: any[]) {
+      keep(chunk, args[0]);
+      return (end as any).apply(this, [chunk, ...args]);
+    } as typeof res.end;
+
+    let done = false;
+    const finish = () => {
+      if (done) {
+        return;
+      }
+      done = true;
+      const idempotency = repositories().idempotency;
+      let stored: Promise<void>;
+      // An aborted response is not replayable: let the retry run it again
+      if (res.writableFinished && isStorable(res.statusCode) && !overflow) {
+        const headers: Record<string, string> = {};
+        for (const name of replayedHeaders) {
+          const value = res.getHeader(name);
+          if (value !== undefined) {
+            headers[name] = String(value);
+          }
+        }
+        const response: StoredResponse = { status: res.statusCode, headers, body: Buffer.concat(chunks) };
+        stored = idempotency.complete(key, response, new Date(Date.now() + ttlMs));
+      } else {
+        this.counters.notStored++;
+        stored = idempotency.release(key);
+      }
+      stored
+        .catch(error => logger.error('Idempotency key error', error))
+        .finally(() => {
+          this.running.delete(key);
+          settle();
+        });
+    };
+    res.once('finish', finish);
+    res.once('close', finish);
+    next();
+  }
+
+  private configure(): IdempotencyOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const idempotencyKeys = new IdempotencyKeys();
+
+metrics.counterFrom('idempotency_requests_total', 'Requests sent with an Idempotency-Key, by outcome', () => {
+  const { claimed, replayed, conflicts, mismatches } = idempotencyKeys.stats();
+  return [
+    { labels: { outcome: 'claimed' }, value: claimed },
+    { labels: { outcome: 'replayed' }, value: replayed },
+    { labels: { outcome: 'conflict' }, value: conflicts },
+    { labels: { outcome: 'mismatch' }, value: mismatches }
+  ];
+});
+metrics.counterFrom('idempotency_coalesced_total', 'Duplicate requests that waited on one running in this process', () =>
+  idempotencyKeys.stats().coalesced);
+
+export default idempotencyKeys;
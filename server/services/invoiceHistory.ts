@@ -0,0 +1,113 @@
+import type { InvoiceStatus } from '../models/invoiceModel.js';
+import repositories from '../repositories/index.js';
+import { decodeKeyCursor, encodeCursor } from '../utils/cursor.js';
+import { applyInvoiceToRollups } from './revenueRollups.js';
+import type { InvoiceFields, RenderEngine } from './invoiceRenderer.js';
+
+export interface InvoiceRecord {
+  userId: string;
+  invoiceNumber: string;
+  fields: InvoiceFields;
+  contentHash: string;
+  filename: string;
+  engine: RenderEngine;
+  size: number;
+}
+
+export type InvoiceSort = 'date' | 'total';
+
+export interface InvoiceQuery {
+  from?: Date;
+  to?: Date;
+  minTotal?: number;
+  maxTotal?: number;
+  status: InvoiceStatus;
+  sort: InvoiceSort;
+  limit: number;
+  cursor?: string;
+}
+
+const amount = (value: unknown): number => Math.round((Number(value) || 0) * 100) / 100;
+
+// Record a rendered invoice. Upserts on (userId, invoiceNumber) so a render
+// job completes the document it was queued on instead of adding another, and
+// folds the invoice into the revenue rollups the first time it is recorded.
+export const recordInvoice = async (record: InvoiceRecord): Promise<void> => {
+  const { userId, invoiceNumber, fields } = record;
+  const products = fields.products.map(product => ({
+    name: String(product.name),
+    qty: Number(product.qty) || 0,
+    rate: amount(product.rate),
+    total: amount(product.total)
+  }));
+  const totals = {
+    subtotal: amount(fields.subtotal),
+    tax: amount(fields.tax),
+    total: amount(fields.total)
+  };
+  const now = new Date();
+
+  // The previous state tells whether this invoice was already counted
+  const previous = await repositories().invoices.upsertByNumber(String(userId), invoiceNumber, {
+    products,
+    ...totals,
+    contentHash: record.contentHash,
+    filename: record.filename,
+    engine: record.engine,
+    size: record.size,
+    status: 'completed',
+    completedAt: now
+  }, now);
+
+  if (!previous?.contentHash) {
+    await applyInvoiceToRollups({
+      userId: String(userId),
+      date: previous?.date || now,
+      products,
+      ...totals
+    });
+  }
+};
+
+// One page of a user's invoices with the given status, newest (or largest)
+// first; the history is completed invoices unless asked otherwise. Pages are
+// keyset paginated on (sort field, id), so each page is a bounded index range
+// scan no matter how deep the user pages.
+export const listInvoices = async (userId: string, query: InvoiceQuery) => {
+  const page = await repositories().invoices.list(String(userId), {
+    sort: query.sort,
+    limit: query.limit,
+    from: query.from,
+    to: query.to,
+    minTotal: query.minTotal,
+    maxTotal: query.maxTotal,
+    status: query.status,
+    after: query.cursor ? decodeKeyCursor(query.cursor, 'number') : undefined
+  });
+
+  const last = page.items[page.items.length - 1];
+  const nextCursor = page.hasMore && last
+    ? encodeCursor([query.sort === 'date' ? last.date.getTime() : Number(last.total), last.id])
+    : null;
+
+  return {
+    invoices: page.items.map(invoice => ({
+      id: invoice.id,
+      invoiceNumber: invoice.invoiceNumber,
+      date: invoice.date,
+      status: invoice.status || 'completed',
+      products: invoice.products,
+      subtotal: invoice.subtotal,
+      tax: invoice.tax,
+      total: invoice.total,
+      contentHash: invoice.contentHash,
+      filename: invoice.filename,
+      engine: invoice.engine,
+      size: invoice.size,
+      ...(invoice.invoiceNumber && invoice.filename && {
+        fileUrl: `/api/invoices/${encodeURIComponent(invoice.invoiceNumber)}/file`
+      })
+    })),
+    nextCursor
+  };
+};
@@ -0,0 +1,82 @@
+import repositories from '../repositories/index.js';
+import metrics from '../utils/metrics.js';
+
+export interface InvoiceNumberOptions {
+  // Numbers reserved per counter round trip. Numbers left in a block when
+  // the process stops are skipped, so larger blocks leave larger gaps.
+  blockSize: number;
+  prefix: string;
+  // Zero-padded width of the number part
+  digits: number;
+}
+
+const optionsFromEnv = (): InvoiceNumberOptions => ({
+  blockSize: Math.max(1, parseInt(process.env.INVOICE_NUMBER_BLOCK_SIZE || '20', 10) || 1),
+  prefix: process.env.INVOICE_NUMBER_PREFIX ?? 'INV-',
+  digits: parseInt(process.env.INVOICE_NUMBER_DIGITS || '6', 10)
+});
+
+interface Block {
+  next: number;
+  last: number;
+}
+
+// Per-user invoice numbers from a counter in the database, reserved in
+// blocks (hi/lo): each process takes the next blockSize numbers in one
+// atomic increment and hands them out locally. Numbers are unique across
+// processes and increase within each process; with several cluster workers
+// a user's invoices interleave blocks, so numbering is not strictly
+// chronological across workers.
+export class InvoiceNumberAllocator {
+  private blocks = new Map<string, Block>();
+  private reserving = new Map<string, Promise<void>>();
+  private options: InvoiceNumberOptions | null = null;
+  private counters = { allocated: 0, reservations: 0 };
+
+  constructor(private overrides: Partial<InvoiceNumberOptions> = {}) {}
+
+  async next(userId: string): Promise<string> {
+    const { prefix, digits } = this.configure();
+    for (;;) {
+      const block = this.blocks.get(userId);
+      if (block && block.next <= block.last) {
+        this.counters.allocated++;
+        return prefix + String(block.next++).padStart(digits, '0');
+      }
+      // One reservation per user at a time; concurrent callers share it
+      let reservation = this.reserving.get(userId);
+      if (!reservation) {
+        reservation = this.reserve(userId).finally(() => this.reserving.delete(userId));
+        this.reserving.set(userId, reservation);
+      }
+      await reservation;
+    }
+  }
+
+  stats() {
+    return { users: this.blocks.size, blockSize: this.configure().blockSize, ...this.counters };
+  }
+
+  private async reserve(userId: string): Promise<void> {
+    const { blockSize } = this.configure();
+    const first = await repositories().sequences.reserve(`invoice:${userId}`, blockSize);
+    this.blocks.set(userId, { next: first, last: first + blockSize - 1 });
+    this.counters.reservations++;
+  }
+
+  private configure(): InvoiceNumberOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const invoiceNumbers = new InvoiceNumberAllocator();
+
+metrics.counterFrom('invoice_numbers_allocated_total', 'Invoice numbers handed out', () =>
+  invoiceNumbers.stats().allocated);
+metrics.counterFrom('invoice_number_block_reservations_total', 'Invoice number blocks reserved from the counter', () =>
+  invoiceNumbers.stats().reservations);
+
+export default invoiceNumbers;
@@ -0,0 +1,149 @@
+import pagePool from './pagePool.js';
+import { renderInvoicePdfNative } from './nativePdf.js';
+import { PdfCache, canonicalizeInvoice, hashInvoice } from './pdfCache.js';
+import { recordInvoice } from './invoiceHistory.js';
+import invoiceNumbers from './invoiceNumbers.js';
+import { RenderTimings, observeRenderTimings, recordRenderPhase } from './renderMetrics.js';
+import { InvoiceFileMeta, getInvoiceStore } from './storage/invoiceStore.js';
+import { InvoiceData } from '../templates/invoice.js';
+import { getTemplate } from '../templates/registry.js';
+import logger from '../utils/logger.js';
+
+export type InvoiceFields = Omit<InvoiceData, 'invoiceNumber'>;
+
+// 'chromium' prints the HTML template; 'native' writes the PDF directly
+export type RenderEngine = 'chromium' | 'native';
+
+export interface RenderedInvoice {
+  invoiceNumber: string;
+  filename: string;
+  buffer: Buffer;
+  cacheStatus: 'HIT' | 'MISS';
+}
+
+// Request payload failed validation
+export class InvoiceValidationError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = 'InvoiceValidationError';
+  }
+}
+
+// Previously rendered invoices, keyed by a hash of the normalized payload
+export const pdfCache = new PdfCache(getInvoiceStore);
+
+// Build the printable invoice from a request payload ({ products, subtotal, gst, grandTotal })
+export const buildInvoiceFields = (payload: any): InvoiceFields => {
+  const { products, subtotal, gst, grandTotal } = payload || {};
+
+  if (!products || !Array.isArray(products) || products.length === 0) {
+    throw new InvoiceValidationError('Products data is required');
+  }
+
+  return {
+    date: new Date().toLocaleDateString(),
+    companyName: 'Your Company Name',
+    companyAddress: '123 Business Street\nCity, State 12345\nPhone: (555) 123-4567',
+    clientName: 'Client Name',
+    clientAddress: '456 Client Avenue\nClient City, State 67890',
+    products: products.map((product: any) => ({
+      name: product.name,
+      qty: product.quantity,
+      rate: product.rate,
+      total: product.quantity * product.rate
+    })),
+    subtotal: subtotal || 0,
+    tax: gst || 0,
+    total: grandTotal || 0
+  };
+};
+
+// Per-request choice (?engine= or body.engine), falling back to PDF_ENGINE
+export const resolveEngine = (requested?: unknown): RenderEngine => {
+  const engine = requested || process.env.PDF_ENGINE;
+  return engine === 'native' ? 'native' : 'chromium';
+};
+
+// Bump when the native layout changes so cached native renders are invalidated
+const nativeLayoutVersion = '1';
+
+export const invoiceCacheKey = (userId: string, fields: InvoiceFields, engine: RenderEngine = 'chromium'): string => {
+  const version = engine === 'native' ? nativeLayoutVersion : getTemplate('invoice').version;
+  return hashInvoice(canonicalizeInvoice(userId, fields, `${engine}:${version}`));
+};
+
+// Body markup for the pooled page, from the compiled invoice template
+export const renderInvoiceBody = (invoiceData: InvoiceData): string =>
+  getTemplate('invoice').renderBody({ ...invoiceData, generatedAt: new Date().toLocaleString() });
+
+// Next number in the user's invoice sequence
+export const newInvoiceNumber = (userId: string): Promise<string> => invoiceNumbers.next(String(userId));
+
+// Render an invoice to PDF bytes without saving it; phase times go into timings
+export const renderInvoicePdf = async (
+  invoiceData: InvoiceData,
+  engine: RenderEngine = 'chromium',
+  timings: RenderTimings = {}
+): Promise<Buffer> => {
+  if (engine !== 'native') {
+    return pagePool.render(renderInvoiceBody(invoiceData), timings);
+  }
+  const started = Date.now();
+  const buffer = await renderInvoicePdfNative(invoiceData);
+  timings.print = Date.now() - started;
+  return buffer;
+};
+
+// Add a stored invoice to the user's invoice history. History is secondary
+// to the file itself, so a failure here is logged rather than failing the render.
+export const recordRenderedInvoice = (
+  meta: InvoiceFileMeta,
+  fields: InvoiceFields,
+  engine: RenderEngine,
+  size: number
+): Promise<void> =>
+  recordInvoice({
+    userId: meta.userId,
+    invoiceNumber: meta.invoiceNumber,
+    fields,
+    contentHash: meta.contentKey,
+    filename: meta.filename,
+    engine,
+    size
+  }).catch(error => {
+    logger.error('Failed to record invoice', { invoiceNumber: meta.invoiceNumber, err: error });
+  });
+
+// Save a rendered invoice to the invoice store, the render cache and the
+// user's invoice history
+export const saveRenderedInvoice = async (
+  meta: InvoiceFileMeta,
+  buffer: Buffer,
+  fields: InvoiceFields,
+  engine: RenderEngine
+): Promise<void> => {
+  const started = Date.now();
+  await getInvoiceStore().put(meta, buffer);
+  recordRenderPhase('write', Date.now() - started, engine);
+  pdfCache.set(meta.contentKey, { invoiceNumber: meta.invoiceNumber, filename: meta.filename, buffer });
+  await recordRenderedInvoice(meta, fields, engine, buffer.length);
+};
+
+// Render, save and cache an invoice. Chromium renders are expected to run
+// through the render scheduler; native ones are cheap enough to run inline.
+export const renderInvoiceFile = async (
+  userId: string,
+  fields: InvoiceFields,
+  cacheKey: string,
+  engine: RenderEngine = 'chromium',
+  invoiceNumber?: string
+): Promise<RenderedInvoice> => {
+  invoiceNumber = invoiceNumber ?? await newInvoiceNumber(userId);
+  const timings: RenderTimings = {};
+  const buffer = await renderInvoicePdf({ invoiceNumber, ...fields }, engine, timings);
+  observeRenderTimings(timings, engine);
+  const filename = getInvoiceStore().filenameFor(invoiceNumber, cacheKey);
+  await saveRenderedInvoice({ userId: String(userId), invoiceNumber, filename, contentKey: cacheKey }, buffer, fields, engine);
+
+  return { invoiceNumber, filename, buffer, cacheStatus: 'MISS' };
+};
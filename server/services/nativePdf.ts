@@ -0,0 +1,332 @@
+import zlib from 'zlib';
+import { InvoiceData } from '../templates/invoice.js';
+
+// Chromium-free renderer for the built-in invoice layout. Writes PDF objects
+// directly using the standard Helvetica fonts (no embedding), mirroring the
+// HTML template: header, address blocks, a line-item table that breaks across
+// pages with a repeated header row, totals and footer.
+
+// Glyph widths (1/1000 em) for WinAnsi codes 32-126, from the standard AFM metrics
+const helveticaWidths = [
+  278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+  556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+  1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+  667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+  333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+  556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584
+];
+
+const helveticaBoldWidths = [
+  278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+  556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+  975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+  667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+  333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+  611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584
+];
+
+type Font = 'F1' | 'F2';
+type Color = [number, number, number];
+
+const BLUE: Color = [0, 0.482, 1];
+const TEXT: Color = [0.2, 0.2, 0.2];
+const MUTED: Color = [0.4, 0.4, 0.4];
+const WHITE: Color = [1, 1, 1];
+const BORDER: Color = [0.867, 0.867, 0.867];
+const STRIPE: Color = [0.976, 0.976, 0.976];
+
+// A4 in points; 20px page margin plus 20px body padding
+const PAGE_WIDTH = 595.28;
+const PAGE_HEIGHT = 841.89;
+const MARGIN = 30;
+const CONTENT_WIDTH = PAGE_WIDTH - MARGIN * 2;
+
+const BODY_SIZE = 12;
+const CELL_PADDING = 9;
+const HEADER_ROW_HEIGHT = 30;
+const ROW_HEIGHT = 27;
+const TOTALS_WIDTH = 225;
+const TOTALS_ROW_HEIGHT = 24;
+
+// Table columns: name, quantity, rate, total
+const columnWidths = [0.5, 0.15, 0.175, 0.175].map(share => share * CONTENT_WIDTH);
+
+const num = (value: number) => (Math.round(value * 100) / 100).toString();
+
+// Map to WinAnsi bytes; characters outside Latin-1 become '?'
+const toWinAnsi = (text: string): number[] => {
+  const bytes: number[] = [];
+  for (const char of text) {
+    const code = char.codePointAt(0) as number;
+    bytes.push((code >= 32 && code <= 126) || (code >= 160 && code <= 255) ? code : 63);
+  }
+  return bytes;
+};
+
+const textWidth = (text: string, font: Font, size: number): number => {
+  const widths = font === 'F2' ? helveticaBoldWidths : helveticaWidths;
+  let total = 0;
+  for (const code of toWinAnsi(text)) {
+    total += code <= 126 ? widths[code - 32] : 556;
+  }
+  return (total * size) / 1000;
+};
+
+const pdfString = (text: string): string => {
+  let out = '(';
+  for (const code of toWinAnsi(text)) {
+    if (code === 40 || code === 41 || code === 92) {
+      out += '\\' + String.fromCharCode(code);
+    } else if (code > 126) {
+      out += '\\' + code.toString(8).padStart(3, '0');
+    } else {
+      out += String.fromCharCode(code);
+    }
+  }
+  return out + ')';
+};
+
+// Shorten text with an ellipsis until it fits the given width
+const fit = (text: string, font: Font, size: number, width: number): string => {
+  if (textWidth(text, font, size) <= width) {
+    return text;
+  }
+  let low = 0;
+  let high = text.length;
+  while (low < high) {
+    const mid = Math.ceil((low + high) / 2);
+    if (textWidth(text.slice(0, mid) + '...', font, size) <= width) {
+      low = mid;
+    } else {
+      high = mid - 1;
+    }
+  }
+  return text.slice(0, low) + '...';
+};
+
+const money = (value: number) => '$' + (Number(value) || 0).toFixed(2);
+
+// Content stream for one page, addressed from the top-left like the HTML layout
+class PageCanvas {
+  ops: string[] = [];
+
+  text(value: string, x: number, top: number, font: Font, size: number, color: Color): void {
+    this.ops.push(
+      `BT /${font} ${num(size)} Tf ${color.join(' ')} rg ${num(x)} ${num(PAGE_HEIGHT - top)} Td ${pdfString(value)} Tj ET`
+    );
+  }
+
+  textRight(value: string, right: number, top: number, font: Font, size: number, color: Color): void {
+    this.text(value, right - textWidth(value, font, size), top, font, size, color);
+  }
+
+  textCenter(value: string, center: number, top: number, font: Font, size: number, color: Color): void {
+    this.text(value, center - textWidth(value, font, size) / 2, top, font, size, color);
+  }
+
+  fillRect(x: number, top: number, width: number, height: number, color: Color): void {
+    this.ops.push(
+      `${color.join(' ')} rg ${num(x)} ${num(PAGE_HEIGHT - top - height)} ${num(width)} ${num(height)} re f`
+    );
+  }
+
+  strokeRect(x: number, top: number, width: number, height: number, color: Color, lineWidth = 0.75): void {
+    this.ops.push(
+      `${color.join(' ')} RG ${num(lineWidth)} w ${num(x)} ${num(PAGE_HEIGHT - top - height)} ${num(width)} ${num(height)} re S`
+    );
+  }
+
+  line(x1: number, top1: number, x2: number, top2: number, color: Color, lineWidth: number): void {
+    this.ops.push(
+      `${color.join(' ')} RG ${num(lineWidth)} w ${num(x1)} ${num(PAGE_HEIGHT - top1)} m ${num(x2)} ${num(PAGE_HEIGHT - top2)} l S`
+    );
+  }
+}
+
+// Baseline offset that vertically centres body text in a box of the given height
+const baseline = (top: number, height: number, size: number) => top + height / 2 + size * 0.35;
+
+const drawTableHeader = (page: PageCanvas, top: number): number => {
+  const labels = ['Product Name', 'Quantity', 'Rate', 'Total'];
+  let x = MARGIN;
+  labels.forEach((label, index) => {
+    const width = columnWidths[index];
+    page.fillRect(x, top, width, HEADER_ROW_HEIGHT, BLUE);
+    page.strokeRect(x, top, width, HEADER_ROW_HEIGHT, BORDER);
+    const y = baseline(top, HEADER_ROW_HEIGHT, BODY_SIZE);
+    if (index === 0) {
+      page.text(label, x + CELL_PADDING, y, 'F2', BODY_SIZE, WHITE);
+    } else {
+      page.textRight(label, x + width - CELL_PADDING, y, 'F2', BODY_SIZE, WHITE);
+    }
+    x += width;
+  });
+  return top + HEADER_ROW_HEIGHT;
+};
+
+const drawHeader = (page: PageCanvas, invoiceData: InvoiceData): number => {
+  const right = MARGIN + CONTENT_WIDTH;
+  page.text('INVOICE GENERATOR', MARGIN, MARGIN + 24, 'F2', 18, BLUE);
+  page.textRight(invoiceData.invoiceNumber, right, MARGIN + 16, 'F2', 13.5, TEXT);
+  page.textRight(invoiceData.date, right, MARGIN + 34, 'F1', BODY_SIZE, MUTED);
+
+  const ruleTop = MARGIN + 52;
+  page.line(MARGIN, ruleTop, right, ruleTop, BLUE, 1.5);
+  return ruleTop + 22.5;
+};
+
+const drawAddresses = (page: PageCanvas, invoiceData: InvoiceData, top: number): number => {
+  const blocks = [
+    { x: MARGIN, title: 'From:', lines: [invoiceData.companyName, ...invoiceData.companyAddress.split('\n')] },
+    { x: MARGIN + CONTENT_WIDTH * 0.55, title: 'To:', lines: [invoiceData.clientName, ...invoiceData.clientAddress.split('\n')] }
+  ];
+  const lineHeight = BODY_SIZE * 1.4;
+  const blockWidth = CONTENT_WIDTH * 0.45;
+  let bottom = top;
+
+  for (const block of blocks) {
+    page.text(block.title, block.x, top + BODY_SIZE, 'F2', BODY_SIZE, BLUE);
+    let y = top + BODY_SIZE + 7.5;
+    for (const line of block.lines) {
+      y += lineHeight;
+      page.text(fit(line.trim(), 'F1', BODY_SIZE, blockWidth), block.x, y, 'F1', BODY_SIZE, TEXT);
+    }
+    bottom = Math.max(bottom, y);
+  }
+
+  return bottom + 30;
+};
+
+const drawTotals = (page: PageCanvas, invoiceData: InvoiceData, top: number): number => {
+  const x = MARGIN + CONTENT_WIDTH - TOTALS_WIDTH;
+  const rows: Array<[string, number, boolean]> = [
+    ['Subtotal:', invoiceData.subtotal, false],
+    ['Tax (10%):', invoiceData.tax, false],
+    ['Total:', invoiceData.total, true]
+  ];
+
+  let y = top;
+  for (const [label, value, highlight] of rows) {
+    const font: Font = highlight ? 'F2' : 'F1';
+    const color = highlight ? WHITE : TEXT;
+    if (highlight) {
+      page.fillRect(x, y, TOTALS_WIDTH, TOTALS_ROW_HEIGHT, BLUE);
+    }
+    page.line(x, y + TOTALS_ROW_HEIGHT, x + TOTALS_WIDTH, y + TOTALS_ROW_HEIGHT, BORDER, 0.75);
+    const textTop = baseline(y, TOTALS_ROW_HEIGHT, BODY_SIZE);
+    page.text(label, x + CELL_PADDING, textTop, font, BODY_SIZE, color);
+    page.textRight(money(value), x + TOTALS_WIDTH - CELL_PADDING, textTop, font, BODY_SIZE, color);
+    y += TOTALS_ROW_HEIGHT;
+  }
+  return y;
+};
+
+const drawFooter = (page: PageCanvas, top: number): void => {
+  const center = MARGIN + CONTENT_WIDTH / 2;
+  page.textCenter('Thank you for your business!', center, top + 9, 'F1', 9, MUTED);
+  page.textCenter(`Generated on ${new Date().toLocaleString()}`, center, top + 27, 'F1', 9, MUTED);
+};
+
+// Serialize pages into a complete PDF file with a cross-reference table
+const buildDocument = (pages: PageCanvas[]): Buffer => {
+  const objects: Buffer[] = [];
+  const pageIds = pages.map((_, index) => 5 + index * 2);
+
+  objects[1] = Buffer.from('<< /Type /Catalog /Pages 2 0 R >>');
+  objects[2] = Buffer.from(
+    `<< /Type /Pages /Kids [${pageIds.map(id => `${id} 0 R`).join(' ')}] /Count ${pages.length} >>`
+  );
+  objects[3] = Buffer.from('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>');
+  objects[4] = Buffer.from('<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>');
+
+  pages.forEach((page, index) => {
+    const pageId = pageIds[index];
+    const content = zlib.deflateSync(Buffer.from(page.ops.join('\n'), 'latin1'));
+    objects[pageId] = Buffer.from(
+      `<< /Type /Page /Parent 2 0 R /MediaBox [0 0 ${PAGE_WIDTH} ${PAGE_HEIGHT}] ` +
+      `/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents ${pageId + 1} 0 R >>`
+    );
+    objects[pageId + 1] = Buffer.concat([
+      Buffer.from(`<< /Length ${content.length} /Filter /FlateDecode >>\nstream\n`),
+      content,
+      Buffer.from('\nendstream')
+    ]);
+  });
+
+  const chunks: Buffer[] = [Buffer.from('%PDF-1.4\n%\xe2\xe3\xcf\xd3\n', 'latin1')];
+  const offsets: number[] = [];
+  let length = chunks[0].length;
+
+  for (let id = 1; id < objects.length; id++) {
+    offsets[id] = length;
+    const chunk = Buffer.concat([Buffer.from(`${id} 0 obj\n`), objects[id], Buffer.from('\nendobj\n')]);
+    chunks.push(chunk);
+    length += chunk.length;
+  }
+
+  const xref = [`xref\n0 ${objects.length}\n`, '0000000000 65535 f \n'];
+  for (let id = 1; id < objects.length; id++) {
+    xref.push(`${String(offsets[id]).padStart(10, '0')} 00000 n \n`);
+  }
+  xref.push(`trailer\n<< /Size ${objects.length} /Root 1 0 R >>\nstartxref\n${length}\n%%EOF\n`);
+  chunks.push(Buffer.from(xref.join('')));
+
+  return Buffer.concat(chunks);
+};
+
+export const renderInvoicePdfNative = (invoiceData: InvoiceData): Buffer => {
+  const bottomLimit = PAGE_HEIGHT - MARGIN;
+  const pages: PageCanvas[] = [new PageCanvas()];
+  let page = pages[0];
+
+  const newPage = () => {
+    page = new PageCanvas();
+    pages.push(page);
+    return MARGIN;
+  };
+
+  let y = drawHeader(page, invoiceData);
+  y = drawAddresses(page, invoiceData, y);
+  y = drawTableHeader(page, y);
+
+  invoiceData.products.forEach((product, index) => {
+    // Break before a row that would cross the bottom margin; repeat the header row
+    if (y + ROW_HEIGHT > bottomLimit) {
+      y = drawTableHeader(page, newPage());
+    }
+
+    let x = MARGIN;
+    const cells = [
+      String(product.name ?? ''),
+      String(product.qty ?? ''),
+      money(product.rate),
+      money(product.total)
+    ];
+    cells.forEach((cell, column) => {
+      const width = columnWidths[column];
+      if (index % 2 === 1) {
+        page.fillRect(x, y, width, ROW_HEIGHT, STRIPE);
+      }
+      page.strokeRect(x, y, width, ROW_HEIGHT, BORDER);
+      const textTop = baseline(y, ROW_HEIGHT, BODY_SIZE);
+      const value = fit(cell, 'F1', BODY_SIZE, width - CELL_PADDING * 2);
+      if (column === 0) {
+        page.text(value, x + CELL_PADDING, textTop, 'F1', BODY_SIZE, TEXT);
+      } else {
+        page.textRight(value, x + width - CELL_PADDING, textTop, 'F1', BODY_SIZE, TEXT);
+      }
+      x += width;
+    });
+    y += ROW_HEIGHT;
+  });
+
+  // Keep totals and footer together
+  const closingHeight = 22.5 + TOTALS_ROW_HEIGHT * 3 + 37.5 + 30;
+  if (y + closingHeight > bottomLimit) {
+    y = newPage() - 22.5;
+  }
+  y = drawTotals(page, invoiceData, y + 22.5);
+  drawFooter(page, y + 37.5);
+
+  return buildDocument(pages);
+};
@@ -0,0 +1,211 @@
+import { Request, Response, NextFunction } from 'express';
+import { performance } from 'perf_hooks';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+
+export type OverloadState = 'ok' | 'overloaded' | 'critical';
+
+// low: shed as soon as the server is overloaded
+// normal: writes are shed once it is critical; reads are always served
+// critical: never shed (sign-in, health check, metrics)
+export type RequestPriority = 'low' | 'normal' | 'critical';
+
+export interface OverloadOptions {
+  // Smoothed event-loop lag that starts shedding low-priority requests
+  lagMs: number;
+  // Lag at which normal-priority writes are shed too
+  criticalLagMs: number;
+  // Concurrent requests that count as overloaded regardless of lag (0: no limit)
+  maxInFlight: number;
+  // How long shedding continues after the last threshold breach
+  holdMs: number;
+  sampleIntervalMs: number;
+  // "METHOD /path-prefix" or "/path-prefix" entries
+  lowPriorityRoutes: string[];
+  criticalRoutes: string[];
+}
+
+const routeList = (value: string): string[] =>
+  value.split(',').map(entry => entry.trim().replace(/\s+/, ' ')).filter(Boolean);
+
+const optionsFromEnv = (): OverloadOptions => ({
+  lagMs: parseInt(process.env.OVERLOAD_LAG_MS || '200', 10),
+  criticalLagMs: parseInt(process.env.OVERLOAD_CRITICAL_LAG_MS || '1000', 10),
+  maxInFlight: parseInt(process.env.OVERLOAD_MAX_IN_FLIGHT || '1000', 10),
+  holdMs: parseInt(process.env.OVERLOAD_HOLD_MS || '2000', 10),
+  sampleIntervalMs: Math.max(10, parseInt(process.env.OVERLOAD_SAMPLE_MS || '50', 10) || 50),
+  lowPriorityRoutes: routeList(process.env.OVERLOAD_LOW_PRIORITY_ROUTES ||
+    'POST /api/pdf/generate,POST /api/pdf/batch,POST /api/pdf/jobs,POST /api/products/bulk,DELETE /api/products/bulk'),
+  criticalRoutes: routeList(process.env.OVERLOAD_CRITICAL_ROUTES || '/api/auth,/metrics,/api/admin')
+});
+
+const matchesRoute = (routes: string[], method: string, path: string): boolean =>
+  routes.some(route => {
+    const spaced = route.indexOf(' ');
+    if (spaced === -1) {
+      return path.startsWith(route);
+    }
+    return route.slice(0, spaced) === method && path.startsWith(route.slice(spaced + 1));
+  });
+
+const levels: Record<OverloadState, number> = { ok: 0, overloaded: 1, critical: 2 };
+
+const isRead = (method: string): boolean => method === 'GET' || method === 'HEAD' || method === 'OPTIONS';
+
+// Sheds load before it reaches the handlers. A timer measures how late it
+// fires (event-loop lag) and keeps a smoothed value that reacts to a single
+// long block right away but decays over a few samples. When lag or the
+// number of in-flight requests crosses a threshold, low-priority requests
+// (PDF renders, bulk imports) get an immediate 503 with Retry-After. When lag
+// becomes critical, normal writes get one too. Reads and sign-in are still
+// served, so the work already admitted can drain.
+export class OverloadController {
+  private options: OverloadOptions | null = null;
+  private timer: NodeJS.Timeout | null = null;
+  private lastTick = 0;
+  private smoothedLagMs = 0;
+  private maxLagMs = 0;
+  private inFlight = 0;
+  private currentState: OverloadState = 'ok';
+  private holdUntil = 0;
+  private counters = { shedLow: 0, shedNormal: 0, overloadEpisodes: 0 };
+
+  constructor(private overrides: Partial<OverloadOptions> = {}) {}
+
+  start(): void {
+    if (this.timer) {
+      return;
+    }
+    const { sampleIntervalMs } = this.configure();
+    this.lastTick = performance.now();
+    this.timer = setInterval(() => this.sample(), sampleIntervalMs);
+    this.timer.unref();
+  }
+
+  stop(): void {
+    if (this.timer) {
+      clearInterval(this.timer);
+      this.timer = null;
+    }
+  }
+
+  get state(): OverloadState {
+    return this.currentState;
+  }
+
+  priority(method: string, path: string): RequestPriority {
+    const { lowPriorityRoutes, criticalRoutes } = this.configure();
+    // '/' is the hosting platform's health check
+    if (path === '/' || matchesRoute(criticalRoutes, method, path)) {
+      return 'critical';
+    }
+    return matchesRoute(lowPriorityRoutes, method, path) ? 'low' : 'normal';
+  }
+
+  // Mount before body parsing so shed requests cost as little as possible
+  middleware = (req: Request, res: Response, next: NextFunction) => {
+    const path = req.path;
+    if (this.currentState !== 'ok') {
+      const priority = this.priority(req.method, path);
+      const shed = priority === 'low' ||
+        (priority === 'normal' && this.currentState === 'critical' && !isRead(req.method));
+      if (shed) {
+        if (priority === 'low') {
+          this.counters.shedLow++;
+        } else {
+          this.counters.shedNormal++;
+        }
+        res.setHeader('Retry-After', String(this.retryAfterSeconds()));
+        return res.status(503).json({ message: 'Server is busy, please retry later' });
+      }
+    }
+
+    this.inFlight++;
+    let done = false;
+    const finish = () => {
+      if (!done) {
+        done = true;
+        this.inFlight--;
+      }
+    };
+    res.once('finish', finish);
+    res.once('close', finish);
+    next();
+  };
+
+  stats() {
+    const { lagMs, criticalLagMs, maxInFlight } = this.configure();
+    return {
+      state: this.currentState,
+      lagMs: Math.round(this.smoothedLagMs),
+      maxLagMs: Math.round(this.maxLagMs),
+      inFlight: this.inFlight,
+      thresholds: { lagMs, criticalLagMs, maxInFlight },
+      ...this.counters
+    };
+  }
+
+  private sample(): void {
+    const { sampleIntervalMs, lagMs, criticalLagMs, maxInFlight, holdMs } = this.configure();
+    const now = performance.now();
+    const lag = Math.max(0, now - this.lastTick - sampleIntervalMs);
+    this.lastTick = now;
+    // Rise at once to a spike, fall back gradually
+    this.smoothedLagMs = Math.max(lag, this.smoothedLagMs * 0.7 + lag * 0.3);
+    this.maxLagMs = Math.max(this.maxLagMs, lag);
+
+    let breached: OverloadState = 'ok';
+    if (criticalLagMs > 0 && this.smoothedLagMs >= criticalLagMs) {
+      breached = 'critical';
+    } else if ((lagMs > 0 && this.smoothedLagMs >= lagMs) || (maxInFlight > 0 && this.inFlight >= maxInFlight)) {
+      breached = 'overloaded';
+    }
+
+    // Escalate at once; step down only once the level has not been breached for holdMs
+    if (breached !== 'ok' && levels[breached] >= levels[this.currentState]) {
+      this.holdUntil = Date.now() + holdMs;
+    }
+    const holding = levels[breached] < levels[this.currentState] && Date.now() < this.holdUntil;
+    this.transition(holding ? this.currentState : breached);
+  }
+
+  private transition(next: OverloadState): void {
+    if (next === this.currentState) {
+      return;
+    }
+    if (this.currentState === 'ok') {
+      this.counters.overloadEpisodes++;
+    }
+    logger.warn(next === 'ok' ? 'Overload cleared' : 'Overloaded, shedding requests', {
+      state: next,
+      lagMs: Math.round(this.smoothedLagMs),
+      inFlight: this.inFlight
+    });
+    this.currentState = next;
+  }
+
+  // Long enough for the hold to expire and the current lag to clear
+  private retryAfterSeconds(): number {
+    return Math.max(1, Math.ceil((this.configure().holdMs + this.smoothedLagMs) / 1000));
+  }
+
+  private configure(): OverloadOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const overloadController = new OverloadController();
+
+metrics.gauge('overload_state', 'Load shedding level (0 ok, 1 overloaded, 2 critical)', () =>
+  levels[overloadController.state]);
+metrics.gauge('overload_lag_seconds', 'Smoothed event-loop lag used for load shedding', () =>
+  overloadController.stats().lagMs / 1000);
+metrics.counterFrom('overload_shed_requests_total', 'Requests rejected by load shedding, by priority', () => {
+  const { shedLow, shedNormal } = overloadController.stats();
+  return [{ labels: { priority: 'low' }, value: shedLow }, { labels: { priority: 'normal' }, value: shedNormal }];
+});
+
+export default overloadController;
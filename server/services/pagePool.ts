@@ -0,0 +1,240 @@
+import { Readable } from 'stream';
+import { ReadableStream as WebReadableStream } from 'stream/web';
+import { Browser, Page, PDFOptions } from 'puppeteer';
+import browserPool, { BrowserPool } from './browserPool.js';
+import { RenderTimings } from './renderMetrics.js';
+import { getTemplate } from '../templates/registry.js';
+import metrics from '../utils/metrics.js';
+import tracer from '../utils/tracing.js';
+
+// A4 at 96 DPI
+const viewport = { width: 794, height: 1123 };
+
+export const pdfOptions: PDFOptions = {
+  format: 'A4',
+  printBackground: true,
+  margin: {
+    top: '20px',
+    right: '20px',
+    bottom: '20px',
+    left: '20px'
+  }
+};
+
+interface PooledPage {
+  page: Page;
+  browser: Browser;
+  renders: number;
+  // JS heap as of the page's last release
+  heapBytes: number;
+}
+
+export interface PagePoolOptions {
+  pagesPerBrowser: number;
+  maxRendersPerPage: number;
+  maxHeapBytes: number;
+}
+
+const optionsFromEnv = (): PagePoolOptions => ({
+  pagesPerBrowser: Math.max(1, parseInt(process.env.PDF_PAGES_PER_BROWSER || '2', 10) || 1),
+  maxRendersPerPage: parseInt(process.env.PDF_PAGE_MAX_RENDERS || '200', 10),
+  maxHeapBytes: parseInt(process.env.PDF_PAGE_MAX_HEAP_MB || '64', 10) * 1024 * 1024
+});
+
+// Pool of warm tabs with the viewport, print media emulation and base
+// stylesheet already applied. Renders lease a page, swap in the invoice body,
+// print, and hand the page back; pages are recycled after a number of renders
+// or once their JS heap grows past the configured threshold.
+export class PagePool {
+  private idle: PooledPage[] = [];
+  private leased = new Map<Page, PooledPage>();
+  private options: PagePoolOptions | null = null;
+  private closing = false;
+  private created = 0;
+  private recycled = 0;
+
+  constructor(
+    private browsers: BrowserPool,
+    private baseDocument: () => string,
+    private overrides: Partial<PagePoolOptions> = {}
+  ) {}
+
+  // Pre-create the configured number of pages on every pooled browser
+  async warm(): Promise<void> {
+    this.closing = false;
+    const { pagesPerBrowser } = this.configure();
+    const target = pagesPerBrowser * this.browsers.size;
+    const pages = await Promise.all(
+      Array.from({ length: Math.max(0, target - this.idle.length) }, () => this.createPage())
+    );
+    this.idle.push(...pages);
+  }
+
+  async acquire(): Promise<Page> {
+    if (this.closing) {
+      throw new Error('Page pool is shutting down');
+    }
+
+    let pooled = this.idle.pop();
+    while (pooled && !this.isUsable(pooled)) {
+      await this.destroy(pooled);
+      pooled = this.idle.pop();
+    }
+    if (!pooled) {
+      pooled = await tracer.span('pageCreate', () => this.createPage());
+    }
+
+    this.leased.set(pooled.page, pooled);
+    return pooled.page;
+  }
+
+  // Reset the page and return it to the pool, or recycle it if it is worn out
+  async release(page: Page): Promise<void> {
+    const pooled = this.leased.get(page);
+    if (!pooled) {
+      return;
+    }
+    this.leased.delete(page);
+    pooled.renders++;
+
+    const options = this.configure();
+    let recycle = this.closing || !this.isUsable(pooled) ||
+      pooled.renders >= options.maxRendersPerPage ||
+      this.idle.length >= options.pagesPerBrowser * this.browsers.size;
+
+    if (!recycle) {
+      try {
+        const pageMetrics = await page.metrics();
+        pooled.heapBytes = pageMetrics.JSHeapUsedSize || 0;
+        recycle = pooled.heapBytes > options.maxHeapBytes;
+        if (!recycle) {
+          await page.evaluate(() => {
+            document.body.innerHTML = '';
+          });
+        }
+      } catch {
+        recycle = true;
+      }
+    }
+
+    if (recycle) {
+      this.recycled++;
+      await this.destroy(pooled);
+    } else {
+      this.idle.push(pooled);
+    }
+  }
+
+  // Render an invoice body into a PDF on a leased page; phase times go into timings
+  async render(bodyHtml: string, timings: RenderTimings = {}): Promise<Buffer> {
+    const page = await this.acquire();
+    try {
+      let started = Date.now();
+      await page.evaluate((html: string) => {
+        document.body.innerHTML = html;
+      }, bodyHtml);
+      timings.setContent = Date.now() - started;
+      started = Date.now();
+      const pdf = await page.pdf(pdfOptions);
+      timings.print = Date.now() - started;
+      return Buffer.from(pdf.buffer, pdf.byteOffset, pdf.byteLength);
+    } finally {
+      await this.release(page);
+    }
+  }
+
+  // Render an invoice body as a PDF stream. The page stays leased until the
+  // stream is fully consumed or destroyed; print covers the time to the
+  // first bytes, the rest overlaps with the caller's write.
+  async renderStream(bodyHtml: string, timings: RenderTimings = {}): Promise<Readable> {
+    const page = await this.acquire();
+    try {
+      let started = Date.now();
+      await page.evaluate((html: string) => {
+        document.body.innerHTML = html;
+      }, bodyHtml);
+      timings.setContent = Date.now() - started;
+      started = Date.now();
+      const webStream = await page.createPDFStream(pdfOptions);
+      timings.print = Date.now() - started;
+      const stream = Readable.fromWeb(webStream as unknown as WebReadableStream<Uint8Array>);
+      stream.once('close', () => {
+        this.release(page).catch(() => {});
+      });
+      return stream;
+    } catch (error) {
+      await this.release(page);
+      throw error;
+    }
+  }
+
+  async shutdown(): Promise<void> {
+    this.closing = true;
+    const pages = this.idle.splice(0);
+    await Promise.all(pages.map(pooled => this.destroy(pooled)));
+  }
+
+  stats() {
+    const pages = [...this.idle, ...this.leased.values()];
+    return {
+      idle: this.idle.length,
+      leased: this.leased.size,
+      capacity: this.configure().pagesPerBrowser * this.browsers.size,
+      created: this.created,
+      recycled: this.recycled,
+      heapBytes: pages.reduce((total, pooled) => total + pooled.heapBytes, 0)
+    };
+  }
+
+  private configure(): PagePoolOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+
+  private isUsable(pooled: PooledPage): boolean {
+    return pooled.browser.connected && !pooled.page.isClosed();
+  }
+
+  // Each page holds a lease on its browser for as long as it exists
+  private async createPage(): Promise<PooledPage> {
+    const browser = await this.browsers.acquire();
+    try {
+      const page = await browser.newPage();
+      await page.setViewport(viewport);
+      await page.emulateMediaType('print');
+      await page.setContent(this.baseDocument());
+      this.created++;
+      return { page, browser, renders: 0, heapBytes: 0 };
+    } catch (error) {
+      this.browsers.release(browser);
+      throw error;
+    }
+  }
+
+  private async destroy(pooled: PooledPage): Promise<void> {
+    try {
+      if (!pooled.page.isClosed()) {
+        await pooled.page.close();
+      }
+    } catch {
+      // Page died with its browser
+    } finally {
+      this.browsers.release(pooled.browser);
+    }
+  }
+}
+
+const pagePool = new PagePool(browserPool, () => getTemplate('invoice').baseDocument);
+
+metrics.gauge('pdf_page_pool_pages', 'Warm pages by state', () => {
+  const { idle, leased } = pagePool.stats();
+  return [{ labels: { state: 'idle' }, value: idle }, { labels: { state: 'leased' }, value: leased }];
+});
+metrics.gauge('pdf_page_pool_capacity', 'Pages kept warm when idle', () => pagePool.stats().capacity);
+metrics.counterFrom('pdf_pages_created_total', 'Pages opened by the page pool', () => pagePool.stats().created);
+metrics.counterFrom('pdf_pages_recycled_total', 'Pages closed after wearing out', () => pagePool.stats().recycled);
+metrics.gauge('pdf_page_js_heap_bytes', 'Chromium JS heap of pooled pages, as of their last release', () => pagePool.stats().heapBytes);
+
+export default pagePool;
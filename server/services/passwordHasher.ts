@@ -0,0 +1,311 @@
+import bcrypt from 'bcrypt';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import { Worker } from 'worker_threads';
+import { QueueFullError, QueueTimeoutError } from './renderScheduler.js';
+import { workerShare } from '../utils/cluster.js';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+import tracer from '../utils/tracing.js';
+
+// Messages exchanged with workers/passwordWorker
+export type PasswordTask =
+  | { id: number; op: 'hash'; password: string; cost: number }
+  | { id: number; op: 'compare'; password: string; hash: string };
+
+export type PasswordTaskResult = {
+  id: number;
+  result?: string | boolean;
+  error?: string;
+  runMs: number;
+};
+
+type TaskInput =
+  | { op: 'hash'; password: string; cost: number }
+  | { op: 'compare'; password: string; hash: string };
+
+interface Pending {
+  task: PasswordTask;
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+  enqueuedAt: number;
+  timer: NodeJS.Timeout | null;
+}
+
+interface ThreadHandle {
+  worker: Worker;
+  current: Pending | null;
+}
+
+export interface PasswordHasherOptions {
+  threads: number;
+  maxQueue: number;
+  queueTimeoutMs: number;
+  // Fixed bcrypt cost; when null the cost is calibrated to targetMs at start
+  cost: number | null;
+  targetMs: number;
+  minCost: number;
+  maxCost: number;
+}
+
+// The default thread count is a machine-wide 2, split between cluster workers
+const optionsFromEnv = (): PasswordHasherOptions => ({
+  threads: Math.max(1, parseInt(process.env.PASSWORD_HASH_THREADS || String(workerShare(2)), 10) || 1),
+  maxQueue: parseInt(process.env.PASSWORD_HASH_QUEUE_SIZE || '200', 10),
+  queueTimeoutMs: parseInt(process.env.PASSWORD_HASH_QUEUE_TIMEOUT_MS || '10000', 10),
+  cost: parseInt(process.env.PASSWORD_HASH_COST || '', 10) || null,
+  targetMs: parseInt(process.env.PASSWORD_HASH_TARGET_MS || '250', 10),
+  minCost: parseInt(process.env.PASSWORD_HASH_MIN_COST || '10', 10),
+  maxCost: parseInt(process.env.PASSWORD_HASH_MAX_COST || '15', 10)
+});
+
+// Worker entry point next to this module, .ts under ts-node and .js when built
+const currentFile = fileURLToPath(import.meta.url);
+const workerScript = path.join(
+  path.dirname(currentFile),
+  '..',
+  'workers',
+  `passwordWorker${path.extname(currentFile)}`
+);
+
+// Cost factor of a stored hash, or 0 if it is not a bcrypt hash
+export const hashCost = (hash: string): number => {
+  try {
+    return bcrypt.getRounds(hash);
+  } catch {
+    return 0;
+  }
+};
+
+// bcrypt on a dedicated set of worker threads with a bounded FIFO queue, so a
+// burst of logins queues here instead of occupying libuv's threadpool. The
+// cost factor is calibrated at start so one hash takes about targetMs; each
+// cost step doubles the work.
+export class PasswordHasher {
+  private threads: ThreadHandle[] = [];
+  private queue: Pending[] = [];
+  private options: PasswordHasherOptions | null = null;
+  private nextId = 1;
+  private closing = false;
+  private currentCost = 0;
+  private calibration: { cost: number; measuredMs: number } | null = null;
+  private counters = { completed: 0, failed: 0, rejected: 0, timedOut: 0, rehashed: 0 };
+  private totalWaitMs = 0;
+  private maxWaitMs = 0;
+  private totalRunMs = 0;
+
+  constructor(private overrides: Partial<PasswordHasherOptions> = {}) {}
+
+  get cost(): number {
+    return this.currentCost || this.configure().cost || this.configure().minCost;
+  }
+
+  // Start the threads and settle the cost factor
+  async start(): Promise<void> {
+    this.closing = false;
+    this.ensureThreads();
+
+    const { cost, minCost, maxCost, targetMs } = this.configure();
+    if (cost) {
+      this.currentCost = cost;
+      return;
+    }
+
+    // Median of a few hashes at the minimum cost, scaled up in powers of two
+    const samples: number[] = [];
+    for (let i = 0; i < 3; i++) {
+      const started = Date.now();
+      await this.run({ op: 'hash', password: 'calibration', cost: minCost });
+      samples.push(Math.max(1, Date.now() - started));
+    }
+    const measuredMs = samples.sort((a, b) => a - b)[1];
+    const steps = Math.round(Math.log2(targetMs / measuredMs));
+    this.currentCost = Math.min(maxCost, Math.max(minCost, minCost + steps));
+    this.calibration = { cost: minCost, measuredMs };
+    logger.info(`Password hashing cost ${this.currentCost} (${measuredMs}ms at cost ${minCost}, target ${targetMs}ms)`);
+  }
+
+  hash(password: string): Promise<string> {
+    return tracer.span('bcrypt', () => this.run({ op: 'hash', password, cost: this.cost }));
+  }
+
+  // needsRehash: the stored hash is weaker than the current cost factor
+  async verify(password: string, hash: string): Promise<{ valid: boolean; needsRehash: boolean }> {
+    const valid: boolean = await tracer.span('bcrypt', () => this.run({ op: 'compare', password, hash }));
+    return { valid, needsRehash: valid && hashCost(hash) < this.cost };
+  }
+
+  recordRehash(): void {
+    this.counters.rehashed++;
+  }
+
+  async shutdown(): Promise<void> {
+    this.closing = true;
+    for (const pending of this.queue.splice(0)) {
+      this.settle(pending, new Error('Password hasher is shutting down'));
+    }
+    await Promise.all(this.threads.map(thread => thread.worker.terminate()));
+    this.threads = [];
+  }
+
+  stats() {
+    const { threads, maxQueue, targetMs } = this.configure();
+    const started = this.counters.completed + this.counters.failed;
+    return {
+      threads,
+      busy: this.threads.filter(thread => thread.current).length,
+      queued: this.queue.length,
+      maxQueue,
+      cost: this.cost,
+      targetMs,
+      calibration: this.calibration,
+      ...this.counters,
+      avgWaitMs: started ? Math.round(this.totalWaitMs / started) : 0,
+      maxWaitMs: this.maxWaitMs,
+      avgRunMs: started ? Math.round(this.totalRunMs / started) : 0
+    };
+  }
+
+  private run(input: TaskInput): Promise<any> {
+    const { maxQueue, queueTimeoutMs } = this.configure();
+    if (this.closing) {
+      return Promise.reject(new Error('Password hasher is shutting down'));
+    }
+    if (this.queue.length >= maxQueue) {
+      this.counters.rejected++;
+      return Promise.reject(new QueueFullError(this.estimateRetryAfter(), 'Password hashing queue is full'));
+    }
+    this.ensureThreads();
+
+    return new Promise((resolve, reject) => {
+      const pending: Pending = {
+        task: { id: this.nextId++, ...input },
+        resolve,
+        reject,
+        enqueuedAt: Date.now(),
+        timer: null
+      };
+      if (queueTimeoutMs > 0) {
+        pending.timer = setTimeout(() => {
+          const index = this.queue.indexOf(pending);
+          if (index !== -1) {
+            this.queue.splice(index, 1);
+            this.counters.timedOut++;
+            this.settle(pending, new QueueTimeoutError('Password hashing timed out in queue'));
+          }
+        }, queueTimeoutMs);
+      }
+      this.queue.push(pending);
+      this.pump();
+    });
+  }
+
+  private pump(): void {
+    for (const thread of this.threads) {
+      if (this.queue.length === 0) {
+        return;
+      }
+      if (thread.current) {
+        continue;
+      }
+      const pending = this.queue.shift() as Pending;
+      if (pending.timer) {
+        clearTimeout(pending.timer);
+        pending.timer = null;
+      }
+      const waitMs = Date.now() - pending.enqueuedAt;
+      this.totalWaitMs += waitMs;
+      this.maxWaitMs = Math.max(this.maxWaitMs, waitMs);
+      thread.current = pending;
+      thread.worker.postMessage(pending.task);
+    }
+  }
+
+  private ensureThreads(): void {
+    const { threads } = this.configure();
+    while (!this.closing && this.threads.length < threads) {
+      this.spawn();
+    }
+  }
+
+  private spawn(): void {
+    const thread: ThreadHandle = { worker: new Worker(workerScript), current: null };
+    this.threads.push(thread);
+
+    thread.worker.on('message', (message: PasswordTaskResult) => {
+      const pending = thread.current;
+      if (!pending || pending.task.id !== message.id) {
+        return;
+      }
+      thread.current = null;
+      this.totalRunMs += message.runMs;
+      if (message.error !== undefined) {
+        this.counters.failed++;
+        this.settle(pending, new Error(message.error));
+      } else {
+        this.counters.completed++;
+        pending.resolve(message.result);
+      }
+      this.pump();
+    });
+
+    // A crashed thread fails its task and is replaced
+    thread.worker.on('error', error => {
+      logger.error('Password worker error', error);
+    });
+    thread.worker.on('exit', () => {
+      this.threads = this.threads.filter(other => other !== thread);
+      if (thread.current) {
+        this.counters.failed++;
+        this.settle(thread.current, new Error('Password worker exited'));
+        thread.current = null;
+      }
+      if (!this.closing) {
+        this.ensureThreads();
+        this.pump();
+      }
+    });
+  }
+
+  private settle(pending: Pending, error: Error): void {
+    if (pending.timer) {
+      clearTimeout(pending.timer);
+    }
+    pending.reject(error);
+  }
+
+  // Seconds until the current backlog clears at the observed hash time
+  private estimateRetryAfter(): number {
+    const started = this.counters.completed + this.counters.failed;
+    const avgRunMs = started ? this.totalRunMs / started : this.configure().targetMs;
+    const backlogMs = (this.queue.length * avgRunMs) / Math.max(1, this.threads.length);
+    return Math.max(1, Math.ceil(backlogMs / 1000));
+  }
+
+  private configure(): PasswordHasherOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const passwordHasher = new PasswordHasher();
+
+metrics.gauge('password_hash_queue_depth', 'bcrypt tasks waiting for a thread', () => passwordHasher.stats().queued);
+metrics.gauge('password_hash_threads', 'bcrypt threads by state', () => {
+  const { threads, busy } = passwordHasher.stats();
+  return [{ labels: { state: 'busy' }, value: busy }, { labels: { state: 'idle' }, value: threads - busy }];
+});
+metrics.gauge('password_hash_cost', 'Current bcrypt cost factor', () => passwordHasher.stats().cost);
+metrics.counterFrom('password_hash_tasks_total', 'bcrypt tasks by outcome', () => {
+  const { completed, failed, rejected, timedOut } = passwordHasher.stats();
+  return [
+    { labels: { outcome: 'completed' }, value: completed },
+    { labels: { outcome: 'failed' }, value: failed },
+    { labels: { outcome: 'rejected' }, value: rejected },
+    { labels: { outcome: 'timed_out' }, value: timedOut }
+  ];
+});
+
+export default passwordHasher;
@@ -0,0 +1,130 @@
+import crypto from 'crypto';
+import { InvoiceData } from '../templates/invoice.js';
+import type { InvoiceStore } from './storage/invoiceStore.js';
+
+export interface CachedPdf {
+  invoiceNumber: string;
+  filename: string;
+  buffer: Buffer;
+}
+
+export interface PdfCacheOptions {
+  maxMemoryBytes: number;
+}
+
+// Length of the hash prefix used as cache key and embedded in file names
+const KEY_LENGTH = 16;
+
+const optionsFromEnv = (): PdfCacheOptions => ({
+  maxMemoryBytes: parseInt(process.env.PDF_CACHE_MEMORY_MB || '32', 10) * 1024 * 1024
+});
+
+const money = (value: unknown): number => Math.round((Number(value) || 0) * 100) / 100;
+
+// Everything that affects the rendered document, in a fixed key order.
+// The invoice number is deliberately excluded: repeated renders of the same
+// payload reuse the first rendered invoice.
+export const canonicalizeInvoice = (
+  userId: string,
+  invoiceData: Omit<InvoiceData, 'invoiceNumber'>,
+  templateVersion: string
+): string => JSON.stringify([
+  templateVersion,
+  String(userId),
+  invoiceData.date,
+  [invoiceData.companyName.trim(), invoiceData.companyAddress.trim()],
+  [invoiceData.clientName.trim(), invoiceData.clientAddress.trim()],
+  invoiceData.products.map(product => [
+    String(product.name).trim(),
+    Number(product.qty) || 0,
+    money(product.rate),
+    money(product.total)
+  ]),
+  [money(invoiceData.subtotal), money(invoiceData.tax), money(invoiceData.total)]
+]);
+
+export const hashInvoice = (canonical: string): string =>
+  crypto.createHash('sha256').update(canonical).digest('hex').slice(0, KEY_LENGTH);
+
+// Content-addressed cache of rendered invoices: a byte-bounded in-memory LRU
+// in front of the invoice store, which keeps the rendered files and their
+// index. Maps preserve insertion order, so re-inserting on access keeps LRU order.
+export class PdfCache {
+  private memory = new Map<string, CachedPdf>();
+  private memoryBytes = 0;
+  private options: PdfCacheOptions | null = null;
+  private counters = { memoryHits: 0, storageHits: 0, misses: 0 };
+
+  constructor(private store: () => InvoiceStore, private overrides: Partial<PdfCacheOptions> = {}) {}
+
+  async get(key: string): Promise<CachedPdf | null> {
+    const inMemory = this.memory.get(key);
+    if (inMemory) {
+      this.memory.delete(key);
+      this.memory.set(key, inMemory);
+      this.counters.memoryHits++;
+      return inMemory;
+    }
+
+    const store = this.store();
+    const entry = await store.findByContentKey(key);
+    if (entry) {
+      // null when the file was evicted or removed out from under the index
+      const buffer = await store.read(entry);
+      if (buffer) {
+        const cached = { invoiceNumber: entry.invoiceNumber, filename: entry.filename, buffer };
+        this.set(key, cached);
+        this.counters.storageHits++;
+        return cached;
+      }
+    }
+
+    this.counters.misses++;
+    return null;
+  }
+
+  // Remember a freshly rendered invoice (already saved to the invoice store)
+  set(key: string, entry: CachedPdf): void {
+    const { maxMemoryBytes } = this.configure();
+    if (entry.buffer.length > maxMemoryBytes) {
+      return;
+    }
+
+    const existing = this.memory.get(key);
+    if (existing) {
+      this.memoryBytes -= existing.buffer.length;
+      this.memory.delete(key);
+    }
+    this.memory.set(key, entry);
+    this.memoryBytes += entry.buffer.length;
+
+    for (const [oldestKey, oldest] of this.memory) {
+      if (this.memoryBytes <= maxMemoryBytes) {
+        break;
+      }
+      this.memory.delete(oldestKey);
+      this.memoryBytes -= oldest.buffer.length;
+    }
+  }
+
+  stats() {
+    const { memoryHits, storageHits, misses } = this.counters;
+    const lookups = memoryHits + storageHits + misses;
+    return {
+      memoryHits,
+      storageHits,
+      misses,
+      hitRatio: lookups ? (memoryHits + storageHits) / lookups : 0,
+      memoryEntries: this.memory.size,
+      memoryBytes: this.memoryBytes,
+      storage: this.store().stats()
+    };
+  }
+
+  private configure(): PdfCacheOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
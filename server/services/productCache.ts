@@ -0,0 +1,172 @@
+import crypto from 'crypto';
+import { broadcast, onClusterMessage } from '../utils/cluster.js';
+
+export interface ProductCacheOptions {
+  maxEntries: number;
+  ttlMs: number;
+}
+
+export interface ProductListLookup {
+  version: number;
+  // 'not-modified' when the client's If-None-Match already names the cached
+  // page; a miss has no tag until the page is built and stored
+  status: 'not-modified' | 'hit' | 'miss';
+  etag?: string;
+  body?: string;
+}
+
+interface CachedList {
+  userId: string;
+  version: number;
+  body: string;
+  etag: string;
+  storedAt: number;
+}
+
+const optionsFromEnv = (): ProductCacheOptions => ({
+  maxEntries: parseInt(process.env.PRODUCT_CACHE_MAX_ENTRIES || '2000', 10),
+  ttlMs: parseInt(process.env.PRODUCT_CACHE_TTL_MS || '60000', 10)
+});
+
+// If-None-Match may list several tags or '*'; weak comparison applies to it
+export const matchesTag = (header: string | undefined, etag: string): boolean => {
+  if (!header) {
+    return false;
+  }
+  return header.split(',').some(tag => {
+    const value = tag.trim();
+    return value === '*' || value.replace(/^W\//, '') === etag;
+  });
+};
+
+// The tag is a hash of the page itself, so every cluster worker, and the
+// same worker after a restart, gives an unchanged page the same tag
+export const bodyTag = (body: string): string =>
+  `"${crypto.createHash('sha1').update(body).digest('base64url').slice(0, 22)}"`;
+
+// Per-user product listing cache. Pages are kept as serialized JSON with the
+// tag of their body in a bounded LRU (Map insertion order), for at most ttlMs,
+// which bounds how long a write made outside this process can go unnoticed.
+// Writes bump the user's version in this process, which orphans the cached
+// pages of older versions and keeps pages read before a concurrent write from
+// being stored.
+export class ProductCache {
+  private entries = new Map<string, CachedList>();
+  private versions = new Map<string, number>();
+  private clock = 0;
+  private options: ProductCacheOptions | null = null;
+  private counters = { hits: 0, notModified: 0, misses: 0, invalidations: 0, evictions: 0 };
+
+  constructor(private overrides: Partial<ProductCacheOptions> = {}) {}
+
+  // queryKey identifies the page (sort, order, limit, prefix, cursor)
+  lookup(userId: string, queryKey: string, ifNoneMatch?: string): ProductListLookup {
+    const version = this.version(userId);
+    const key = `${userId}\n${queryKey}`;
+    const cached = this.entries.get(key);
+    if (!cached || cached.version !== version || Date.now() - cached.storedAt >= this.configure().ttlMs) {
+      if (cached) {
+        this.entries.delete(key);
+      }
+      this.counters.misses++;
+      return { version, status: 'miss' };
+    }
+
+    this.entries.delete(key);
+    this.entries.set(key, cached);
+    if (matchesTag(ifNoneMatch, cached.etag)) {
+      this.counters.notModified++;
+      return { version, etag: cached.etag, status: 'not-modified' };
+    }
+    this.counters.hits++;
+    return { version, etag: cached.etag, status: 'hit', body: cached.body };
+  }
+
+  // Store a page read at `version` and return its tag; pages read before a
+  // concurrent write are dropped instead of being served under the new version
+  set(userId: string, queryKey: string, version: number, body: string): string {
+    const etag = bodyTag(body);
+    if (this.versions.get(userId) !== version) {
+      return etag;
+    }
+
+    const key = `${userId}\n${queryKey}`;
+    this.entries.delete(key);
+    this.entries.set(key, { userId, version, body, etag, storedAt: Date.now() });
+
+    const { maxEntries } = this.configure();
+    for (const oldestKey of this.entries.keys()) {
+      if (this.entries.size <= maxEntries) {
+        break;
+      }
+      this.entries.delete(oldestKey);
+      this.counters.evictions++;
+    }
+    return etag;
+  }
+
+  // Call after every write to the user's products; other cluster workers
+  // drop their copies too
+  invalidate(userId: string): void {
+    this.invalidateLocal(userId);
+    broadcast('product-cache:invalidate', userId);
+  }
+
+  invalidateLocal(userId: string): void {
+    this.counters.invalidations++;
+    this.assign(userId);
+    for (const [key, entry] of this.entries) {
+      if (entry.userId === userId) {
+        this.entries.delete(key);
+      }
+    }
+  }
+
+  stats() {
+    const { hits, notModified, misses, invalidations, evictions } = this.counters;
+    const lookups = hits + notModified + misses;
+    return {
+      hits,
+      notModified,
+      misses,
+      hitRatio: lookups ? (hits + notModified) / lookups : 0,
+      invalidations,
+      evictions,
+      entries: this.entries.size,
+      users: this.versions.size
+    };
+  }
+
+  private version(userId: string): number {
+    return this.versions.get(userId) ?? this.assign(userId);
+  }
+
+  private assign(userId: string): number {
+    const version = ++this.clock;
+    this.versions.delete(userId);
+    this.versions.set(userId, version);
+
+    // Forgetting a user is safe: their next version comes from the clock
+    const { maxEntries } = this.configure();
+    for (const oldestUser of this.versions.keys()) {
+      if (this.versions.size <= maxEntries) {
+        break;
+      }
+      this.versions.delete(oldestUser);
+    }
+    return version;
+  }
+
+  private configure(): ProductCacheOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const productCache = new ProductCache();
+
+onClusterMessage('product-cache:invalidate', (userId: string) => productCache.invalidateLocal(userId));
+
+export default productCache;
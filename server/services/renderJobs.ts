@@ -0,0 +1,461 @@
+import { ChildProcess, fork } from 'child_process';
+import path from 'path';
+import { fileURLToPath } from 'url';
+import type { InvoiceStatus } from '../models/invoiceModel.js';
+import repositories, { InvoiceEntity } from '../repositories/index.js';
+import browserPool from './browserPool.js';
+import {
+  buildInvoiceFields,
+  invoiceCacheKey,
+  newInvoiceNumber,
+  pdfCache,
+  recordRenderedInvoice,
+  resolveEngine,
+  saveRenderedInvoice
+} from './invoiceRenderer.js';
+import { RenderTimings, observeRenderTimings, recordRenderPhase } from './renderMetrics.js';
+import { getInvoiceStore } from './storage/invoiceStore.js';
+import { isClusterWorker, onClusterMessage, sendToPrimary } from '../utils/cluster.js';
+import logger from '../utils/logger.js';
+import metrics from '../utils/metrics.js';
+
+// Messages exchanged with workers/renderWorker
+export type WorkerRequest = {
+  type: 'render';
+  jobId: string;
+  userId: string;
+  invoiceNumber: string;
+  payload: any;
+};
+
+export type WorkerResponse =
+  | { type: 'ready' }
+  | { type: 'done'; jobId: string; cacheKey: string; buffer: Uint8Array; timings: RenderTimings }
+  | { type: 'failed'; jobId: string; error: string; retryable: boolean };
+
+export interface RenderJob {
+  id: string;
+  userId: string;
+  payload: any;
+  status: InvoiceStatus;
+  invoiceNumber?: string;
+  filename?: string;
+  error?: string;
+  attempts: number;
+  createdAt: Date;
+  completedAt?: Date;
+  // When the job last entered the queue (Date.now())
+  queuedAt?: number;
+}
+
+const toJob = (invoice: InvoiceEntity): RenderJob => ({
+  id: invoice.id,
+  userId: invoice.userId,
+  payload: invoice.payload,
+  status: invoice.status as InvoiceStatus,
+  invoiceNumber: invoice.invoiceNumber,
+  filename: invoice.filename,
+  error: invoice.error,
+  attempts: invoice.attempts || 0,
+  createdAt: invoice.createdAt || invoice.date,
+  completedAt: invoice.completedAt
+});
+
+interface WorkerHandle {
+  id: number;
+  child: ChildProcess;
+  ready: boolean;
+  jobs: Set<string>;
+}
+
+export interface RenderJobOptions {
+  workers: number;
+  jobsPerWorker: number;
+  maxAttempts: number;
+}
+
+const optionsFromEnv = (): RenderJobOptions => ({
+  workers: Math.max(1, parseInt(process.env.PDF_JOB_WORKERS || '1', 10) || 1),
+  jobsPerWorker: Math.max(1, parseInt(process.env.PDF_JOB_WORKER_CONCURRENCY || '2', 10) || 1),
+  maxAttempts: parseInt(process.env.PDF_JOB_MAX_ATTEMPTS || '3', 10)
+});
+
+// Worker entry point next to this module, .ts under ts-node and .js when built
+const currentFile = fileURLToPath(import.meta.url);
+const workerScript = path.join(
+  path.dirname(currentFile),
+  '..',
+  'workers',
+  `renderWorker${path.extname(currentFile)}`
+);
+
+// Runs renders in separate worker processes, each owning its own browser and
+// page pools, so the API process only does bookkeeping. Jobs are recorded as
+// Invoice documents and resumed after a restart. In cluster mode each API
+// worker reports the jobs it holds to the primary, which resumes persisted
+// jobs on one worker at boot and hands a departed worker's jobs to another.
+export class RenderJobManager {
+  private jobs = new Map<string, RenderJob>();
+  private queue: string[] = [];
+  private workers: WorkerHandle[] = [];
+  private options: RenderJobOptions | null = null;
+  private started = false;
+  private closing = false;
+  private bookkeeping = new Set<Promise<void>>();
+
+  constructor(private overrides: Partial<RenderJobOptions> = {}) {}
+
+  // Fork workers and requeue unfinished jobs from a previous run
+  async start(): Promise<void> {
+    if (this.started) {
+      return;
+    }
+    this.started = true;
+    this.closing = false;
+
+    const { workers } = this.configure();
+    for (let i = 0; i < workers; i++) {
+      this.spawn(i);
+    }
+
+    if (isClusterWorker()) {
+      onClusterMessage('render-jobs:resume', () => {
+        this.resume().catch(error => logger.error('Failed to resume render jobs', error));
+      });
+      onClusterMessage('render-jobs:adopt', (ids: string[]) => {
+        this.resume(ids).catch(error => logger.error('Failed to adopt render jobs', error));
+      });
+      return;
+    }
+    await this.resume();
+  }
+
+  // Requeue unfinished jobs from the database: all of them, or only `ids`
+  async resume(ids?: string[]): Promise<void> {
+    const wanted = ids ? new Set(ids) : null;
+    const pending = (await repositories().invoices.findByStatus(['queued', 'rendering']))
+      .filter(invoice => (!wanted || wanted.has(invoice.id)) && !this.jobs.has(invoice.id));
+    for (const invoice of pending) {
+      // Another resume may have picked it up meanwhile
+      if (this.jobs.has(invoice.id)) {
+        continue;
+      }
+      const job: RenderJob = { ...toJob(invoice), status: 'queued' };
+      if (!job.invoiceNumber) {
+        // Held while the number is written, so a concurrent resume skips it
+        this.jobs.set(job.id, job);
+        try {
+          job.invoiceNumber = await newInvoiceNumber(job.userId);
+          await repositories().invoices.update(job.id, { invoiceNumber: job.invoiceNumber });
+        } catch (error) {
+          this.jobs.delete(job.id);
+          logger.error('Failed to number resumed render job', { jobId: job.id, err: error });
+          continue;
+        }
+      }
+      this.track(job);
+    }
+    if (pending.length > 0) {
+      logger.info('Resumed PDF render jobs', { count: pending.length });
+    }
+
+    this.dispatch();
+  }
+
+  // Validate and enqueue a render; resolves once the job is recorded. An
+  // invoice identical to one already rendered resolves with that invoice's
+  // completed record instead of a new job.
+  async submit(userId: string, payload: any): Promise<RenderJob> {
+    const fields = buildInvoiceFields(payload);
+    const engine = resolveEngine(payload.engine);
+    const cacheKey = invoiceCacheKey(userId, fields, engine);
+    const cached = await pdfCache.get(cacheKey);
+    if (cached) {
+      const invoices = repositories().invoices;
+      let existing = await invoices.findByNumber(userId, cached.invoiceNumber);
+      if (!existing) {
+        // The file outlived its history record (recording it failed); record it again
+        const meta = { userId, invoiceNumber: cached.invoiceNumber, filename: cached.filename, contentKey: cacheKey };
+        await recordRenderedInvoice(meta, fields, engine, cached.buffer.length);
+        existing = await invoices.findByNumber(userId, cached.invoiceNumber);
+      }
+      if (!existing) {
+        throw new Error(`Invoice ${cached.invoiceNumber} is cached but could not be recorded`);
+      }
+      return toJob(existing);
+    }
+
+    // Numbered on insert, so the completed render upserts this document
+    const invoiceNumber = await newInvoiceNumber(userId);
+    const createdAt = new Date();
+    const invoice = await repositories().invoices.create({
+      userId,
+      products: payload.products,
+      date: createdAt,
+      status: 'queued',
+      invoiceNumber,
+      payload,
+      attempts: 0
+    });
+    const job = toJob(invoice);
+    this.track(job);
+    this.dispatch();
+    return job;
+  }
+
+  // Job for a user, from memory or from the Invoice records
+  async get(id: string, userId: string): Promise<RenderJob | null> {
+    const job = this.jobs.get(id);
+    if (job) {
+      return job.userId === String(userId) ? job : null;
+    }
+
+    const invoice = await repositories().invoices.findForUser(id, String(userId));
+    return invoice && invoice.status ? toJob(invoice) : null;
+  }
+
+  // Stop dispatching and give in-flight renders up to drainTimeoutMs to
+  // finish before stopping the workers. Jobs still queued stay queued in the
+  // database for the next start, or for another cluster worker.
+  async shutdown(drainTimeoutMs = 0): Promise<void> {
+    this.closing = true;
+    const deadline = Date.now() + drainTimeoutMs;
+    while (Date.now() < deadline && (this.inFlight() > 0 || this.bookkeeping.size > 0)) {
+      await new Promise(resolve => setTimeout(resolve, 100));
+    }
+    if (this.inFlight() > 0) {
+      logger.warn('Stopping render workers with renders in flight', { inFlight: this.inFlight() });
+    }
+
+    await Promise.all(this.workers.map(worker => new Promise<void>(resolve => {
+      if (worker.child.exitCode !== null) {
+        return resolve();
+      }
+      worker.child.once('exit', () => resolve());
+      worker.child.kill('SIGTERM');
+    })));
+    this.workers = [];
+    this.started = false;
+  }
+
+  stats() {
+    return {
+      workers: this.workers.map(worker => ({
+        id: worker.id,
+        pid: worker.child.pid,
+        ready: worker.ready,
+        running: worker.jobs.size
+      })),
+      queued: this.queue.length,
+      tracked: this.jobs.size
+    };
+  }
+
+  private configure(): RenderJobOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+
+  // Jobs are numbered before they are queued, so retries and resumed jobs
+  // keep the same invoice number
+  private track(job: RenderJob): void {
+    job.queuedAt = Date.now();
+    this.jobs.set(job.id, job);
+    this.queue.push(job.id);
+    sendToPrimary('render-jobs', { op: 'own', id: job.id });
+  }
+
+  private inFlight(): number {
+    return this.workers.reduce((total, worker) => total + (worker ? worker.jobs.size : 0), 0);
+  }
+
+  private spawn(id: number): void {
+    // Each render worker runs its own browser pool: split this process's share
+    const browsers = Math.max(1, Math.floor(browserPool.size / this.configure().workers));
+    const child = fork(workerScript, [], {
+      serialization: 'advanced',
+      env: { ...process.env, PDF_BROWSER_POOL_SIZE: String(browsers) }
+    });
+    const worker: WorkerHandle = { id, child, ready: false, jobs: new Set() };
+    this.workers[id] = worker;
+
+    // Saving a finished render is tracked so a drain waits for it
+    child.on('message', (message: WorkerResponse) => {
+      this.keep(this.handleMessage(worker, message));
+    });
+
+    // Requeue whatever the worker was rendering and replace it
+    child.once('exit', code => {
+      if (this.workers[id] === worker) {
+        const orphaned = [...worker.jobs];
+        worker.jobs.clear();
+        worker.ready = false;
+        for (const jobId of orphaned) {
+          const job = this.jobs.get(jobId);
+          if (job) {
+            this.retryOrFail(job, `Render worker exited with code ${code}`).catch(() => {});
+          }
+        }
+
+        if (!this.closing) {
+          logger.warn('Render worker exited, restarting', { worker: id, code });
+          setTimeout(() => this.spawn(id), 1000).unref();
+        }
+      }
+    });
+  }
+
+  private async handleMessage(worker: WorkerHandle, message: WorkerResponse): Promise<void> {
+    if (message.type === 'ready') {
+      worker.ready = true;
+      this.dispatch();
+      return;
+    }
+
+    worker.jobs.delete(message.jobId);
+    const job = this.jobs.get(message.jobId);
+    this.dispatch();
+    if (!job) {
+      return;
+    }
+
+    if (message.type === 'done') {
+      observeRenderTimings(message.timings, resolveEngine(job.payload.engine));
+      // Saved here rather than in the worker so only this process writes the store index
+      const invoiceNumber = job.invoiceNumber as string;
+      const filename = getInvoiceStore().filenameFor(invoiceNumber, message.cacheKey);
+      const buffer = Buffer.from(message.buffer.buffer, message.buffer.byteOffset, message.buffer.byteLength);
+      try {
+        await saveRenderedInvoice(
+          { userId: job.userId, invoiceNumber, filename, contentKey: message.cacheKey },
+          buffer,
+          buildInvoiceFields(job.payload),
+          resolveEngine(job.payload.engine)
+        );
+      } catch (error) {
+        logger.error('Failed to save render job', { jobId: job.id, err: error });
+        return this.retryOrFail(job, 'Failed to save PDF');
+      }
+      await this.complete(job, filename);
+    } else if (message.retryable) {
+      await this.retryOrFail(job, message.error);
+    } else {
+      await this.fail(job, message.error);
+    }
+  }
+
+  // Hand queued jobs to the least busy ready worker
+  private dispatch(): void {
+    const { jobsPerWorker } = this.configure();
+    if (this.closing) {
+      return;
+    }
+
+    while (this.queue.length > 0) {
+      const worker = this.workers
+        .filter(candidate => candidate && candidate.ready && candidate.jobs.size < jobsPerWorker)
+        .sort((a, b) => a.jobs.size - b.jobs.size)[0];
+      if (!worker) {
+        return;
+      }
+
+      const jobId = this.queue.shift() as string;
+      const job = this.jobs.get(jobId);
+      if (!job || job.status !== 'queued') {
+        continue;
+      }
+
+      if (job.queuedAt) {
+        recordRenderPhase('queue', Date.now() - job.queuedAt, resolveEngine(job.payload.engine));
+      }
+      job.status = 'rendering';
+      job.attempts++;
+      worker.jobs.add(jobId);
+      this.keep(this.send(worker, job));
+    }
+  }
+
+  // Record the attempt before the worker can finish it, so a slow write never
+  // lands after the job's completion
+  private async send(worker: WorkerHandle, job: RenderJob): Promise<void> {
+    await this.persist(job, { status: 'rendering', attempts: job.attempts });
+    // The worker exited meanwhile and its jobs were requeued
+    if (!worker.jobs.has(job.id)) {
+      return;
+    }
+    const request: WorkerRequest = {
+      type: 'render',
+      jobId: job.id,
+      userId: job.userId,
+      invoiceNumber: job.invoiceNumber as string,
+      payload: job.payload
+    };
+    worker.child.send(request);
+  }
+
+  // Tracked so a drain waits for it
+  private keep(work: Promise<void>): void {
+    const handled = work.catch(error => {
+      logger.error('Render job bookkeeping error', error);
+    });
+    this.bookkeeping.add(handled);
+    handled.finally(() => this.bookkeeping.delete(handled));
+  }
+
+  // The file is the job's own render, or an identical earlier one on a cache hit
+  private async complete(job: RenderJob, filename: string): Promise<void> {
+    job.status = 'completed';
+    job.filename = filename;
+    job.completedAt = new Date();
+    await this.persist(job, { status: 'completed', filename, completedAt: job.completedAt });
+    this.retire(job);
+  }
+
+  private async fail(job: RenderJob, error: string): Promise<void> {
+    job.status = 'failed';
+    job.error = error;
+    job.completedAt = new Date();
+    await this.persist(job, { status: 'failed', error, completedAt: job.completedAt });
+    this.retire(job);
+  }
+
+  private async retryOrFail(job: RenderJob, error: string): Promise<void> {
+    if (job.attempts >= this.configure().maxAttempts) {
+      return this.fail(job, error);
+    }
+    job.status = 'queued';
+    job.queuedAt = Date.now();
+    this.queue.push(job.id);
+    await this.persist(job, { status: 'queued' });
+    this.dispatch();
+  }
+
+  // Finished jobs live on in the Invoice records
+  private retire(job: RenderJob): void {
+    this.jobs.delete(job.id);
+    sendToPrimary('render-jobs', { op: 'release', id: job.id });
+  }
+
+  private async persist(job: RenderJob, update: Partial<InvoiceEntity>): Promise<void> {
+    try {
+      await repositories().invoices.update(job.id, update);
+    } catch (error) {
+      logger.error('Failed to persist render job', { jobId: job.id, err: error });
+    }
+  }
+}
+
+const renderJobs = new RenderJobManager();
+
+metrics.gauge('pdf_render_workers', 'Render worker processes by state', () => {
+  const { workers } = renderJobs.stats();
+  const ready = workers.filter(worker => worker.ready).length;
+  return [{ labels: { state: 'ready' }, value: ready }, { labels: { state: 'starting' }, value: workers.length - ready }];
+});
+metrics.gauge('pdf_jobs_running', 'Render jobs on a render worker', () =>
+  renderJobs.stats().workers.reduce((total, worker) => total + worker.running, 0));
+metrics.gauge('pdf_jobs_queued', 'Render jobs waiting for a render worker', () => renderJobs.stats().queued);
+
+export default renderJobs;
@@ -0,0 +1,31 @@
+import metrics from '../utils/metrics.js';
+import tracer from '../utils/tracing.js';
+
+// Milliseconds spent in each phase of one render, filled in by the renderer
+// that did the work (possibly in a render worker process) and observed here
+export type RenderTimings = Partial<Record<'setContent' | 'print', number>>;
+
+// queue: waiting for a render slot or a render worker
+// setContent: swapping the invoice body into a warm page
+// print: page.pdf(), or the whole render for the native engine
+// write: saving the PDF to the invoice store
+export const renderPhaseSeconds = metrics.histogram(
+  'pdf_render_phase_seconds',
+  'PDF render time by phase (queue, setContent, print, write)',
+  { labels: ['phase', 'engine'] }
+);
+
+// Observe a phase and add it to the current request's trace
+export const recordRenderPhase = (phase: string, durationMs: number, engine: string): void => {
+  renderPhaseSeconds.observe(durationMs / 1000, { phase, engine });
+  tracer.record(phase, durationMs);
+};
+
+export const observeRenderTimings = (timings: RenderTimings, engine: string): void => {
+  for (const phase of Object.keys(timings) as (keyof RenderTimings)[]) {
+    const durationMs = timings[phase] as number;
+    renderPhaseSeconds.observe(durationMs / 1000, { phase, engine });
+    // setContent ran right before print, which ended just now
+    tracer.record(phase, durationMs, phase === 'setContent' ? timings.print || 0 : 0);
+  }
+};
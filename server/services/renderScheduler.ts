@@ -0,0 +1,243 @@
+import { AsyncResource } from 'async_hooks';
+import os from 'os';
+import { recordRenderPhase } from './renderMetrics.js';
+import { workerShare } from '../utils/cluster.js';
+import metrics from '../utils/metrics.js';
+
+// Rejected at admission because the queue is full
+export class QueueFullError extends Error {
+  retryAfterSeconds: number;
+
+  constructor(retryAfterSeconds: number, message = 'Render queue is full') {
+    super(message);
+    this.name = 'QueueFullError';
+    this.retryAfterSeconds = retryAfterSeconds;
+  }
+}
+
+// Waited in the queue past its deadline, or the caller gave up
+export class QueueTimeoutError extends Error {
+  constructor(message = 'Render request timed out in queue') {
+    super(message);
+    this.name = 'QueueTimeoutError';
+  }
+}
+
+interface Task {
+  userKey: string;
+  run: () => Promise<unknown>;
+  resolve: (value: any) => void;
+  reject: (error: Error) => void;
+  enqueuedAt: number;
+  timer: NodeJS.Timeout | null;
+  onAbort: (() => void) | null;
+  signal?: AbortSignal;
+  // The caller's async context, so logs and trace spans of the render stay
+  // with its request rather than whichever request freed the slot
+  resource: AsyncResource;
+}
+
+export interface ScheduleOptions {
+  timeoutMs?: number;
+  signal?: AbortSignal;
+}
+
+export interface RenderSchedulerOptions {
+  concurrency: number;
+  maxQueue: number;
+  queueTimeoutMs: number;
+}
+
+// Concurrency defaults to the smaller of the core count and how many renders
+// fit in half of system memory at PDF_RENDER_MEMORY_MB each, split between
+// the API workers in cluster mode
+const optionsFromEnv = (): RenderSchedulerOptions => {
+  const perRenderBytes = parseInt(process.env.PDF_RENDER_MEMORY_MB || '150', 10) * 1024 * 1024;
+  const byMemory = Math.floor((os.totalmem() * 0.5) / perRenderBytes);
+  const derived = workerShare(Math.max(1, Math.min(os.availableParallelism(), byMemory)));
+  return {
+    concurrency: parseInt(process.env.PDF_RENDER_CONCURRENCY || '', 10) || derived,
+    maxQueue: parseInt(process.env.PDF_RENDER_QUEUE_SIZE || '100', 10),
+    queueTimeoutMs: parseInt(process.env.PDF_RENDER_QUEUE_TIMEOUT_MS || '30000', 10)
+  };
+};
+
+// Bounded admission queue in front of render work. Each user has its own FIFO;
+// users are served round-robin so one bulk caller cannot starve the rest.
+export class RenderScheduler {
+  // Insertion order of the map is the round-robin rotation
+  private queues = new Map<string, Task[]>();
+  private options: RenderSchedulerOptions | null = null;
+  private running = 0;
+  private queued = 0;
+  private counters = { completed: 0, failed: 0, rejected: 0, timedOut: 0 };
+  private totalWaitMs = 0;
+  private maxWaitMs = 0;
+  private totalServiceMs = 0;
+
+  constructor(private overrides: Partial<RenderSchedulerOptions> = {}) {}
+
+  get concurrency(): number {
+    return this.configure().concurrency;
+  }
+
+  schedule<T>(userKey: string, run: () => Promise<T>, options: ScheduleOptions = {}): Promise<T> {
+    const { maxQueue, queueTimeoutMs } = this.configure();
+
+    if (options.signal?.aborted) {
+      return Promise.reject(new QueueTimeoutError('Render request was cancelled'));
+    }
+
+    if (this.queued >= maxQueue) {
+      this.counters.rejected++;
+      return Promise.reject(new QueueFullError(this.estimateRetryAfter()));
+    }
+
+    return new Promise<T>((resolve, reject) => {
+      const task: Task = {
+        userKey,
+        run,
+        resolve,
+        reject,
+        enqueuedAt: Date.now(),
+        timer: null,
+        onAbort: null,
+        signal: options.signal,
+        resource: new AsyncResource('RenderTask')
+      };
+
+      const timeoutMs = options.timeoutMs ?? queueTimeoutMs;
+      if (timeoutMs > 0) {
+        task.timer = setTimeout(() => this.expire(task, new QueueTimeoutError()), timeoutMs);
+      }
+      if (options.signal) {
+        task.onAbort = () => this.expire(task, new QueueTimeoutError('Render request was cancelled'));
+        options.signal.addEventListener('abort', task.onAbort, { once: true });
+      }
+
+      const userQueue = this.queues.get(userKey);
+      if (userQueue) {
+        userQueue.push(task);
+      } else {
+        this.queues.set(userKey, [task]);
+      }
+      this.queued++;
+      this.pump();
+    });
+  }
+
+  stats() {
+    const { concurrency, maxQueue } = this.configure();
+    const started = this.counters.completed + this.counters.failed;
+    return {
+      concurrency,
+      maxQueue,
+      running: this.running,
+      queued: this.queued,
+      users: this.queues.size,
+      ...this.counters,
+      avgWaitMs: started ? Math.round(this.totalWaitMs / started) : 0,
+      maxWaitMs: this.maxWaitMs,
+      avgServiceMs: started ? Math.round(this.totalServiceMs / started) : 0
+    };
+  }
+
+  private configure(): RenderSchedulerOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+
+  // Time for the current backlog to drain at the observed service rate
+  private estimateRetryAfter(): number {
+    const { concurrency } = this.configure();
+    const started = this.counters.completed + this.counters.failed;
+    const avgServiceMs = started ? this.totalServiceMs / started : 1000;
+    return Math.max(1, Math.ceil(((this.queued / concurrency) * avgServiceMs) / 1000));
+  }
+
+  private pump(): void {
+    const { concurrency } = this.configure();
+
+    while (this.running < concurrency && this.queued > 0) {
+      const [userKey, userQueue] = this.queues.entries().next().value as [string, Task[]];
+      const task = userQueue.shift() as Task;
+
+      // Rotate this user to the back of the ring
+      this.queues.delete(userKey);
+      if (userQueue.length > 0) {
+        this.queues.set(userKey, userQueue);
+      }
+      this.queued--;
+      this.start(task);
+    }
+  }
+
+  private start(task: Task): void {
+    this.detach(task);
+
+    const startedAt = Date.now();
+    const waitMs = startedAt - task.enqueuedAt;
+    this.totalWaitMs += waitMs;
+    this.maxWaitMs = Math.max(this.maxWaitMs, waitMs);
+    this.running++;
+
+    task.resource.runInAsyncScope(() => {
+      recordRenderPhase('queue', waitMs, 'chromium');
+      return task.run();
+    })
+      .then(value => {
+        this.counters.completed++;
+        task.resolve(value);
+      }, error => {
+        this.counters.failed++;
+        task.reject(error);
+      })
+      .finally(() => {
+        this.totalServiceMs += Date.now() - startedAt;
+        this.running--;
+        this.pump();
+      });
+  }
+
+  private expire(task: Task, error: Error): void {
+    const userQueue = this.queues.get(task.userKey);
+    const index = userQueue ? userQueue.indexOf(task) : -1;
+    if (!userQueue || index === -1) {
+      return;
+    }
+
+    userQueue.splice(index, 1);
+    if (userQueue.length === 0) {
+      this.queues.delete(task.userKey);
+    }
+    this.queued--;
+    this.counters.timedOut++;
+    this.detach(task);
+    task.reject(error);
+  }
+
+  private detach(task: Task): void {
+    if (task.timer) {
+      clearTimeout(task.timer);
+      task.timer = null;
+    }
+    if (task.onAbort && task.signal) {
+      task.signal.removeEventListener('abort', task.onAbort);
+      task.onAbort = null;
+    }
+  }
+}
+
+const renderScheduler = new RenderScheduler();
+
+metrics.gauge('pdf_render_slots', 'Render concurrency limit', () => renderScheduler.stats().concurrency);
+metrics.gauge('pdf_render_running', 'Renders holding a slot', () => renderScheduler.stats().running);
+metrics.gauge('pdf_render_queued', 'Renders waiting for a slot', () => renderScheduler.stats().queued);
+metrics.counterFrom('pdf_render_queue_rejections_total', 'Renders turned away by the render queue', () => {
+  const { rejected, timedOut } = renderScheduler.stats();
+  return [{ labels: { reason: 'full' }, value: rejected }, { labels: { reason: 'timeout' }, value: timedOut }];
+});
+
+export default renderScheduler;
@@ -0,0 +1,101 @@
+import { RollupPeriod, rollupBucket, rollupProductKey } from '../models/revenueRollupModel.js';
+import repositories, { RollupProduct } from '../repositories/index.js';
+
+export interface RollupInvoice {
+  userId: string;
+  date: Date;
+  products: Array<{ name: string; qty: number; total: number }>;
+  subtotal: number;
+  tax: number;
+  total: number;
+}
+
+export interface ReportQuery {
+  period: RollupPeriod;
+  from: string;
+  to: string;
+  top: number;
+}
+
+const round = (value: number) => Math.round(value * 100) / 100;
+
+// Fold one newly recorded invoice into its day and month rollups
+export const applyInvoiceToRollups = async (invoice: RollupInvoice): Promise<void> => {
+  const products: Record<string, RollupProduct> = {};
+  for (const product of invoice.products) {
+    const key = rollupProductKey(product.name);
+    const running = products[key] || { name: product.name.trim(), qty: 0, revenue: 0 };
+    running.qty += product.qty;
+    running.revenue += product.total;
+    products[key] = running;
+  }
+
+  const delta = {
+    invoiceCount: 1,
+    subtotal: invoice.subtotal,
+    tax: invoice.tax,
+    total: invoice.total,
+    products
+  };
+  await Promise.all((['day', 'month'] as RollupPeriod[]).map(period =>
+    repositories().rollups.increment(String(invoice.userId), period, rollupBucket(period, invoice.date), delta)
+  ));
+};
+
+// Recompute rollups from recorded invoices, for one user or everyone
+export const rebuildRollups = (userId?: string): Promise<void> => repositories().rollups.rebuild(userId);
+
+// Buckets in [from, to] with totals and top products by revenue. Reads one
+// document per bucket from the rollup index, independent of invoice volume.
+export const revenueReport = async (userId: string, query: ReportQuery) => {
+  const rollups = await repositories().rollups.range(String(userId), query.period, query.from, query.to);
+
+  const summary = { invoiceCount: 0, subtotal: 0, tax: 0, total: 0 };
+  const productTotals = new Map<string, RollupProduct>();
+  const topProducts = (products: Iterable<RollupProduct>) =>
+    [...products]
+      .sort((a, b) => b.revenue - a.revenue)
+      .slice(0, query.top)
+      .map(product => ({ name: product.name, qty: product.qty, revenue: round(product.revenue) }));
+
+  const buckets = rollups.map(rollup => {
+    summary.invoiceCount += rollup.invoiceCount;
+    summary.subtotal += rollup.subtotal;
+    summary.tax += rollup.tax;
+    summary.total += rollup.total;
+
+    const products = Object.entries(rollup.products || {});
+    for (const [key, product] of products) {
+      const running = productTotals.get(key);
+      if (running) {
+        running.qty += product.qty;
+        running.revenue += product.revenue;
+      } else {
+        productTotals.set(key, { ...product });
+      }
+    }
+
+    return {
+      bucket: rollup.bucket,
+      invoiceCount: rollup.invoiceCount,
+      subtotal: round(rollup.subtotal),
+      gst: round(rollup.tax),
+      grandTotal: round(rollup.total),
+      topProducts: topProducts(products.map(([, product]) => product))
+    };
+  });
+
+  return {
+    period: query.period,
+    from: query.from,
+    to: query.to,
+    summary: {
+      invoiceCount: summary.invoiceCount,
+      subtotal: round(summary.subtotal),
+      gst: round(summary.tax),
+      grandTotal: round(summary.total),
+      topProducts: topProducts(productTotals.values())
+    },
+    buckets
+  };
+};
@@ -0,0 +1,608 @@
+import fs from 'fs';
+import path from 'path';
+import { Readable, Writable } from 'stream';
+import { isClusterWorker, sendToPrimary } from '../../utils/cluster.js';
+import { LocalBackend } from './localBackend.js';
+import { ObjectStoreBackend } from './objectStoreBackend.js';
+import { InvoiceNumberTakenError, StorageBackend, StorageNotFoundError } from './types.js';
+import logger from '../../utils/logger.js';
+
+export interface InvoiceFileMeta {
+  userId: string;
+  invoiceNumber: string;
+  filename: string;
+  // Render cache key of the payload the file was rendered from
+  contentKey: string;
+}
+
+export interface IndexEntry extends InvoiceFileMeta {
+  key: string;
+  size: number;
+  createdAt: number;
+  lastAccess: number;
+}
+
+// One line of the on-disk index log. 'touch' only travels from followers to
+// the owner, carrying their batched reads; the log keeps lastAccess through 'put'.
+export type IndexRecord =
+  | { op: 'put'; entry: IndexEntry }
+  | { op: 'del'; userId: string; invoiceNumber: string }
+  | { op: 'touch'; touches: Array<{ userId: string; invoiceNumber: string; lastAccess: number }> };
+
+export interface InvoiceWrite {
+  stream: Writable;
+  commit(size: number): Promise<IndexEntry>;
+  abort(): void;
+}
+
+export interface InvoiceStoreOptions {
+  maxTotalBytes: number;
+  maxUserBytes: number;
+  ttlMs: number;
+  cleanupIntervalMs: number;
+  // Follow an index owned by the cluster primary instead of writing it
+  follower: boolean;
+  syncIntervalMs: number;
+}
+
+const MB = 1024 * 1024;
+const DAY = 24 * 60 * 60 * 1000;
+
+const optionsFromEnv = (): InvoiceStoreOptions => ({
+  maxTotalBytes: parseInt(process.env.INVOICE_STORAGE_MAX_MB || '900', 10) * MB,
+  maxUserBytes: parseInt(process.env.INVOICE_STORAGE_USER_MAX_MB || '100', 10) * MB,
+  ttlMs: parseFloat(process.env.INVOICE_STORAGE_TTL_DAYS || '90') * DAY,
+  cleanupIntervalMs: parseInt(process.env.INVOICE_STORAGE_CLEANUP_MS || '60000', 10),
+  follower: isClusterWorker(),
+  syncIntervalMs: parseInt(process.env.INVOICE_STORAGE_SYNC_MS || '2000', 10)
+});
+
+// Files written by this store are named invoice-<number>-<contentKey>.pdf
+const storedFilePattern = /^invoice-(.+)-([0-9a-f]{16})\.pdf$/;
+
+const shardSegment = (value: string) => value.replace(/[^\w.-]/g, '_') || '_';
+
+// Invoice numbers are per user, so entries are keyed by both
+const entryKey = (userId: string, invoiceNumber: string) => `${userId}\n${invoiceNumber}`;
+
+// Managed invoice file storage: sharded keys (<user>/<yyyy>/<mm>/<dd>/<file>),
+// an append-only on-disk index for O(1) lookup by (user, invoice number) or
+// content key, and background eviction by age, per-user quota and total size (least
+// recently accessed first). The backend is pluggable.
+//
+// In cluster mode the primary owns the index: it alone appends to the log,
+// compacts it and evicts. API workers run as followers that send their
+// records to the primary and tail the log to see everyone else's. They also
+// report reads to the primary every syncIntervalMs, so eviction follows
+// access order across all workers.
+export class InvoiceStore {
+  private entries = new Map<string, IndexEntry>();
+  private byContentKey = new Map<string, string>();
+  private userBytes = new Map<string, number>();
+  private totalBytes = 0;
+  private logLines = 0;
+  private logQueue: Promise<void> = Promise.resolve();
+  private loading: Promise<void> | null = null;
+  private cleanupTimer: NodeJS.Timeout | null = null;
+  private syncTimer: NodeJS.Timeout | null = null;
+  private syncing: Promise<boolean> | null = null;
+  private logIno = 0;
+  private logOffset = 0;
+  private cleanupRunning: Promise<void> | null = null;
+  private cleanupScheduled = false;
+  private options: InvoiceStoreOptions | null = null;
+  private evictions = 0;
+  // Reads on a follower not yet reported to the owner, by entry key
+  private touches = new Map<string, { userId: string; invoiceNumber: string; lastAccess: number }>();
+
+  constructor(
+    readonly backend: StorageBackend,
+    private indexPath: string,
+    private overrides: Partial<InvoiceStoreOptions> = {}
+  ) {}
+
+  // Load the index (rebuilding it from the backend if missing) and start cleanup
+  ready(): Promise<void> {
+    if (!this.loading) {
+      this.loading = this.load().catch(error => {
+        // Let the next caller retry
+        this.loading = null;
+        throw error;
+      });
+    }
+    return this.loading;
+  }
+
+  // File name for a rendered invoice; embeds the content key so the index can
+  // be rebuilt from the files alone
+  filenameFor(invoiceNumber: string, contentKey: string): string {
+    return `invoice-${invoiceNumber}-${contentKey}.pdf`;
+  }
+
+  keyFor(meta: InvoiceFileMeta, when = new Date()): string {
+    const yyyy = String(when.getUTCFullYear());
+    const mm = String(when.getUTCMonth() + 1).padStart(2, '0');
+    const dd = String(when.getUTCDate()).padStart(2, '0');
+    return [shardSegment(String(meta.userId)), yyyy, mm, dd, meta.filename].join('/');
+  }
+
+  async put(meta: InvoiceFileMeta, data: Buffer): Promise<IndexEntry> {
+    await this.ready();
+    this.checkNumber(meta);
+    const key = this.keyFor(meta);
+    await this.backend.put(key, data);
+    return this.record(meta, key, data.length);
+  }
+
+  // Streamed write; commit with the number of bytes written once the stream ends
+  async openWrite(meta: InvoiceFileMeta): Promise<InvoiceWrite> {
+    await this.ready();
+    this.checkNumber(meta);
+    const key = this.keyFor(meta);
+    const handle = await this.backend.openWrite(key);
+    return {
+      stream: handle.stream,
+      commit: async (size: number) => {
+        await handle.commit();
+        return this.record(meta, key, size);
+      },
+      abort: () => handle.abort()
+    };
+  }
+
+  async lookup(userId: string, invoiceNumber: string): Promise<IndexEntry | null> {
+    await this.ready();
+    const key = entryKey(String(userId), invoiceNumber);
+    let entry = this.entries.get(key);
+    if (!entry && this.configure().follower) {
+      await this.sync();
+      entry = this.entries.get(key);
+    }
+    if (entry) {
+      this.touch(entry);
+    }
+    return entry || null;
+  }
+
+  // Stored filenames carry the invoice number, see filenameFor
+  async lookupFile(userId: string, filename: string): Promise<IndexEntry | null> {
+    const match = storedFilePattern.exec(filename);
+    const entry = match ? await this.lookup(userId, match[1]) : null;
+    return entry && entry.filename === filename ? entry : null;
+  }
+
+  async findByContentKey(contentKey: string): Promise<IndexEntry | null> {
+    await this.ready();
+    let key = this.byContentKey.get(contentKey);
+    if (!key && this.configure().follower) {
+      await this.sync();
+      key = this.byContentKey.get(contentKey);
+    }
+    const entry = key ? this.entries.get(key) : undefined;
+    if (entry) {
+      this.touch(entry);
+    }
+    return entry || null;
+  }
+
+  // Missing objects are dropped from the index and reported as null
+  async read(entry: IndexEntry): Promise<Buffer | null> {
+    try {
+      return await this.backend.read(entry.key);
+    } catch (error) {
+      return this.handleMissing(entry, error);
+    }
+  }
+
+  async openRead(entry: IndexEntry): Promise<Readable | null> {
+    try {
+      return await this.backend.openRead(entry.key);
+    } catch (error) {
+      return this.handleMissing(entry, error);
+    }
+  }
+
+  async remove(userId: string, invoiceNumber: string): Promise<void> {
+    await this.ready();
+    const entry = this.entries.get(entryKey(String(userId), invoiceNumber));
+    if (!entry) {
+      return;
+    }
+    this.forget(entry);
+    this.append({ op: 'del', userId: entry.userId, invoiceNumber });
+    await this.backend.delete(entry.key);
+  }
+
+  // Evict expired files, then least recently used files of users over quota,
+  // then least recently used files overall until under the total limit
+  cleanup(): Promise<void> {
+    if (!this.cleanupRunning) {
+      this.cleanupRunning = this.runCleanup().finally(() => {
+        this.cleanupRunning = null;
+      });
+    }
+    return this.cleanupRunning;
+  }
+
+  // Apply a record sent by a follower; only called on the owner
+  async applyRemote(record: IndexRecord): Promise<void> {
+    await this.ready();
+    if (record.op === 'put') {
+      this.add(record.entry);
+      this.append(record);
+      this.scheduleCleanup(record.entry.userId);
+    } else if (record.op === 'del') {
+      this.applyDelete(record);
+      this.append(record);
+    } else {
+      for (const touch of record.touches) {
+        const entry = this.entries.get(entryKey(touch.userId, touch.invoiceNumber));
+        if (entry && touch.lastAccess > entry.lastAccess) {
+          entry.lastAccess = touch.lastAccess;
+        }
+      }
+    }
+  }
+
+  async shutdown(): Promise<void> {
+    if (this.cleanupTimer) {
+      clearInterval(this.cleanupTimer);
+      this.cleanupTimer = null;
+    }
+    if (this.syncTimer) {
+      clearInterval(this.syncTimer);
+      this.syncTimer = null;
+    }
+    this.flushTouches();
+    if (this.loading && !this.configure().follower) {
+      await this.loading.catch(() => {});
+      await this.compact();
+    }
+  }
+
+  stats() {
+    const { maxTotalBytes, maxUserBytes } = this.configure();
+    return {
+      backend: this.backend.name,
+      files: this.entries.size,
+      totalBytes: this.totalBytes,
+      maxTotalBytes,
+      maxUserBytes,
+      users: this.userBytes.size,
+      evictions: this.evictions,
+      role: this.configure().follower ? 'follower' : 'owner'
+    };
+  }
+
+  private configure(): InvoiceStoreOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+
+  private async load(): Promise<void> {
+    await fs.promises.mkdir(path.dirname(this.indexPath), { recursive: true });
+
+    const { follower, cleanupIntervalMs, syncIntervalMs } = this.configure();
+    const found = await this.readLog();
+
+    // Followers never rebuild or rewrite the log; the primary has done so before forking them
+    if (follower) {
+      if (syncIntervalMs > 0 && !this.syncTimer) {
+        this.syncTimer = setInterval(() => {
+          this.flushTouches();
+          this.sync().catch(error => logger.error('Invoice storage index sync error', error));
+        }, syncIntervalMs);
+        this.syncTimer.unref();
+      }
+      return;
+    }
+
+    if (!found) {
+      await this.rebuild();
+    }
+    await this.compact();
+
+    if (cleanupIntervalMs > 0 && !this.cleanupTimer) {
+      this.cleanupTimer = setInterval(() => {
+        this.cleanup().catch(error => logger.error('Invoice storage cleanup error', error));
+      }, cleanupIntervalMs);
+      this.cleanupTimer.unref();
+    }
+  }
+
+  private sync(): Promise<boolean> {
+    if (!this.syncing) {
+      this.syncing = this.readLog().finally(() => {
+        this.syncing = null;
+      });
+    }
+    return this.syncing;
+  }
+
+  // Apply log lines written since the last read; a replaced (compacted) or
+  // truncated log is read again from the start. Resolves false if there is no log.
+  private async readLog(): Promise<boolean> {
+    let handle: fs.promises.FileHandle;
+    try {
+      handle = await fs.promises.open(this.indexPath, 'r');
+    } catch {
+      return false;
+    }
+
+    try {
+      const stat = await handle.stat();
+      if (stat.ino !== this.logIno || stat.size < this.logOffset) {
+        if (this.logIno !== 0) {
+          this.reset();
+        }
+        this.logIno = stat.ino;
+        this.logOffset = 0;
+      }
+      if (stat.size === this.logOffset) {
+        return true;
+      }
+
+      const buffer = Buffer.alloc(stat.size - this.logOffset);
+      await handle.read(buffer, 0, buffer.length, this.logOffset);
+      // Stop at the last complete line; a partial one is read next time
+      const end = buffer.lastIndexOf(10);
+      if (end === -1) {
+        return true;
+      }
+      for (const line of buffer.subarray(0, end + 1).toString('utf8').split('\n')) {
+        if (!line) {
+          continue;
+        }
+        try {
+          const record: IndexRecord = JSON.parse(line);
+          if (record.op === 'put') {
+            this.add(record.entry);
+          } else if (record.op === 'del') {
+            this.applyDelete(record);
+          }
+        } catch {
+          // Ignore a torn line from a crash mid-append
+        }
+      }
+      this.logOffset += end + 1;
+      return true;
+    } finally {
+      await handle.close();
+    }
+  }
+
+  private touch(entry: IndexEntry): void {
+    entry.lastAccess = Date.now();
+    if (this.configure().follower) {
+      this.touches.set(entryKey(entry.userId, entry.invoiceNumber), {
+        userId: entry.userId,
+        invoiceNumber: entry.invoiceNumber,
+        lastAccess: entry.lastAccess
+      });
+    }
+  }
+
+  private flushTouches(): void {
+    if (this.touches.size === 0) {
+      return;
+    }
+    sendToPrimary('invoice-index', { op: 'touch', touches: [...this.touches.values()] });
+    this.touches.clear();
+  }
+
+  private reset(): void {
+    this.entries.clear();
+    this.byContentKey.clear();
+    this.userBytes.clear();
+    this.totalBytes = 0;
+  }
+
+  // Recreate the index from the files in the backend
+  private async rebuild(): Promise<void> {
+    for await (const object of this.backend.list()) {
+      const filename = object.key.split('/').pop() as string;
+      const match = storedFilePattern.exec(filename);
+      if (!match) {
+        continue;
+      }
+      const segments = object.key.split('/');
+      this.add({
+        userId: segments.length > 1 ? segments[0] : '',
+        invoiceNumber: match[1],
+        filename,
+        contentKey: match[2],
+        key: object.key,
+        size: object.size,
+        createdAt: object.mtimeMs,
+        lastAccess: object.mtimeMs
+      });
+    }
+    if (this.entries.size > 0) {
+      logger.info(`Rebuilt invoice storage index with ${this.entries.size} file(s)`);
+    }
+  }
+
+  // A number may only be stored again for a re-render of the same content;
+  // anything else is a different invoice reusing the number
+  private checkNumber(meta: InvoiceFileMeta): IndexEntry | undefined {
+    const previous = this.entries.get(entryKey(String(meta.userId), meta.invoiceNumber));
+    if (previous && previous.contentKey !== meta.contentKey) {
+      throw new InvoiceNumberTakenError(String(meta.userId), meta.invoiceNumber);
+    }
+    return previous;
+  }
+
+  private record(meta: InvoiceFileMeta, key: string, size: number): IndexEntry {
+    const now = Date.now();
+    const entry: IndexEntry = { ...meta, userId: String(meta.userId), key, size, createdAt: now, lastAccess: now };
+
+    // Checked again: the number may have been stored while the file was written
+    let previous: IndexEntry | undefined;
+    try {
+      previous = this.checkNumber(entry);
+    } catch (error) {
+      this.backend.delete(key).catch(() => {});
+      throw error;
+    }
+    // A re-render replaces the old file
+    if (previous && previous.key !== key) {
+      this.backend.delete(previous.key).catch(() => {});
+    }
+
+    this.add(entry);
+    this.append({ op: 'put', entry });
+    this.scheduleCleanup(entry.userId);
+    return entry;
+  }
+
+  private add(entry: IndexEntry): void {
+    const key = entryKey(entry.userId, entry.invoiceNumber);
+    const previous = this.entries.get(key);
+    if (previous) {
+      this.forget(previous);
+    }
+    this.entries.set(key, entry);
+    this.byContentKey.set(entry.contentKey, key);
+    this.userBytes.set(entry.userId, (this.userBytes.get(entry.userId) || 0) + entry.size);
+    this.totalBytes += entry.size;
+  }
+
+  private applyDelete(record: { userId: string; invoiceNumber: string }): void {
+    const entry = this.entries.get(entryKey(record.userId, record.invoiceNumber));
+    if (entry) {
+      this.forget(entry);
+    }
+  }
+
+  private forget(entry: IndexEntry): void {
+    const key = entryKey(entry.userId, entry.invoiceNumber);
+    if (this.entries.get(key) !== entry) {
+      return;
+    }
+    this.entries.delete(key);
+    if (this.byContentKey.get(entry.contentKey) === key) {
+      this.byContentKey.delete(entry.contentKey);
+    }
+    const remaining = (this.userBytes.get(entry.userId) || 0) - entry.size;
+    if (remaining > 0) {
+      this.userBytes.set(entry.userId, remaining);
+    } else {
+      this.userBytes.delete(entry.userId);
+    }
+    this.totalBytes -= entry.size;
+  }
+
+  private handleMissing(entry: IndexEntry, error: unknown): null {
+    if (!(error instanceof StorageNotFoundError)) {
+      throw error;
+    }
+    this.forget(entry);
+    this.append({ op: 'del', userId: entry.userId, invoiceNumber: entry.invoiceNumber });
+    return null;
+  }
+
+  private async evict(entry: IndexEntry): Promise<void> {
+    this.forget(entry);
+    this.append({ op: 'del', userId: entry.userId, invoiceNumber: entry.invoiceNumber });
+    this.evictions++;
+    await this.backend.delete(entry.key).catch(error => {
+      logger.error('Failed to delete evicted invoice', { key: entry.key, err: error });
+    });
+  }
+
+  // Run a cleanup soon when a write pushed a user or the store over quota
+  private scheduleCleanup(userId: string): void {
+    const { maxTotalBytes, maxUserBytes, follower } = this.configure();
+    if (follower) {
+      return;
+    }
+    const overQuota = this.totalBytes > maxTotalBytes || (this.userBytes.get(userId) || 0) > maxUserBytes;
+    if (!overQuota || this.cleanupScheduled) {
+      return;
+    }
+    this.cleanupScheduled = true;
+    setImmediate(() => {
+      this.cleanupScheduled = false;
+      this.cleanup().catch(error => logger.error('Invoice storage cleanup error', error));
+    });
+  }
+
+  private async runCleanup(): Promise<void> {
+    const { maxTotalBytes, maxUserBytes, ttlMs } = this.configure();
+    const now = Date.now();
+    const byAccess = [...this.entries.values()].sort((a, b) => a.lastAccess - b.lastAccess);
+
+    for (const entry of byAccess) {
+      const expired = ttlMs > 0 && now - entry.createdAt > ttlMs;
+      const userOver = (this.userBytes.get(entry.userId) || 0) > maxUserBytes;
+      const totalOver = this.totalBytes > maxTotalBytes;
+      if (expired || userOver || totalOver) {
+        await this.evict(entry);
+      }
+    }
+
+    if (this.logLines > this.entries.size * 2 + 1000) {
+      await this.compact();
+    }
+  }
+
+  // Appends are serialized so lines never interleave. Followers hand records
+  // to the primary, which appends them for everyone.
+  private append(record: IndexRecord): void {
+    if (this.configure().follower) {
+      sendToPrimary('invoice-index', record);
+      return;
+    }
+    const line = JSON.stringify(record) + '\n';
+    this.logLines++;
+    this.logQueue = this.logQueue
+      .then(() => fs.promises.appendFile(this.indexPath, line))
+      .catch(error => logger.error('Invoice storage index write error', error));
+  }
+
+  // Rewrite the log as one 'put' per live entry (also persists lastAccess)
+  private compact(): Promise<void> {
+    if (this.configure().follower) {
+      return Promise.resolve();
+    }
+    this.logQueue = this.logQueue.then(async () => {
+      const lines = [...this.entries.values()].map(entry => JSON.stringify({ op: 'put', entry }) + '\n');
+      const tmpPath = `${this.indexPath}.tmp`;
+      await fs.promises.writeFile(tmpPath, lines.join(''));
+      await fs.promises.rename(tmpPath, this.indexPath);
+      this.logLines = lines.length;
+    }).catch(error => logger.error('Invoice storage index compaction error', error));
+    return this.logQueue;
+  }
+}
+
+const invoicesRoot = path.join(process.cwd(), 'invoices');
+
+// Backend chosen by INVOICE_STORAGE_BACKEND ('local' or 'object'); the index
+// always lives on local disk next to the invoices directory
+const createBackend = (): StorageBackend => {
+  if (process.env.INVOICE_STORAGE_BACKEND === 'object') {
+    const url = process.env.OBJECT_STORE_URL;
+    if (!url) {
+      throw new Error('OBJECT_STORE_URL is required for the object storage backend');
+    }
+    return new ObjectStoreBackend(
+      url.replace(/\/+$/, ''),
+      process.env.OBJECT_STORE_BUCKET || 'invoices',
+      process.env.OBJECT_STORE_TOKEN
+    );
+  }
+  return new LocalBackend(invoicesRoot);
+};
+
+let store: InvoiceStore | null = null;
+
+// Created on first use so environment variables from .env are in effect
+export const getInvoiceStore = (): InvoiceStore => {
+  if (!store) {
+    store = new InvoiceStore(createBackend(), path.join(invoicesRoot, '.index', 'index.jsonl'));
+  }
+  return store;
+};
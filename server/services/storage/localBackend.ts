@@ -0,0 +1,94 @@
+import fs from 'fs';
+import path from 'path';
+import { Readable } from 'stream';
+import { finished } from 'stream/promises';
+import { StorageBackend, StorageNotFoundError, StoredObject, WriteHandle } from './types.js';
+
+// Files under a local directory; writes go to a .part file that is renamed
+// into place so readers never see a partial PDF
+export class LocalBackend implements StorageBackend {
+  readonly name = 'local';
+
+  constructor(private root: string) {
+    fs.mkdirSync(root, { recursive: true });
+  }
+
+  async put(key: string, data: Buffer): Promise<void> {
+    const file = this.resolve(key);
+    await fs.promises.mkdir(path.dirname(file), { recursive: true });
+    await fs.promises.writeFile(`${file}.part`, data);
+    await fs.promises.rename(`${file}.part`, file);
+  }
+
+  async openWrite(key: string): Promise<WriteHandle> {
+    const file = this.resolve(key);
+    const partPath = `${file}.part`;
+    await fs.promises.mkdir(path.dirname(file), { recursive: true });
+    const stream = fs.createWriteStream(partPath);
+
+    return {
+      stream,
+      commit: async () => {
+        await finished(stream);
+        await fs.promises.rename(partPath, file);
+      },
+      abort: () => {
+        stream.destroy();
+        fs.promises.unlink(partPath).catch(() => {});
+      }
+    };
+  }
+
+  async read(key: string): Promise<Buffer> {
+    try {
+      return await fs.promises.readFile(this.resolve(key));
+    } catch (error: any) {
+      throw error.code === 'ENOENT' ? new StorageNotFoundError(key) : error;
+    }
+  }
+
+  async openRead(key: string): Promise<Readable> {
+    const file = this.resolve(key);
+    try {
+      await fs.promises.access(file);
+    } catch {
+      throw new StorageNotFoundError(key);
+    }
+    return fs.createReadStream(file);
+  }
+
+  async delete(key: string): Promise<void> {
+    await fs.promises.unlink(this.resolve(key)).catch((error: any) => {
+      if (error.code !== 'ENOENT') {
+        throw error;
+      }
+    });
+  }
+
+  async *list(): AsyncIterable<StoredObject> {
+    const walk = async function* (dir: string, prefix: string): AsyncGenerator<StoredObject> {
+      const entries = await fs.promises.readdir(dir, { withFileTypes: true }).catch(() => []);
+      for (const entry of entries) {
+        const key = prefix ? `${prefix}/${entry.name}` : entry.name;
+        if (entry.isDirectory()) {
+          yield* walk(path.join(dir, entry.name), key);
+        } else if (entry.isFile() && entry.name.endsWith('.pdf')) {
+          const stat = await fs.promises.stat(path.join(dir, entry.name)).catch(() => null);
+          if (stat) {
+            yield { key, size: stat.size, mtimeMs: stat.mtimeMs };
+          }
+        }
+      }
+    };
+    yield* walk(this.root, '');
+  }
+
+  // Keys must stay inside the root directory
+  private resolve(key: string): string {
+    const file = path.resolve(this.root, key);
+    if (!file.startsWith(path.resolve(this.root) + path.sep)) {
+      throw new Error(`Invalid storage key: ${key}`);
+    }
+    return file;
+  }
+}
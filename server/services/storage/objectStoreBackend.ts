@@ -0,0 +1,95 @@
+import { PassThrough, Readable } from 'stream';
+import { ReadableStream as WebReadableStream } from 'stream/web';
+import { StorageBackend, StorageNotFoundError, StoredObject, WriteHandle } from './types.js';
+
+// Object store reached over HTTP: PUT/GET/DELETE on <url>/<bucket>/<key> and a
+// JSON listing at GET <url>/<bucket>?list. An optional bearer token is sent
+// with every request. scripts/objectStoreStandIn.ts implements the same
+// protocol on the local filesystem for development and tests.
+export class ObjectStoreBackend implements StorageBackend {
+  readonly name = 'object';
+
+  constructor(private baseUrl: string, private bucket: string, private token?: string) {}
+
+  async put(key: string, data: Buffer): Promise<void> {
+    const response = await fetch(this.url(key), {
+      method: 'PUT',
+      headers: this.headers({ 'Content-Type': 'application/pdf' }),
+      body: data
+    });
+    await this.check(response, key);
+  }
+
+  async openWrite(key: string): Promise<WriteHandle> {
+    const stream = new PassThrough();
+    const controller = new AbortController();
+
+    // Stream the request body as it is written; the upload finishes once the
+    // caller ends the stream
+    const upload = fetch(this.url(key), {
+      method: 'PUT',
+      headers: this.headers({ 'Content-Type': 'application/pdf' }),
+      body: Readable.toWeb(stream) as unknown as BodyInit,
+      signal: controller.signal,
+      duplex: 'half'
+    } as RequestInit);
+    upload.catch(() => {});
+
+    return {
+      stream,
+      commit: async () => {
+        await this.check(await upload, key);
+      },
+      abort: () => {
+        controller.abort();
+        stream.destroy();
+      }
+    };
+  }
+
+  async read(key: string): Promise<Buffer> {
+    const response = await fetch(this.url(key), { headers: this.headers() });
+    await this.check(response, key);
+    return Buffer.from(await response.arrayBuffer());
+  }
+
+  async openRead(key: string): Promise<Readable> {
+    const response = await fetch(this.url(key), { headers: this.headers() });
+    await this.check(response, key);
+    return Readable.fromWeb(response.body as unknown as WebReadableStream<Uint8Array>);
+  }
+
+  async delete(key: string): Promise<void> {
+    const response = await fetch(this.url(key), { method: 'DELETE', headers: this.headers() });
+    if (response.status !== 404) {
+      await this.check(response, key);
+    }
+  }
+
+  async *list(): AsyncIterable<StoredObject> {
+    const response = await fetch(`${this.baseUrl}/${encodeURIComponent(this.bucket)}?list`, {
+      headers: this.headers()
+    });
+    await this.check(response, '');
+    const objects = (await response.json()) as StoredObject[];
+    yield* objects;
+  }
+
+  private url(key: string): string {
+    const encodedKey = key.split('/').map(encodeURIComponent).join('/');
+    return `${this.baseUrl}/${encodeURIComponent(this.bucket)}/${encodedKey}`;
+  }
+
+  private headers(extra: Record<string, string> = {}): Record<string, string> {
+    return this.token ? { ...extra, Authorization: `Bearer ${this.token}` } : extra;
+  }
+
+  private async check(response: Response, key: string): Promise<void> {
+    if (response.status === 404) {
+      throw new StorageNotFoundError(key);
+    }
+    if (!response.ok) {
+      throw new Error(`Object store request for "${key}" failed with status ${response.status}`);
+    }
+  }
+}
@@ -0,0 +1,42 @@
+import { Readable, Writable } from 'stream';
+
+export interface StoredObject {
+  key: string;
+  size: number;
+  mtimeMs: number;
+}
+
+// In-progress upload. The caller writes and ends the stream, then commits;
+// abort() discards whatever was written.
+export interface WriteHandle {
+  stream: Writable;
+  commit(): Promise<void>;
+  abort(): void;
+}
+
+// Where invoice files physically live. Keys are '/'-separated relative paths.
+export interface StorageBackend {
+  readonly name: string;
+  put(key: string, data: Buffer): Promise<void>;
+  openWrite(key: string): Promise<WriteHandle>;
+  read(key: string): Promise<Buffer>;
+  openRead(key: string): Promise<Readable>;
+  delete(key: string): Promise<void>;
+  list(): AsyncIterable<StoredObject>;
+}
+
+// Object no longer exists in the backend
+export class StorageNotFoundError extends Error {
+  constructor(key: string) {
+    super(`Stored object not found: ${key}`);
+    this.name = 'StorageNotFoundError';
+  }
+}
+
+// An invoice number already holds a file rendered from different content
+export class InvoiceNumberTakenError extends Error {
+  constructor(userId: string, invoiceNumber: string) {
+    super(`Invoice ${invoiceNumber} of user ${userId} is already stored with different content`);
+    this.name = 'InvoiceNumberTakenError';
+  }
+}
@@ -0,0 +1,196 @@
+import crypto from 'crypto';
+
+// Small logic-less template language, compiled once into a JavaScript render
+// function:
+//   {{path}}            HTML-escaped value (dot paths, `this` for the current item)
+//   {{{path}}}          raw value
+//   {{money path}}      number formatted with two decimals
+//   {{#each path}}...{{/each}}   repeat for every item of an array
+// Inside {{#each}}, names resolve against the current item first and then
+// the outer scopes. Static text is embedded as string constants in the
+// generated code.
+
+const escapeTest = /["&'<>]/;
+
+// Escape in a single pass, only once a character that needs it is found
+export const escapeHtml = (value: string): string => {
+  const first = escapeTest.exec(value);
+  if (!first) {
+    return value;
+  }
+
+  let out = '';
+  let last = 0;
+  for (let i = first.index; i < value.length; i++) {
+    let entity: string;
+    switch (value.charCodeAt(i)) {
+      case 34: entity = '&quot;'; break;
+      case 38: entity = '&amp;'; break;
+      case 39: entity = '&#39;'; break;
+      case 60: entity = '&lt;'; break;
+      case 62: entity = '&gt;'; break;
+      default: continue;
+    }
+    out += value.slice(last, i) + entity;
+    last = i + 1;
+  }
+  return out + value.slice(last);
+};
+
+// Template source could not be parsed
+export class TemplateSyntaxError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = 'TemplateSyntaxError';
+  }
+}
+
+const helpers = {
+  money: (value: any): string => (Number(value) || 0).toFixed(2)
+};
+
+const escapeValue = (value: any): string => {
+  if (typeof value === 'string') {
+    return escapeHtml(value);
+  }
+  if (typeof value === 'number') {
+    return String(value);
+  }
+  return value == null ? '' : escapeHtml(String(value));
+};
+
+const runtime = {
+  escape: escapeValue,
+  raw: (value: any): string => (value == null ? '' : String(value)),
+  helpers
+};
+
+const tagPattern = /\{\{\{\s*([\w.]+)\s*\}\}\}|\{\{\s*([#/]?)(\w+)(?:\s+([\w.]+))?\s*\}\}/g;
+
+// JavaScript expression reading a dot path, trying inner scopes first
+const pathExpression = (path: string, scopes: string[]): string => {
+  if (path === 'this') {
+    return scopes[scopes.length - 1];
+  }
+  const [head, ...rest] = path.split('.');
+  const tail = rest.map(key => `?.[${JSON.stringify(key)}]`).join('');
+  const key = JSON.stringify(head);
+
+  let expression = `${scopes[0]}?.[${key}]${tail}`;
+  for (let i = 1; i < scopes.length; i++) {
+    const scope = scopes[i];
+    expression = `(${scope} != null && ${scope}[${key}] !== undefined ? ${scope}[${key}]${tail} : ${expression})`;
+  }
+  return expression;
+};
+
+// Translate the template body into the statements of a render function
+const generate = (name: string, source: string): string => {
+  const lines: string[] = [];
+  const scopes = ['data'];
+  const blocks: string[] = [];
+  let cursor = 0;
+
+  const addText = (text: string) => {
+    if (text) {
+      lines.push(`out += ${JSON.stringify(text)};`);
+    }
+  };
+
+  for (const match of source.matchAll(tagPattern)) {
+    addText(source.slice(cursor, match.index));
+    cursor = (match.index as number) + match[0].length;
+
+    if (match[1]) {
+      lines.push(`out += raw(${pathExpression(match[1], scopes)});`);
+      continue;
+    }
+
+    const [, , sigil, tag, argument] = match;
+
+    if (sigil === '#') {
+      if (tag !== 'each' || !argument) {
+        throw new TemplateSyntaxError(`Unknown block {{#${tag}}} in template "${name}"`);
+      }
+      const depth = scopes.length;
+      lines.push(
+        `{ const list${depth} = ${pathExpression(argument, scopes)};`,
+        `if (Array.isArray(list${depth})) for (let i${depth} = 0; i${depth} < list${depth}.length; i${depth}++) {`,
+        `const item${depth} = list${depth}[i${depth}];`
+      );
+      scopes.push(`item${depth}`);
+      blocks.push(tag);
+    } else if (sigil === '/') {
+      if (blocks.pop() !== tag) {
+        throw new TemplateSyntaxError(`Unexpected {{/${tag}}} in template "${name}"`);
+      }
+      scopes.pop();
+      lines.push('} }');
+    } else if (argument) {
+      if (!(tag in helpers)) {
+        throw new TemplateSyntaxError(`Unknown helper "${tag}" in template "${name}"`);
+      }
+      lines.push(`out += escape(helpers.${tag}(${pathExpression(argument, scopes)}));`);
+    } else {
+      lines.push(`out += escape(${pathExpression(tag, scopes)});`);
+    }
+  }
+
+  if (blocks.length > 0) {
+    throw new TemplateSyntaxError(`Unclosed {{#${blocks[blocks.length - 1]}}} in template "${name}"`);
+  }
+  addText(source.slice(cursor));
+
+  return lines.join('\n');
+};
+
+export interface CompiledTemplate {
+  name: string;
+  // Short hash of the source; changes whenever the template does
+  version: string;
+  // Static <head> and empty <body> that pooled pages preload
+  baseDocument: string;
+  // Render the <body> contents for the given data
+  renderBody(data: any): string;
+  // Render the full standalone document
+  render(data: any): string;
+}
+
+// Compile a full HTML document. Everything outside <body>...</body> is static
+// and precomputed; only the body is rendered per call.
+export const compileTemplate = (name: string, source: string): CompiledTemplate => {
+  const bodyOpen = /<body[^>]*>/i.exec(source);
+  const bodyClose = source.search(/<\/body>/i);
+
+  let prefix = '<!DOCTYPE html>\n<html>\n<head>\n  <meta charset="utf-8">\n</head>\n<body>';
+  let suffix = '</body>\n</html>';
+  let bodySource = source;
+
+  if (bodyOpen && bodyClose > bodyOpen.index) {
+    prefix = source.slice(0, bodyOpen.index + bodyOpen[0].length);
+    bodySource = source.slice(bodyOpen.index + bodyOpen[0].length, bodyClose);
+    suffix = source.slice(bodyClose);
+  }
+
+  const staticTag = new RegExp(tagPattern.source);
+  if (staticTag.test(prefix) || staticTag.test(suffix)) {
+    throw new TemplateSyntaxError(`Template "${name}" may only use tags inside <body>`);
+  }
+
+  // Only static strings and validated identifiers reach the generated code
+  const factory = new Function(
+    'escape',
+    'raw',
+    'helpers',
+    `return function render(data) {\nlet out = '';\n${generate(name, bodySource)}\nreturn out;\n};`
+  );
+  const renderBody = factory(runtime.escape, runtime.raw, runtime.helpers) as (data: any) => string;
+
+  return {
+    name,
+    version: crypto.createHash('sha256').update(source).digest('hex').slice(0, 12),
+    baseDocument: prefix + suffix,
+    renderBody,
+    render: data => prefix + renderBody(data) + suffix
+  };
+};
@@ -0,0 +1,183 @@
+export interface InvoiceProduct {
+  name: string;
+  qty: number;
+  rate: number;
+  total: number;
+}
+
+export interface InvoiceData {
+  invoiceNumber: string;
+  date: string;
+  companyName: string;
+  companyAddress: string;
+  clientName: string;
+  clientAddress: string;
+  products: InvoiceProduct[];
+  subtotal: number;
+  tax: number;
+  total: number;
+}
+
+// Built-in invoice template, used unless PDF_TEMPLATE_DIR provides invoice.html.
+// See templates/engine.ts for the tag syntax.
+export const invoiceTemplateSource = `<!DOCTYPE html>
+<html>
+<head>
+  <meta charset="utf-8">
+  <style>
+    body {
+      font-family: Arial, sans-serif;
+      margin: 0;
+      padding: 20px;
+      color: #333;
+    }
+    .header {
+      display: flex;
+      justify-content: space-between;
+      align-items: center;
+      margin-bottom: 30px;
+      border-bottom: 2px solid #007bff;
+      padding-bottom: 20px;
+    }
+    .logo {
+      font-size: 24px;
+      font-weight: bold;
+      color: #007bff;
+    }
+    .invoice-info {
+      text-align: right;
+    }
+    .invoice-number {
+      font-size: 18px;
+      font-weight: bold;
+      margin-bottom: 5px;
+    }
+    .date {
+      color: #666;
+    }
+    .addresses {
+      display: flex;
+      justify-content: space-between;
+      margin-bottom: 30px;
+    }
+    .address-block {
+      width: 45%;
+    }
+    .address-title {
+      font-weight: bold;
+      margin-bottom: 10px;
+      color: #007bff;
+    }
+    .address-content {
+      white-space: pre-line;
+      line-height: 1.4;
+    }
+    .products-table {
+      width: 100%;
+      border-collapse: collapse;
+      margin-bottom: 30px;
+    }
+    .products-table th,
+    .products-table td {
+      border: 1px solid #ddd;
+      padding: 12px;
+      text-align: left;
+    }
+    .products-table th {
+      background-color: #007bff;
+      color: white;
+      font-weight: bold;
+    }
+    .products-table tr:nth-child(even) {
+      background-color: #f9f9f9;
+    }
+    .text-right {
+      text-align: right;
+    }
+    .totals {
+      width: 300px;
+      margin-left: auto;
+      border-collapse: collapse;
+    }
+    .totals td {
+      padding: 8px 12px;
+      border-bottom: 1px solid #ddd;
+    }
+    .totals .total-row {
+      font-weight: bold;
+      background-color: #007bff;
+      color: white;
+    }
+    .footer {
+      margin-top: 50px;
+      text-align: center;
+      color: #666;
+      font-size: 12px;
+    }
+  </style>
+</head>
+<body>
+  <div class="header">
+    <div class="logo">📄 INVOICE GENERATOR</div>
+    <div class="invoice-info">
+      <div class="invoice-number">{{invoiceNumber}}</div>
+      <div class="date">{{date}}</div>
+    </div>
+  </div>
+
+  <div class="addresses">
+    <div class="address-block">
+      <div class="address-title">From:</div>
+      <div class="address-content">{{companyName}}
+{{companyAddress}}</div>
+    </div>
+    <div class="address-block">
+      <div class="address-title">To:</div>
+      <div class="address-content">{{clientName}}
+{{clientAddress}}</div>
+    </div>
+  </div>
+
+  <table class="products-table">
+    <thead>
+      <tr>
+        <th>Product Name</th>
+        <th class="text-right">Quantity</th>
+        <th class="text-right">Rate</th>
+        <th class="text-right">Total</th>
+      </tr>
+    </thead>
+    <tbody>
+      {{#each products}}
+        <tr>
+          <td>{{name}}</td>
+          <td class="text-right">{{qty}}</td>
+          <td class="text-right">\${{money rate}}</td>
+          <td class="text-right">\${{money total}}</td>
+        </tr>
+      {{/each}}
+    </tbody>
+  </table>
+
+  <table class="totals">
+    <tr>
+      <td>Subtotal:</td>
+      <td class="text-right">\${{money subtotal}}</td>
+    </tr>
+    <tr>
+      <td>Tax (10%):</td>
+      <td class="text-right">\${{money tax}}</td>
+    </tr>
+    <tr class="total-row">
+      <td>Total:</td>
+      <td class="text-right">\${{money total}}</td>
+    </tr>
+  </table>
+
+  <div class="footer">
+    <p>Thank you for your business!</p>
+    <p>Generated on {{generatedAt}}</p>
+  </div>
+</body>
+</html>
+`;
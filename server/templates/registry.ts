@@ -0,0 +1,42 @@
+import fs from 'fs';
+import path from 'path';
+import { CompiledTemplate, compileTemplate } from './engine.js';
+import { invoiceTemplateSource } from './invoice.js';
+
+const builtInTemplates: Record<string, string> = {
+  invoice: invoiceTemplateSource
+};
+
+const compiled = new Map<string, CompiledTemplate>();
+
+// Compile every template once. Files named <template>.html in PDF_TEMPLATE_DIR
+// replace the built-in template of the same name, so layouts can be swapped
+// without code changes.
+export const loadTemplates = (): void => {
+  const sources = { ...builtInTemplates };
+  const dir = process.env.PDF_TEMPLATE_DIR;
+
+  if (dir) {
+    for (const file of fs.readdirSync(dir)) {
+      if (file.endsWith('.html')) {
+        sources[path.basename(file, '.html')] = fs.readFileSync(path.join(dir, file), 'utf8');
+      }
+    }
+  }
+
+  compiled.clear();
+  for (const [name, source] of Object.entries(sources)) {
+    compiled.set(name, compileTemplate(name, source));
+  }
+};
+
+export const getTemplate = (name = 'invoice'): CompiledTemplate => {
+  if (compiled.size === 0) {
+    loadTemplates();
+  }
+  const template = compiled.get(name);
+  if (!template) {
+    throw new Error(`Unknown template "${name}"`);
+  }
+  return template;
+};
@@ -0,0 +1,69 @@
+import cluster from 'cluster';
+import logger from './logger.js';
+
+// Messages between API workers and the cluster primary (server/cluster.ts).
+// 'broadcast' is relayed to every other worker; 'primary' is handled by the
+// primary itself.
+export type ClusterMessage = {
+  bus: 'broadcast' | 'primary';
+  channel: string;
+  payload?: any;
+};
+
+type Handler = (payload: any) => void;
+
+const handlers = new Map<string, Handler[]>();
+let listening = false;
+
+// True in API workers forked by server/cluster.ts
+export const isClusterWorker = (): boolean => cluster.isWorker && !!process.env.CLUSTER_WORKER_COUNT;
+
+export const clusterSize = (): number =>
+  isClusterWorker() ? Math.max(1, parseInt(process.env.CLUSTER_WORKER_COUNT || '1', 10) || 1) : 1;
+
+// This worker's share of a machine-wide budget (cores, threads), at least 1
+export const workerShare = (total: number): number => Math.max(1, Math.floor(total / clusterSize()));
+
+const send = (message: ClusterMessage) => {
+  if (isClusterWorker() && process.send) {
+    process.send(message);
+  }
+};
+
+// Tell the other workers; no-op outside cluster mode
+export const broadcast = (channel: string, payload?: any): void => {
+  send({ bus: 'broadcast', channel, payload });
+};
+
+export const sendToPrimary = (channel: string, payload?: any): void => {
+  send({ bus: 'primary', channel, payload });
+};
+
+// Receive broadcasts from other workers and messages from the primary
+export const onClusterMessage = (channel: string, handler: Handler): void => {
+  if (!isClusterWorker()) {
+    return;
+  }
+  const existing = handlers.get(channel);
+  if (existing) {
+    existing.push(handler);
+  } else {
+    handlers.set(channel, [handler]);
+  }
+
+  if (!listening) {
+    listening = true;
+    process.on('message', (message: ClusterMessage) => {
+      if (!message || typeof message.channel !== 'string') {
+        return;
+      }
+      for (const registered of handlers.get(message.channel) || []) {
+        try {
+          registered(message.payload);
+        } catch (error) {
+          logger.error('Cluster message handler error', { channel: message.channel, err: error });
+        }
+      }
+    });
+  }
+};
@@ -0,0 +1,45 @@
+// Opaque keyset pagination cursors. A cursor carries the sort key values of
+// the last item on a page; the next page starts strictly after them.
+
+// Cursor token could not be decoded
+export class CursorError extends Error {
+  constructor(message = 'Invalid cursor') {
+    super(message);
+    this.name = 'CursorError';
+  }
+}
+
+export const encodeCursor = (values: Array<string | number>): string =>
+  Buffer.from(JSON.stringify(values)).toString('base64url');
+
+export const decodeCursor = (token: string, length: number): Array<string | number> => {
+  let values: unknown;
+  try {
+    values = JSON.parse(Buffer.from(token, 'base64url').toString('utf8'));
+  } catch {
+    throw new CursorError();
+  }
+  if (
+    !Array.isArray(values) ||
+    values.length !== length ||
+    !values.every(value => typeof value === 'string' || typeof value === 'number')
+  ) {
+    throw new CursorError();
+  }
+  return values;
+};
+
+// Cursor for a keyset on (sort value, id), ids being 24-character hex strings
+export const decodeKeyCursor = (token: string, valueType: 'string' | 'number'): { value: string | number; id: string } => {
+  const [value, id] = decodeCursor(token, 2);
+  if (typeof value !== valueType || typeof id !== 'string' || !/^[0-9a-f]{24}$/i.test(id)) {
+    throw new CursorError();
+  }
+  return { value, id };
+};
+
+// Page size from ?limit=, clamped to [1, max]
+export const parseLimit = (value: unknown, fallback: number, max: number): number => {
+  const limit = parseInt(String(value ?? ''), 10);
+  return Math.min(max, Math.max(1, Number.isFinite(limit) ? limit : fallback));
+};
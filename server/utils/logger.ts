@@ -0,0 +1,278 @@
+import { AsyncLocalStorage } from 'async_hooks';
+import fs from 'fs';
+
+export type LogLevel = 'debug' | 'info' | 'warn' | 'error';
+
+export interface LoggerOptions {
+  level: LogLevel | 'silent';
+  // Fraction of requests whose info/debug lines are kept, by route prefix
+  // ('GET /api/products' or '/api/pdf'); warnings and errors are never sampled
+  sampleRates: Record<string, number>;
+  defaultSampleRate: number;
+  // Lines are batched and written once this many bytes are buffered, or after flushIntervalMs
+  flushBytes: number;
+  flushIntervalMs: number;
+  // Lines beyond this are dropped (and counted) while the output is backed up
+  maxBufferBytes: number;
+  // Fields whose name contains one of these (case-insensitive) are written as [Redacted]
+  redactKeys: string[];
+  stream: NodeJS.WritableStream;
+}
+
+// Per-request state carried through async calls by AsyncLocalStorage
+export interface LogContext {
+  requestId: string;
+  sampled: boolean;
+}
+
+const LEVELS: Record<LogLevel | 'silent', number> = { debug: 10, info: 20, warn: 30, error: 40, silent: 100 };
+
+const REDACTED = '[Redacted]';
+
+// "GET /api/products=0.05,/api/pdf=1"
+const parseSampleRates = (value: string): Record<string, number> => {
+  const rates: Record<string, number> = {};
+  for (const entry of value.split(',')) {
+    const separator = entry.lastIndexOf('=');
+    if (separator === -1) {
+      continue;
+    }
+    const rate = parseFloat(entry.slice(separator + 1));
+    const route = entry.slice(0, separator).trim().replace(/\s+/, ' ');
+    if (route && !Number.isNaN(rate)) {
+      rates[route] = Math.min(1, Math.max(0, rate));
+    }
+  }
+  return rates;
+};
+
+const optionsFromEnv = (): LoggerOptions => ({
+  level: (process.env.LOG_LEVEL as LogLevel) in LEVELS ? process.env.LOG_LEVEL as LogLevel : 'info',
+  sampleRates: parseSampleRates(process.env.LOG_SAMPLE_RATES || ''),
+  defaultSampleRate: parseFloat(process.env.LOG_SAMPLE_RATE || '1'),
+  flushBytes: parseInt(process.env.LOG_FLUSH_BYTES || '16384', 10),
+  flushIntervalMs: parseInt(process.env.LOG_FLUSH_MS || '100', 10),
+  maxBufferBytes: parseInt(process.env.LOG_MAX_BUFFER_BYTES || '1048576', 10),
+  redactKeys: (process.env.LOG_REDACT_KEYS || 'authorization,cookie,password,token,secret,jwt')
+    .split(',').map(key => key.trim().toLowerCase()).filter(Boolean),
+  stream: process.stdout
+});
+
+const context = new AsyncLocalStorage<LogContext>();
+
+// The request context of the current call, if any
+export const logContext = (): LogContext | undefined => context.getStore();
+
+export const withLogContext = <T>(store: LogContext, fn: () => T): T => context.run(store, fn);
+
+// Leveled JSON-lines logger. A call below the level, or an info/debug call
+// in a request that was not sampled, returns before building anything.
+// Lines are buffered and written in batches from a timer, so request
+// handlers never wait on stdout and a burst costs one write per batch.
+// Secrets are redacted by field name, and bearer tokens inside messages.
+export class Logger {
+  private buffer: string[] = [];
+  private bufferedBytes = 0;
+  private timer: NodeJS.Timeout | null = null;
+  private flushQueued = false;
+  private waitingForDrain = false;
+  private options: LoggerOptions | null = null;
+  private counters = { written: 0, dropped: 0, flushes: 0 };
+
+  constructor(private overrides: Partial<LoggerOptions> = {}) {
+    process.once('exit', () => this.flushSync());
+  }
+
+  debug(message: string, detail?: unknown): void {
+    this.log('debug', message, detail);
+  }
+
+  info(message: string, detail?: unknown): void {
+    this.log('info', message, detail);
+  }
+
+  warn(message: string, detail?: unknown): void {
+    this.log('warn', message, detail);
+  }
+
+  // detail is a caught error or an object of extra fields
+  error(message: string, detail?: unknown): void {
+    this.log('error', message, detail);
+  }
+
+  enabled(level: LogLevel): boolean {
+    if (LEVELS[level] < LEVELS[this.configure().level]) {
+      return false;
+    }
+    const store = context.getStore();
+    return !store || store.sampled || LEVELS[level] >= LEVELS.warn;
+  }
+
+  // Decide whether a request's info/debug lines are kept; the longest
+  // matching route prefix wins
+  sampleRequest(method: string, path: string): boolean {
+    const { sampleRates, defaultSampleRate } = this.configure();
+    let rate = defaultSampleRate;
+    let matched = -1;
+    for (const route in sampleRates) {
+      const spaced = route.indexOf(' ');
+      const routeMethod = spaced === -1 ? null : route.slice(0, spaced);
+      const prefix = spaced === -1 ? route : route.slice(spaced + 1);
+      if ((!routeMethod || routeMethod === method) && path.startsWith(prefix) && route.length > matched) {
+        rate = sampleRates[route];
+        matched = route.length;
+      }
+    }
+    return rate >= 1 || (rate > 0 && Math.random() < rate);
+  }
+
+  log(level: LogLevel, message: string, detail?: unknown): void {
+    if (!this.enabled(level)) {
+      return;
+    }
+
+    const store = context.getStore();
+    const entry: Record<string, unknown> = {
+      time: Date.now(),
+      level,
+      pid: process.pid,
+      msg: message.replace(/Bearer\s+[\w.~+/=-]+/gi, `Bearer ${REDACTED}`)
+    };
+    if (store) {
+      entry.requestId = store.requestId;
+    }
+    if (detail instanceof Error) {
+      entry.err = detail;
+    } else if (detail && typeof detail === 'object' && !Array.isArray(detail)) {
+      Object.assign(entry, detail);
+    } else if (detail !== undefined) {
+      entry.detail = detail;
+    }
+
+    this.write(`${this.serialize(entry)}\n`, level === 'error');
+  }
+
+  // Write out everything buffered; used at exit, when async writes would be lost
+  flushSync(): void {
+    if (this.buffer.length === 0) {
+      return;
+    }
+    const chunk = this.take();
+    const { stream } = this.configure();
+    try {
+      if (stream === process.stdout) {
+        fs.writeSync(1, chunk);
+      } else {
+        stream.write(chunk);
+      }
+    } catch {
+      // Nothing left to report to
+    }
+  }
+
+  stats() {
+    return {
+      level: this.configure().level,
+      ...this.counters,
+      bufferedLines: this.buffer.length,
+      bufferedBytes: this.bufferedBytes
+    };
+  }
+
+  private serialize(entry: Record<string, unknown>): string {
+    const { redactKeys } = this.configure();
+    const seen = new WeakSet<object>();
+    return JSON.stringify(entry, (key, value) => {
+      if (key && redactKeys.some(secret => key.toLowerCase().includes(secret))) {
+        return REDACTED;
+      }
+      if (value instanceof Error) {
+        const error: any = value;
+        return {
+          name: error.name,
+          message: error.message,
+          ...(error.code !== undefined && { code: error.code }),
+          stack: error.stack
+        };
+      }
+      if (typeof value === 'bigint') {
+        return value.toString();
+      }
+      if (value && typeof value === 'object') {
+        if (seen.has(value)) {
+          return '[Circular]';
+        }
+        seen.add(value);
+      }
+      return value;
+    });
+  }
+
+  private write(line: string, urgent: boolean): void {
+    const { flushBytes, flushIntervalMs, maxBufferBytes } = this.configure();
+    if (this.bufferedBytes + line.length > maxBufferBytes) {
+      this.counters.dropped++;
+      return;
+    }
+    this.buffer.push(line);
+    this.bufferedBytes += line.length;
+    this.counters.written++;
+
+    if (this.waitingForDrain) {
+      return;
+    }
+    // Errors and full buffers go out on the next turn of the event loop
+    if (urgent || this.bufferedBytes >= flushBytes || flushIntervalMs <= 0) {
+      if (!this.flushQueued) {
+        this.flushQueued = true;
+        setImmediate(() => {
+          this.flushQueued = false;
+          this.flush();
+        });
+      }
+    } else if (!this.timer) {
+      this.timer = setTimeout(() => {
+        this.timer = null;
+        this.flush();
+      }, flushIntervalMs);
+      this.timer.unref();
+    }
+  }
+
+  private flush(): void {
+    if (this.waitingForDrain || this.buffer.length === 0) {
+      return;
+    }
+    const { stream } = this.configure();
+    this.counters.flushes++;
+    if (!stream.write(this.take())) {
+      this.waitingForDrain = true;
+      stream.once('drain', () => {
+        this.waitingForDrain = false;
+        this.flush();
+      });
+    }
+  }
+
+  private take(): string {
+    if (this.timer) {
+      clearTimeout(this.timer);
+      this.timer = null;
+    }
+    const chunk = this.buffer.join('');
+    this.buffer = [];
+    this.bufferedBytes = 0;
+    return chunk;
+  }
+
+  private configure(): LoggerOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const logger = new Logger();
+
+export default logger;
@@ -0,0 +1,214 @@
+import { isClusterWorker } from './cluster.js';
+
+export type Labels = Record<string, string | number>;
+
+export type MetricType = 'counter' | 'gauge' | 'histogram';
+
+// One value of a callback metric
+export interface Sample {
+  labels?: Labels;
+  value: number;
+}
+
+export type Collector = () => number | Sample[] | Promise<number | Sample[]>;
+
+export interface HistogramOptions {
+  labels?: string[];
+  // Upper bounds in seconds (or the metric's unit), ascending
+  buckets?: number[];
+}
+
+interface Metric {
+  name: string;
+  help: string;
+  type: MetricType;
+  lines(): Promise<string[]>;
+}
+
+const DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30];
+
+const escapeLabel = (value: string | number): string =>
+  String(value).replace(/\\/g, '\\\\').replace(/\n/g, '\\n').replace(/"/g, '\\"');
+
+const formatLabels = (labels: Labels): string => {
+  const pairs = Object.keys(labels).map(name => `${name}="${escapeLabel(labels[name])}"`);
+  return pairs.length ? `{${pairs.join(',')}}` : '';
+};
+
+const formatValue = (value: number): string =>
+  Number.isFinite(value) ? String(value) : value > 0 ? '+Inf' : value < 0 ? '-Inf' : 'NaN';
+
+// In cluster mode every API worker serves its own /metrics; tag its series
+const baseLabels = (): Labels =>
+  isClusterWorker() ? { worker: process.env.CLUSTER_WORKER_INDEX || '0' } : {};
+
+interface Series<T> {
+  labels: Labels;
+  data: T;
+}
+
+// Series keyed by their label values, in the order of the declared names
+class LabeledSeries<T> {
+  private series = new Map<string, Series<T>>();
+
+  constructor(private labelNames: string[], private create: () => T) {}
+
+  get(labels: Labels = {}): T {
+    const key = this.labelNames.map(name => labels[name] ?? '').join('\u0001');
+    let entry = this.series.get(key);
+    if (!entry) {
+      const picked: Labels = {};
+      for (const name of this.labelNames) {
+        picked[name] = labels[name] ?? '';
+      }
+      entry = { labels: picked, data: this.create() };
+      this.series.set(key, entry);
+    }
+    return entry.data;
+  }
+
+  entries(): Series<T>[] {
+    return [...this.series.values()];
+  }
+}
+
+export class Counter implements Metric {
+  readonly type = 'counter';
+  private values: LabeledSeries<{ value: number }>;
+
+  constructor(readonly name: string, readonly help: string, labelNames: string[] = []) {
+    this.values = new LabeledSeries(labelNames, () => ({ value: 0 }));
+  }
+
+  inc(labels?: Labels, amount = 1): void {
+    this.values.get(labels).value += amount;
+  }
+
+  async lines(): Promise<string[]> {
+    const base = baseLabels();
+    return this.values.entries().map(({ labels, data }) =>
+      `${this.name}${formatLabels({ ...base, ...labels })} ${formatValue(data.value)}`);
+  }
+}
+
+export class Histogram implements Metric {
+  readonly type = 'histogram';
+  private buckets: number[];
+  private values: LabeledSeries<{ counts: number[]; sum: number; count: number }>;
+
+  constructor(readonly name: string, readonly help: string, options: HistogramOptions = {}) {
+    this.buckets = options.buckets || DEFAULT_BUCKETS;
+    this.values = new LabeledSeries(options.labels || [], () => ({
+      counts: new Array(this.buckets.length).fill(0),
+      sum: 0,
+      count: 0
+    }));
+  }
+
+  observe(value: number, labels?: Labels): void {
+    const series = this.values.get(labels);
+    // Counts are per bucket here and made cumulative when rendered
+    const index = this.buckets.findIndex(bound => value <= bound);
+    if (index !== -1) {
+      series.counts[index]++;
+    }
+    series.sum += value;
+    series.count++;
+  }
+
+  // Observe the time since `started` (a Date.now() value) in seconds
+  observeSince(started: number, labels?: Labels): void {
+    this.observe((Date.now() - started) / 1000, labels);
+  }
+
+  async lines(): Promise<string[]> {
+    const base = baseLabels();
+    const lines: string[] = [];
+    for (const { labels, data } of this.values.entries()) {
+      const all = { ...base, ...labels };
+      let cumulative = 0;
+      this.buckets.forEach((bound, index) => {
+        cumulative += data.counts[index];
+        lines.push(`${this.name}_bucket${formatLabels({ ...all, le: bound })} ${cumulative}`);
+      });
+      lines.push(`${this.name}_bucket${formatLabels({ ...all, le: '+Inf' })} ${data.count}`);
+      lines.push(`${this.name}_sum${formatLabels(all)} ${formatValue(data.sum)}`);
+      lines.push(`${this.name}_count${formatLabels(all)} ${data.count}`);
+    }
+    return lines;
+  }
+}
+
+// A gauge or counter whose value is read from its owner at scrape time
+class CallbackMetric implements Metric {
+  constructor(
+    readonly name: string,
+    readonly help: string,
+    readonly type: MetricType,
+    private collect: Collector
+  ) {}
+
+  async lines(): Promise<string[]> {
+    const base = baseLabels();
+    const collected = await this.collect();
+    const samples = typeof collected === 'number' ? [{ value: collected }] : collected;
+    return samples.map(sample =>
+      `${this.name}${formatLabels({ ...base, ...sample.labels })} ${formatValue(sample.value)}`);
+  }
+}
+
+// Process-wide metric registry rendered in the Prometheus text format.
+// Request-path metrics (counters, histograms) are updated in place; pool and
+// queue figures are registered as callbacks that read the owner's stats()
+// when /metrics is scraped, so they cost nothing between scrapes.
+export class MetricsRegistry {
+  private metrics = new Map<string, Metric>();
+
+  counter(name: string, help: string, labelNames: string[] = []): Counter {
+    return this.register(new Counter(name, help, labelNames));
+  }
+
+  histogram(name: string, help: string, options: HistogramOptions = {}): Histogram {
+    return this.register(new Histogram(name, help, options));
+  }
+
+  gauge(name: string, help: string, collect: Collector): void {
+    this.register(new CallbackMetric(name, help, 'gauge', collect));
+  }
+
+  // A counter kept by its owner (a stats() field) rather than by the registry
+  counterFrom(name: string, help: string, collect: Collector): void {
+    this.register(new CallbackMetric(name, help, 'counter', collect));
+  }
+
+  // A failing collector drops its metric from the scrape instead of failing it
+  async render(): Promise<string> {
+    const blocks = await Promise.all([...this.metrics.values()].map(async metric => {
+      let lines: string[];
+      try {
+        lines = await metric.lines();
+      } catch {
+        return '';
+      }
+      if (lines.length === 0) {
+        return '';
+      }
+      return [`# HELP ${metric.name} ${metric.help}`, `# TYPE ${metric.name} ${metric.type}`, ...lines].join('\n') + '\n';
+    }));
+    return blocks.join('');
+  }
+
+  // Modules register at import; re-registering returns the existing metric
+  private register<T extends Metric>(metric: T): T {
+    const existing = this.metrics.get(metric.name);
+    if (existing) {
+      return existing as T;
+    }
+    this.metrics.set(metric.name, metric);
+    return metric;
+  }
+}
+
+const metrics = new MetricsRegistry();
+
+export default metrics;
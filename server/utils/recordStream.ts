@@ -0,0 +1,286 @@
+import { Request } from 'express';
+
+// Request body was not a well-formed record stream
+export class RecordParseError extends Error {
+  constructor(message: string) {
+    super(message);
+    this.name = 'RecordParseError';
+  }
+}
+
+// Routes whose bodies are read incrementally by readRecords(); the global
+// JSON body parser skips them so large uploads are never buffered whole.
+export const streamedBodyRoutes = new Set<string>(['POST /api/pdf/batch', 'POST /api/products/bulk']);
+
+export const isStreamedBodyRoute = (method: string | undefined, url: string | undefined): boolean =>
+  streamedBodyRoutes.has(`${method} ${(url || '').split('?')[0].replace(/\/+$/, '')}`);
+
+// Largest single record (array element, NDJSON line or CSV row), counted in
+// characters. These routes skip express.json and its 100kb body limit, so
+// this keeps one oversized record from being buffered without bound.
+const maxRecordBytes = () => parseInt(process.env.MAX_RECORD_BYTES || '102400', 10);
+
+const tooLarge = (max: number) => new RecordParseError(`A record exceeds the ${max} byte limit`);
+
+const isNdjson = (contentType: string) =>
+  contentType.includes('ndjson') || contentType.includes('jsonlines') || contentType.includes('x-jsonl');
+
+const isCsv = (contentType: string) => contentType.includes('csv');
+
+// Incrementally split a top-level JSON array of objects into its elements
+async function* jsonArrayRecords(chunks: AsyncIterable<string>): AsyncGenerator<any> {
+  const max = maxRecordBytes();
+  let started = false;
+  let depth = 0;
+  let inString = false;
+  let escaped = false;
+  let current = '';
+
+  for await (const chunk of chunks) {
+    let elementStart = depth > 0 ? 0 : -1;
+
+    for (let i = 0; i < chunk.length; i++) {
+      const char = chunk[i];
+
+      if (inString) {
+        if (escaped) {
+          escaped = false;
+        } else if (char === '\\') {
+          escaped = true;
+        } else if (char === '"') {
+          inString = false;
+        }
+        continue;
+      }
+
+      if (!started) {
+        if (char === '[') {
+          started = true;
+        } else if (!/\s/.test(char)) {
+          throw new RecordParseError('Expected a JSON array of objects');
+        }
+        continue;
+      }
+
+      if (char === '"') {
+        if (depth === 0) {
+          throw new RecordParseError('Array elements must be objects');
+        }
+        inString = true;
+      } else if (char === '{' || char === '[') {
+        if (depth === 0) {
+          if (char === '[') {
+            throw new RecordParseError('Array elements must be objects');
+          }
+          elementStart = i;
+        }
+        depth++;
+      } else if (char === '}' || char === ']') {
+        if (depth === 0) {
+          // End of the top-level array
+          return;
+        }
+        depth--;
+        if (depth === 0) {
+          current += chunk.slice(elementStart, i + 1);
+          elementStart = -1;
+          if (current.length > max) {
+            throw tooLarge(max);
+          }
+          yield JSON.parse(current);
+          current = '';
+        }
+      } else if (depth === 0 && char !== ',' && !/\s/.test(char)) {
+        throw new RecordParseError('Array elements must be objects');
+      }
+    }
+
+    if (depth > 0 && elementStart !== -1) {
+      current += chunk.slice(elementStart);
+      if (current.length > max) {
+        throw tooLarge(max);
+      }
+    }
+  }
+
+  throw new RecordParseError('Unexpected end of JSON array');
+}
+
+// One JSON document per line; blank lines are ignored
+async function* ndjsonRecords(chunks: AsyncIterable<string>): AsyncGenerator<any> {
+  const max = maxRecordBytes();
+  let buffered = '';
+  let line = 0;
+
+  const parseLine = (text: string) => {
+    line++;
+    try {
+      return JSON.parse(text);
+    } catch {
+      throw new RecordParseError(`Invalid JSON on line ${line}`);
+    }
+  };
+
+  for await (const chunk of chunks) {
+    buffered += chunk;
+    let newline = buffered.indexOf('\n');
+    while (newline !== -1) {
+      if (newline > max) {
+        throw tooLarge(max);
+      }
+      const text = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      if (text) {
+        yield parseLine(text);
+      } else {
+        line++;
+      }
+      newline = buffered.indexOf('\n');
+    }
+    // The rest is a line still waiting for its newline
+    if (buffered.length > max) {
+      throw tooLarge(max);
+    }
+  }
+
+  if (buffered.trim()) {
+    yield parseLine(buffered.trim());
+  }
+}
+
+// RFC 4180 CSV with a header row; each row becomes an object keyed by the
+// header names. Values stay strings. Quoted fields may contain commas, doubled
+// quotes and newlines.
+async function* csvRecords(chunks: AsyncIterable<string>): AsyncGenerator<Record<string, string>> {
+  const max = maxRecordBytes();
+  let header: string[] | null = null;
+  let row: string[] = [];
+  let field = '';
+  let inQuotes = false;
+  let quoteSeen = false;
+  let line = 1;
+  let first = true;
+  // Characters in the row being read, quoted newlines included
+  let rowLength = 0;
+
+  const endRow = (): Record<string, string> | null => {
+    row.push(field);
+    field = '';
+    const values = row;
+    row = [];
+    rowLength = 0;
+
+    // Skip blank lines
+    if (values.length === 1 && values[0] === '') {
+      return null;
+    }
+    if (!header) {
+      header = values.map(name => name.trim());
+      return null;
+    }
+    if (values.length > header.length) {
+      throw new RecordParseError(`Too many fields on CSV line ${line}`);
+    }
+    const record: Record<string, string> = {};
+    header.forEach((name, i) => {
+      record[name] = values[i] ?? '';
+    });
+    return record;
+  };
+
+  for await (let chunk of chunks) {
+    if (first) {
+      chunk = chunk.replace(/^\uFEFF/, '');
+      first = false;
+    }
+
+    for (let i = 0; i < chunk.length; i++) {
+      const char = chunk[i];
+      if (++rowLength > max) {
+        throw tooLarge(max);
+      }
+
+      if (inQuotes) {
+        if (char === '"') {
+          inQuotes = false;
+          quoteSeen = true;
+        } else {
+          if (char === '\n') {
+            line++;
+          }
+          field += char;
+        }
+        continue;
+      }
+
+      if (char === '"') {
+        // A quote right after a closing quote is an escaped quote
+        if (quoteSeen) {
+          field += '"';
+          inQuotes = true;
+          quoteSeen = false;
+        } else if (field === '') {
+          inQuotes = true;
+        } else {
+          throw new RecordParseError(`Unexpected quote on CSV line ${line}`);
+        }
+        continue;
+      }
+      quoteSeen = false;
+
+      if (char === ',') {
+        row.push(field);
+        field = '';
+      } else if (char === '\n') {
+        const record = endRow();
+        line++;
+        if (record) {
+          yield record;
+        }
+      } else if (char !== '\r') {
+        field += char;
+      }
+    }
+  }
+
+  if (inQuotes) {
+    throw new RecordParseError('Unterminated quoted field in CSV');
+  }
+  if (field !== '' || row.length > 0) {
+    const record = endRow();
+    if (record) {
+      yield record;
+    }
+  }
+}
+
+// Yield records from a JSON array, NDJSON or CSV request body without
+// buffering the whole upload. Bodies already parsed by express.json() are
+// iterated directly.
+export async function* readRecords(req: Request): AsyncGenerator<any> {
+  if (Array.isArray(req.body)) {
+    yield* req.body;
+    return;
+  }
+
+  const contentType = String(req.headers['content-type'] || '').toLowerCase();
+  req.setEncoding('utf8');
+  const chunks = req as AsyncIterable<string>;
+
+  try {
+    if (isNdjson(contentType)) {
+      yield* ndjsonRecords(chunks);
+    } else if (isCsv(contentType)) {
+      yield* csvRecords(chunks);
+    } else if (contentType.includes('json')) {
+      yield* jsonArrayRecords(chunks);
+    } else {
+      throw new RecordParseError('Unsupported content type');
+    }
+  } catch (error) {
+    if (error instanceof SyntaxError) {
+      throw new RecordParseError('Invalid JSON in request body');
+    }
+    throw error;
+  }
+}
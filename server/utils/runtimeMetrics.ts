@@ -0,0 +1,158 @@
+import fs from 'fs/promises';
+import { monitorEventLoopDelay } from 'perf_hooks';
+import metrics, { Sample } from './metrics.js';
+
+export interface EventLoopLag {
+  p50: number;
+  p99: number;
+  max: number;
+  mean: number;
+}
+
+interface ChildProcessInfo {
+  pid: number;
+  ppid: number;
+  type: 'chromium' | 'node' | 'other';
+}
+
+const LAG_WINDOW_MS = 5000;
+
+let monitor: ReturnType<typeof monitorEventLoopDelay> | null = null;
+let windowTimer: NodeJS.Timeout | null = null;
+let lastWindow: EventLoopLag = { p50: 0, p99: 0, max: 0, mean: 0 };
+
+// Event-loop delay over the last complete window, in seconds
+export const eventLoopLag = (): EventLoopLag => lastWindow;
+
+// Sample event-loop delay continuously; each window's percentiles replace the previous
+export const startRuntimeMetrics = (): void => {
+  if (monitor) {
+    return;
+  }
+  monitor = monitorEventLoopDelay({ resolution: 10 });
+  monitor.enable();
+  windowTimer = setInterval(() => {
+    const histogram = monitor as ReturnType<typeof monitorEventLoopDelay>;
+    // The histogram is in nanoseconds and an empty one reports NaN for its mean
+    lastWindow = {
+      p50: histogram.percentile(50) / 1e9,
+      p99: histogram.percentile(99) / 1e9,
+      max: histogram.max / 1e9,
+      mean: (histogram.mean || 0) / 1e9
+    };
+    histogram.reset();
+  }, LAG_WINDOW_MS);
+  windowTimer.unref();
+};
+
+export const stopRuntimeMetrics = (): void => {
+  if (windowTimer) {
+    clearInterval(windowTimer);
+    windowTimer = null;
+  }
+  monitor?.disable();
+  monitor = null;
+};
+
+const processType = (command: string): ChildProcessInfo['type'] => {
+  if (/chrom|headless/i.test(command)) {
+    return 'chromium';
+  }
+  return command === 'node' ? 'node' : 'other';
+};
+
+// Descendants of this process (render workers, Chromium and its helpers)
+// from /proc, so Linux only; elsewhere the scan fails and the metrics are
+// left out of the scrape
+const childProcesses = async (): Promise<ChildProcessInfo[]> => {
+  const pids = (await fs.readdir('/proc')).filter(name => /^\d+$/.test(name));
+  const byParent = new Map<number, ChildProcessInfo[]>();
+  await Promise.all(pids.map(async name => {
+    try {
+      const stat = await fs.readFile(`/proc/${name}/stat`, 'utf8');
+      // The command is in parentheses and may itself contain spaces or ')'
+      const close = stat.lastIndexOf(')');
+      const command = stat.slice(stat.indexOf('(') + 1, close);
+      const ppid = parseInt(stat.slice(close + 2).split(' ')[1], 10);
+      const info: ChildProcessInfo = { pid: parseInt(name, 10), ppid, type: processType(command) };
+      const siblings = byParent.get(ppid);
+      if (siblings) {
+        siblings.push(info);
+      } else {
+        byParent.set(ppid, [info]);
+      }
+    } catch {
+      // Exited during the scan
+    }
+  }));
+
+  const descendants: ChildProcessInfo[] = [];
+  const pending = [process.pid];
+  while (pending.length > 0) {
+    for (const child of byParent.get(pending.pop() as number) || []) {
+      descendants.push(child);
+      pending.push(child.pid);
+    }
+  }
+  return descendants;
+};
+
+const residentBytes = async (pid: number): Promise<number> => {
+  try {
+    const status = await fs.readFile(`/proc/${pid}/status`, 'utf8');
+    const match = /^VmRSS:\s+(\d+)\s+kB/m.exec(status);
+    return match ? parseInt(match[1], 10) * 1024 : 0;
+  } catch {
+    return 0;
+  }
+};
+
+// Both process tree metrics come from one scan per scrape
+let treeScan: { at: number; result: Promise<Record<string, { count: number; rss: number }>> } | null = null;
+
+const processTree = () => {
+  if (!treeScan || Date.now() - treeScan.at > 1000) {
+    const result = childProcesses().then(async children => {
+      const totals: Record<string, { count: number; rss: number }> = {};
+      const sizes = await Promise.all(children.map(child => residentBytes(child.pid)));
+      children.forEach((child, index) => {
+        const total = totals[child.type] || (totals[child.type] = { count: 0, rss: 0 });
+        total.count++;
+        total.rss += sizes[index];
+      });
+      return totals;
+    });
+    treeScan = { at: Date.now(), result };
+  }
+  return treeScan.result;
+};
+
+metrics.gauge('nodejs_eventloop_lag_seconds', 'Event-loop delay over the last 5s window', () => {
+  const lag = eventLoopLag();
+  return [
+    { labels: { quantile: '0.5' }, value: lag.p50 },
+    { labels: { quantile: '0.99' }, value: lag.p99 }
+  ];
+});
+metrics.gauge('nodejs_eventloop_lag_max_seconds', 'Longest event-loop delay in the last 5s window', () => eventLoopLag().max);
+metrics.gauge('nodejs_eventloop_lag_mean_seconds', 'Mean event-loop delay in the last 5s window', () => eventLoopLag().mean);
+
+metrics.gauge('nodejs_memory_bytes', 'Memory of this Node process by kind', () => {
+  const usage = process.memoryUsage();
+  return [
+    { labels: { kind: 'rss' }, value: usage.rss },
+    { labels: { kind: 'heap_used' }, value: usage.heapUsed },
+    { labels: { kind: 'heap_total' }, value: usage.heapTotal },
+    { labels: { kind: 'external' }, value: usage.external },
+    { labels: { kind: 'array_buffers' }, value: usage.arrayBuffers }
+  ];
+});
+
+metrics.gauge('child_process_resident_memory_bytes', 'Resident memory of descendant processes (render workers, Chromium) by type', async () => {
+  const totals = await processTree();
+  return Object.keys(totals).map((type): Sample => ({ labels: { type }, value: totals[type].rss }));
+});
+metrics.gauge('child_processes', 'Descendant processes by type', async () => {
+  const totals = await processTree();
+  return Object.keys(totals).map((type): Sample => ({ labels: { type }, value: totals[type].count }));
+});
@@ -0,0 +1,225 @@
+import { AsyncLocalStorage } from 'async_hooks';
+import fs from 'fs/promises';
+import os from 'os';
+import path from 'path';
+import { performance } from 'perf_hooks';
+
+export interface Span {
+  name: string;
+  // Milliseconds from the start of the request
+  startMs: number;
+  // NaN while the span is still open
+  durationMs: number;
+}
+
+export interface TraceRecord {
+  id: string;
+  method: string;
+  route: string;
+  path: string;
+  status: number;
+  startedAt: string;
+  durationMs: number;
+  spans: Span[];
+  droppedSpans: number;
+}
+
+export interface TracerOptions {
+  // Send the spans to clients in a Server-Timing header
+  serverTiming: boolean;
+  // Requests at least this slow are candidates for the ring buffer
+  slowMs: number;
+  // Fraction of slow requests kept
+  sampleRate: number;
+  bufferSize: number;
+  // Spans recorded per request; a batch render stops recording past this
+  maxSpans: number;
+  dumpPath: string;
+}
+
+const optionsFromEnv = (): TracerOptions => ({
+  serverTiming: process.env.SERVER_TIMING !== 'false',
+  slowMs: parseInt(process.env.TRACE_SLOW_MS || '1000', 10),
+  sampleRate: parseFloat(process.env.TRACE_SAMPLE_RATE || '1'),
+  bufferSize: Math.max(1, parseInt(process.env.TRACE_BUFFER_SIZE || '100', 10) || 1),
+  maxSpans: parseInt(process.env.TRACE_MAX_SPANS || '200', 10),
+  dumpPath: process.env.TRACE_DUMP_PATH || path.join(os.tmpdir(), `slow-traces-${process.pid}.json`)
+});
+
+const round = (ms: number): number => Math.round(ms * 10) / 10;
+
+// Spans of one request, timed from when the request arrived
+export class Trace {
+  readonly spans: Span[] = [];
+  readonly startedAt = Date.now();
+  dropped = 0;
+  private readonly origin = performance.now();
+
+  constructor(readonly id: string, private maxSpans: number) {}
+
+  elapsed(): number {
+    return performance.now() - this.origin;
+  }
+
+  // Open a span; the returned function closes it
+  begin(name: string): () => void {
+    if (this.spans.length >= this.maxSpans) {
+      this.dropped++;
+      return () => {};
+    }
+    const span: Span = { name, startMs: this.elapsed(), durationMs: NaN };
+    this.spans.push(span);
+    return () => {
+      if (Number.isNaN(span.durationMs)) {
+        span.durationMs = this.elapsed() - span.startMs;
+      }
+    };
+  }
+
+  // Add a span measured elsewhere that ended endedMsAgo before now
+  add(name: string, durationMs: number, endedMsAgo = 0): void {
+    if (this.spans.length >= this.maxSpans) {
+      this.dropped++;
+      return;
+    }
+    this.spans.push({ name, startMs: Math.max(0, this.elapsed() - endedMsAgo - durationMs), durationMs });
+  }
+
+  // Server-Timing value: spans summed by name (open ones count up to now) plus the total
+  serverTiming(): string {
+    const now = this.elapsed();
+    const totals = new Map<string, { durationMs: number; count: number }>();
+    for (const span of this.spans) {
+      const durationMs = Number.isNaN(span.durationMs) ? now - span.startMs : span.durationMs;
+      const total = totals.get(span.name);
+      if (total) {
+        total.durationMs += durationMs;
+        total.count++;
+      } else {
+        totals.set(span.name, { durationMs, count: 1 });
+      }
+    }
+    const entries = [...totals].map(([name, total]) =>
+      `${name};dur=${round(total.durationMs)}${total.count > 1 ? `;desc="${total.count} calls"` : ''}`);
+    entries.push(`total;dur=${round(now)}`);
+    return entries.join(', ');
+  }
+}
+
+// Per-request span recording. Spans go to the trace of the current request
+// (AsyncLocalStorage); outside a request every call is a no-op. Finished
+// requests slower than slowMs are sampled into a fixed-size ring buffer that
+// the admin endpoints read and dump() writes to a file.
+export class Tracer {
+  private storage = new AsyncLocalStorage<Trace>();
+  private ring: TraceRecord[] = [];
+  private next = 0;
+  private options: TracerOptions | null = null;
+  private counters = { traced: 0, slow: 0, kept: 0 };
+
+  constructor(private overrides: Partial<TracerOptions> = {}) {}
+
+  get serverTiming(): boolean {
+    return this.configure().serverTiming;
+  }
+
+  start(id: string): Trace {
+    this.counters.traced++;
+    return new Trace(id, this.configure().maxSpans);
+  }
+
+  run<T>(trace: Trace, fn: () => T): T {
+    return this.storage.run(trace, fn);
+  }
+
+  current(): Trace | undefined {
+    return this.storage.getStore();
+  }
+
+  // Time an async call as a span of the current request
+  span<T>(name: string, fn: () => Promise<T>): Promise<T> {
+    const trace = this.storage.getStore();
+    if (!trace) {
+      return fn();
+    }
+    const end = trace.begin(name);
+    return fn().finally(end);
+  }
+
+  // Open a span of the current request; call the result to close it
+  begin(name: string): () => void {
+    const trace = this.storage.getStore();
+    return trace ? trace.begin(name) : () => {};
+  }
+
+  // Record a duration measured elsewhere, which ended endedMsAgo before now
+  record(name: string, durationMs: number, endedMsAgo = 0): void {
+    this.storage.getStore()?.add(name, durationMs, endedMsAgo);
+  }
+
+  finish(trace: Trace, request: { method: string; route: string; path: string; status: number }): void {
+    const { slowMs, sampleRate, bufferSize } = this.configure();
+    const durationMs = trace.elapsed();
+    if (durationMs < slowMs) {
+      return;
+    }
+    this.counters.slow++;
+    if (sampleRate < 1 && Math.random() >= sampleRate) {
+      return;
+    }
+    this.counters.kept++;
+
+    const record: TraceRecord = {
+      id: trace.id,
+      ...request,
+      startedAt: new Date(trace.startedAt).toISOString(),
+      durationMs: round(durationMs),
+      spans: trace.spans.map(span => ({
+        name: span.name,
+        startMs: round(span.startMs),
+        durationMs: round(Number.isNaN(span.durationMs) ? durationMs - span.startMs : span.durationMs)
+      })),
+      droppedSpans: trace.dropped
+    };
+    if (this.ring.length < bufferSize) {
+      this.ring.push(record);
+    } else {
+      this.ring[this.next] = record;
+    }
+    this.next = (this.next + 1) % bufferSize;
+  }
+
+  // Kept traces, newest first
+  recent(limit = this.configure().bufferSize): TraceRecord[] {
+    const ordered = [...this.ring.slice(this.next), ...this.ring.slice(0, this.next)].reverse();
+    return ordered.slice(0, limit);
+  }
+
+  find(id: string): TraceRecord | undefined {
+    return this.ring.find(record => record.id === id);
+  }
+
+  // Write the kept traces to a JSON file (TRACE_DUMP_PATH by default)
+  async dump(file: string = this.configure().dumpPath): Promise<{ path: string; count: number }> {
+    const traces = this.recent();
+    await fs.mkdir(path.dirname(file), { recursive: true });
+    await fs.writeFile(file, JSON.stringify({ pid: process.pid, dumpedAt: new Date().toISOString(), traces }, null, 2));
+    return { path: file, count: traces.length };
+  }
+
+  stats() {
+    const { slowMs, sampleRate, bufferSize } = this.configure();
+    return { slowMs, sampleRate, bufferSize, buffered: this.ring.length, ...this.counters };
+  }
+
+  private configure(): TracerOptions {
+    if (!this.options) {
+      this.options = { ...optionsFromEnv(), ...this.overrides };
+    }
+    return this.options;
+  }
+}
+
+const tracer = new Tracer();
+
+export default tracer;
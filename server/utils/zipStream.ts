@@ -0,0 +1,136 @@
+import { Writable } from 'stream';
+import { once } from 'events';
+
+// Standard CRC-32 (IEEE 802.3) lookup table
+const crcTable = new Uint32Array(256);
+for (let n = 0; n < 256; n++) {
+  let c = n;
+  for (let k = 0; k < 8; k++) {
+    c = c & 1 ? 0xedb88320 ^ (c >>> 1) : c >>> 1;
+  }
+  crcTable[n] = c >>> 0;
+}
+
+export const crc32 = (buffer: Buffer): number => {
+  let crc = 0xffffffff;
+  for (let i = 0; i < buffer.length; i++) {
+    crc = crcTable[(crc ^ buffer[i]) & 0xff] ^ (crc >>> 8);
+  }
+  return (crc ^ 0xffffffff) >>> 0;
+};
+
+interface CentralEntry {
+  name: Buffer;
+  crc: number;
+  size: number;
+  offset: number;
+  time: number;
+  date: number;
+}
+
+// Format limits without ZIP64 extensions
+const MAX_ENTRIES = 0xffff;
+const MAX_OFFSET = 0xffffffff;
+
+const dosDateTime = (when: Date) => ({
+  time: (when.getHours() << 11) | (when.getMinutes() << 5) | Math.floor(when.getSeconds() / 2),
+  date: ((when.getFullYear() - 1980) << 9) | ((when.getMonth() + 1) << 5) | when.getDate()
+});
+
+// Minimal streaming ZIP writer. Entries are stored uncompressed (PDFs are
+// already compressed internally) and written as soon as they are added, so
+// the archive streams out while later entries are still being produced.
+export class ZipStream {
+  private entries: CentralEntry[] = [];
+  private offset = 0;
+  private pending: Promise<void> = Promise.resolve();
+
+  constructor(private out: Writable) {}
+
+  get count(): number {
+    return this.entries.length;
+  }
+
+  // Entries are serialized in the order they are added
+  addFile(name: string, data: Buffer, when = new Date()): Promise<void> {
+    this.pending = this.pending.then(() => this.writeEntry(name, data, when));
+    return this.pending;
+  }
+
+  // Write the central directory and end the output stream
+  finish(): Promise<void> {
+    this.pending = this.pending.then(async () => {
+      const start = this.offset;
+      for (const entry of this.entries) {
+        const header = Buffer.alloc(46);
+        header.writeUInt32LE(0x02014b50, 0);
+        header.writeUInt16LE(20, 4); // version made by
+        header.writeUInt16LE(20, 6); // version needed
+        header.writeUInt16LE(0x0800, 8); // UTF-8 names
+        header.writeUInt16LE(0, 10); // stored
+        header.writeUInt16LE(entry.time, 12);
+        header.writeUInt16LE(entry.date, 14);
+        header.writeUInt32LE(entry.crc, 16);
+        header.writeUInt32LE(entry.size, 20);
+        header.writeUInt32LE(entry.size, 24);
+        header.writeUInt16LE(entry.name.length, 28);
+        header.writeUInt32LE(entry.offset, 42);
+        await this.write(Buffer.concat([header, entry.name]));
+      }
+
+      const end = Buffer.alloc(22);
+      end.writeUInt32LE(0x06054b50, 0);
+      end.writeUInt16LE(this.entries.length, 8);
+      end.writeUInt16LE(this.entries.length, 10);
+      end.writeUInt32LE(this.offset - start, 12);
+      end.writeUInt32LE(start, 16);
+      await this.write(end);
+
+      this.out.end();
+    });
+    return this.pending;
+  }
+
+  private async writeEntry(name: string, data: Buffer, when: Date): Promise<void> {
+    if (this.entries.length >= MAX_ENTRIES || this.offset + data.length > MAX_OFFSET) {
+      throw new Error('ZIP archive size limit reached');
+    }
+
+    const nameBuffer = Buffer.from(name, 'utf8');
+    const { time, date } = dosDateTime(when);
+    const crc = crc32(data);
+
+    const header = Buffer.alloc(30);
+    header.writeUInt32LE(0x04034b50, 0);
+    header.writeUInt16LE(20, 4);
+    header.writeUInt16LE(0x0800, 6);
+    header.writeUInt16LE(0, 8);
+    header.writeUInt16LE(time, 10);
+    header.writeUInt16LE(date, 12);
+    header.writeUInt32LE(crc, 14);
+    header.writeUInt32LE(data.length, 18);
+    header.writeUInt32LE(data.length, 22);
+    header.writeUInt16LE(nameBuffer.length, 26);
+
+    this.entries.push({ name: nameBuffer, crc, size: data.length, offset: this.offset, time, date });
+    await this.write(Buffer.concat([header, nameBuffer]));
+    await this.write(data);
+  }
+
+  // Respect backpressure from the destination
+  private async write(chunk: Buffer): Promise<void> {
+    if (this.out.destroyed) {
+      throw new Error('ZIP output closed');
+    }
+    this.offset += chunk.length;
+    if (!this.out.write(chunk)) {
+      const controller = new AbortController();
+      const { signal } = controller;
+      try {
+        await Promise.race([once(this.out, 'drain', { signal }), once(this.out, 'close', { signal })]);
+      } finally {
+        controller.abort();
+      }
+    }
+  }
+}
@@ -0,0 +1,28 @@
+// Password hashing thread. Started by services/passwordHasher; uses bcrypt's
+// synchronous calls so the work stays on this thread instead of libuv's
+// shared threadpool, which also serves file I/O.
+import bcrypt from 'bcrypt';
+import { parentPort } from 'worker_threads';
+import type { PasswordTask, PasswordTaskResult } from '../services/passwordHasher.js';
+
+if (!parentPort) {
+  throw new Error('passwordWorker must run as a worker thread');
+}
+
+const port = parentPort;
+
+const reply = (message: PasswordTaskResult) => {
+  port.postMessage(message);
+};
+
+port.on('message', (task: PasswordTask) => {
+  const started = Date.now();
+  try {
+    const result = task.op === 'hash'
+      ? bcrypt.hashSync(task.password, task.cost)
+      : bcrypt.compareSync(task.password, task.hash);
+    reply({ id: task.id, result, runMs: Date.now() - started });
+  } catch (error: any) {
+    reply({ id: task.id, error: error?.message || String(error), runMs: Date.now() - started });
+  }
+});
@@ -0,0 +1,70 @@
+// Out-of-process PDF renderer. Forked by services/renderJobs, it owns its own
+// browser and page pools and sends rendered PDFs back over IPC; the parent
+// saves them so it stays the only writer of the invoice store index.
+import browserPool from '../services/browserPool.js';
+import pagePool from '../services/pagePool.js';
+import {
+  InvoiceValidationError,
+  buildInvoiceFields,
+  invoiceCacheKey,
+  renderInvoicePdf,
+  resolveEngine
+} from '../services/invoiceRenderer.js';
+import type { RenderTimings } from '../services/renderMetrics.js';
+import type { WorkerRequest, WorkerResponse } from '../services/renderJobs.js';
+import logger from '../utils/logger.js';
+
+const send = (message: WorkerResponse) => {
+  if (process.send) {
+    process.send(message);
+  }
+};
+
+// With the native engine as default, browsers are not launched up front; the
+// pools launch one on the first job that asks for Chromium, as in server.ts
+const ready = process.env.PDF_ENGINE === 'native'
+  ? Promise.resolve()
+  : browserPool.start().then(() => pagePool.warm());
+
+ready.then(() => send({ type: 'ready' })).catch(error => {
+  logger.error('Render worker failed to start browsers', error);
+  process.exit(1);
+});
+
+process.on('message', async (message: WorkerRequest) => {
+  if (message.type !== 'render') {
+    return;
+  }
+
+  try {
+    await ready;
+    const fields = buildInvoiceFields(message.payload);
+    const engine = resolveEngine(message.payload.engine);
+    const cacheKey = invoiceCacheKey(message.userId, fields, engine);
+    // Phase times are observed by the parent, which serves /metrics
+    const timings: RenderTimings = {};
+    const buffer = await renderInvoicePdf({ invoiceNumber: message.invoiceNumber, ...fields }, engine, timings);
+    send({ type: 'done', jobId: message.jobId, cacheKey, buffer, timings });
+  } catch (error: any) {
+    send({
+      type: 'failed',
+      jobId: message.jobId,
+      error: error instanceof InvoiceValidationError ? error.message : 'Failed to generate PDF',
+      retryable: !(error instanceof InvoiceValidationError)
+    });
+    if (!(error instanceof InvoiceValidationError)) {
+      logger.error('Render job failed', { jobId: message.jobId, err: error });
+    }
+  }
+});
+
+const shutdown = () => {
+  pagePool.shutdown()
+    .then(() => browserPool.shutdown())
+    .finally(() => process.exit(0));
+};
+
+// The parent owns the lifecycle; ignore terminal Ctrl+C sent to the process group
+process.on('SIGINT', () => {});
+process.once('SIGTERM', shutdown);
+process.once('disconnect', shutdown);
@@ -2,7 +2,7 @@ import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
 import { useDispatch } from 'react-redux';
 import { loginSuccess, loginFailure, registerSuccess, registerFailure } from '../store/authSlice';
 import { fetchProductsSuccess, addProductSuccess, deleteProductSuccess } from '../store/productsSlice';
-import ApiClient from '../utils/apiClient';
+import ApiClient, { idempotencyKeyFor } from '../utils/apiClient';
 import { ErrorHandler } from '../utils/errorHandler';
 
 // Auth hooks
@@ -64,11 +64,18 @@ export const useProducts = () => {
     queryKey: ['products'],
     queryFn: async () => {
       try {
-        const data = await ApiClient.get('/products');
-        // Extract products array from response object
-        const products = data.products || [];
+        // The listing is paginated; follow the cursor to load the full catalogue
+        const products: any[] = [];
+        let data: any;
+        let cursor: string | null = null;
+        do {
+          const query: string = cursor ? `&cursor=${encodeURIComponent(cursor)}` : '';
+          data = await ApiClient.get(`/products?limit=200${query}`);
+          products.push(...(data.products || []));
+          cursor = data.nextCursor || null;
+        } while (cursor);
         dispatch(fetchProductsSuccess(products));
-        return data;
+        return { ...data, products };
       } catch (error) {
         ErrorHandler.logError(error, 'Fetch Products');
         throw error;
@@ -89,7 +96,7 @@ export const useCreateProduct = () => {
   return useMutation({
     mutationFn: async (product: any) => {
       try {
-        return await ApiClient.post('/products', product);
+        return await ApiClient.post('/products', product, true, idempotencyKeyFor(product));
       } catch (error) {
         ErrorHandler.logError(error, 'Create Product');
         throw error;
@@ -107,6 +114,25 @@ export const useCreateProduct = () => {
   });
 };
 
+export const useBulkCreateProducts = () => {
+  const queryClient = useQueryClient();
+
+  return useMutation({
+    mutationFn: async (products: any[]) => {
+      try {
+        return await ApiClient.post('/products/bulk?return=ids', products);
+      } catch (error) {
+        ErrorHandler.logError(error, 'Bulk Create Products');
+        throw error;
+      }
+    },
+    onSuccess: () => {
+      // Invalidate React Query cache
+      queryClient.invalidateQueries({ queryKey: ['products'] });
+    },
+  });
+};
+
 export const useDeleteProduct = () => {
   const queryClient = useQueryClient();
   const dispatch = useDispatch();
@@ -137,7 +163,7 @@ export const useGeneratePDF = () => {
   return useMutation({
     mutationFn: async (data: any) => {
       try {
-        return await ApiClient.post('/pdf/generate', data);
+        return await ApiClient.post('/pdf/generate', data, true, idempotencyKeyFor(data));
       } catch (error) {
         ErrorHandler.logError(error, 'Generate PDF');
         throw error;
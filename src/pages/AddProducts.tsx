@@ -16,7 +16,7 @@ import {
 } from '@/components/ui/form';
 import { Trash2, Plus, Calculator } from 'lucide-react';
 import { useAppDispatch, useAppSelector } from '../store';
-import { useCreateProduct } from '../hooks/useQuery';
+import { useBulkCreateProducts } from '../hooks/useQuery';
 import { addProductSuccess, clearProducts } from '../store/productsSlice';
 import { useToast } from '../components/Toast';
 
@@ -40,7 +40,7 @@ const AddProducts: React.FC = () => {
   
   // TanStack Query hooks
   // Removed useProducts() to prevent automatic fetching that overwrites Redux state
-  const createProductMutation = useCreateProduct();
+  const bulkCreateProductsMutation = useBulkCreateProducts();
   
   // Redux state - commented out unused variables
   // const { products: reduxProducts, isLoading: isReduxLoading, error: reduxError } = useAppSelector((state) => state.products);
@@ -94,30 +94,41 @@ const AddProducts: React.FC = () => {
       // Clear existing products before adding new ones
       dispatch(clearProducts());
 
-      // Save products to API and update Redux store
-      const savedProducts = [];
-      for (const product of values.products) {
-        const savedProduct = await createProductMutation.mutateAsync({
+      // Save all products in one request and update Redux store
+      const result = await bulkCreateProductsMutation.mutateAsync(
+        values.products.map(product => ({
           name: product.name,
-          description: product.description || '',
           qty: Number(product.qty),
           rate: Number(product.rate)
-        });
-        
+        }))
+      );
+
+      const savedProducts = [];
+      for (const { row, id } of result.insertedIds || []) {
+        const product = values.products[row];
+
         // Dispatch to Redux store
         const productPayload = {
-          _id: savedProduct.product.id,
-          name: savedProduct.product.name,
+          _id: id,
+          name: product.name,
           description: product.description || '',
-          quantity: Number(savedProduct.product.qty),
-          rate: Number(savedProduct.product.rate),
-          total: Number(savedProduct.product.qty) * Number(savedProduct.product.rate),
+          quantity: Number(product.qty),
+          rate: Number(product.rate),
+          total: Number(product.qty) * Number(product.rate),
           createdAt: new Date().toISOString(),
           updatedAt: new Date().toISOString()
         };
-        
+
         dispatch(addProductSuccess(productPayload));
-        savedProducts.push(savedProduct);
+        savedProducts.push(productPayload);
+      }
+
+      // Rows are saved independently; report the first one that was rejected
+      if (result.failed > 0) {
+        const firstError = result.errors?.[0];
+        throw new Error(
+          firstError ? `Product ${firstError.row + 1}: ${firstError.message}` : 'Some products could not be saved'
+        );
       }
       
       // Show success toast and navigate
@@ -300,10 +311,10 @@ const AddProducts: React.FC = () => {
             <div className="mt-6">
               <Button
                 type="submit"
-                disabled={form.formState.isSubmitting || createProductMutation.isPending}
+                disabled={form.formState.isSubmitting || bulkCreateProductsMutation.isPending}
                 className="w-full bg-blue-600 hover:bg-blue-700 text-white font-medium py-2 px-4 rounded-md disabled:opacity-50 disabled:cursor-not-allowed flex items-center justify-center"
               >
-                {form.formState.isSubmitting || createProductMutation.isPending ? (
+                {form.formState.isSubmitting || bulkCreateProductsMutation.isPending ? (
                   <>
                     <svg className="animate-spin -ml-1 mr-3 h-5 w-5 text-white" xmlns="http://www.w3.org/2000/svg" fill="none" viewBox="0 0 24 24">
                       <circle className="opacity-25" cx="12" cy="12" r="10" stroke="currentColor" strokeWidth="4"></circle>
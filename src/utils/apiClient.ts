@@ -19,6 +19,20 @@ export class ApiError extends Error {
   }
 }
 
+// One Idempotency-Key per logical request. React Query hands the same
+// variables object to every retry of a mutation, so retries reuse the key and
+// the server replays the first response instead of repeating the work.
+const idempotencyKeys = new WeakMap<object, string>();
+
+export const idempotencyKeyFor = (variables: object): string => {
+  let key = idempotencyKeys.get(variables);
+  if (!key) {
+    key = crypto.randomUUID();
+    idempotencyKeys.set(variables, key);
+  }
+  return key;
+};
+
 // Enhanced API client with automatic token refresh
 export class ApiClient {
   private static async makeRequest(
@@ -113,13 +127,14 @@ export class ApiClient {
     return this.makeRequest(url, { method: 'GET' }, requiresAuth);
   }
 
-  // POST request
-  static async post(url: string, data?: any, requiresAuth: boolean = true): Promise<any> {
+  // POST request; pass an idempotency key to make retries safe
+  static async post(url: string, data?: any, requiresAuth: boolean = true, idempotencyKey?: string): Promise<any> {
     return this.makeRequest(
       url,
       {
         method: 'POST',
         body: data ? JSON.stringify(data) : undefined,
+        headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined,
       },
       requiresAuth
     );